@@ -4,253 +4,280 @@
 # @File    : Account.py
 
 import collections
-from simple_salesforce import SalesforceResourceNotFound, SalesforceMalformedRequest
-from SFQuerier import Parser
+from SFQuerier import Bulk, Cache, Collections, Entity, Mirror, Paging, Parser, Prefetch, Purge, QueryBuilder, \
+    Result
 from SFQuerier.Case import Case
 from SFQuerier.Contact import Contact
 from SFQuerier.Opportunity import Opportunity
 
 
 class Account:
-    def __init__(self, sf):
+    SELECT = QueryBuilder.select('Account', "Id,AccountNumber,Name,CreatedDate,Website")
+    BY_WEBSITE = SELECT.where("Website = :website")
+    BY_NAME = SELECT.where("Name = :name")
+    COUNT = QueryBuilder.select('Account', "Count()")
+
+    def __init__(self, sf, sq=None):
         self._sf = sf
-        self.Contact = Contact(sf)
-        self.Case = Case(sf)
-        self.Opportunity = Opportunity(sf)
+        self._sq = sq
+
+    @property
+    def _executor(self):
+        """FanOutExecutor of the owning SalesforceQ, calls run one after the other without one"""
+        return self._sq.executor if self._sq is not None else None
+
+    @property
+    def Contact(self):
+        return Entity.shared(self, Contact)
+
+    @property
+    def Case(self):
+        return Entity.shared(self, Case)
+
+    @property
+    def Opportunity(self):
+        return Entity.shared(self, Opportunity)
 
-    def get_all(self):  # TODO: A LIMIT must be added, or Bulk API should be used instead
-        accounts = self._sf.query("SELECT Id,AccountNumber,Name,CreatedDate,Website FROM Account")
-        accounts = Parser.parse(accounts)
+    @property
+    def _cache(self):
+        """RecordCache of the owning SalesforceQ, None if caching is off"""
+        return self._sq.cache if self._sq is not None else None
+
+    @property
+    def _metadata(self):
+        """MetadataCache of the owning SalesforceQ"""
+        return getattr(self._sq, 'metadata', None)
+
+    @property
+    def _mirror(self):
+        """Mirror.SQLiteMirror of the owning SalesforceQ, None if lookups always query the API"""
+        return getattr(self._sq, 'mirror', None)
+
+    def get_all(self, compact=False, attributes='keep', bulk=False):
+        """
+        Get all accounts
+        :param compact: return __slots__ records instead of SimpleNamespace, see Parser.parse
+        :param attributes: 'keep' / 'intern' / 'drop' the attributes payload of compact records
+        :param bulk: run the query as a Bulk API 2.0 job instead of a single REST query page, see export
+        :return: list of accounts
+        """
+        if bulk:
+            return list(self.export(compact=compact, attributes=attributes))
+        accounts = self._sf.query(self.SELECT.bind())
+        accounts = Parser.parse(accounts, compact=compact, attributes=attributes)
         return accounts
 
-    def get_all_where(self, where_query=None):
-        accounts = self._sf.query(
-            "SELECT Id,AccountNumber,Name,CreatedDate,Website FROM Account WHERE {0}".format(where_query))
-        return Parser.parse_to_object(accounts)
+    def iter_all(self, batch_size=None, compact=False, attributes='keep'):
+        """
+        Stream all accounts one page at a time, memory stays flat regardless of the org size
+        :param batch_size: records per page (200-2000), Salesforce default if None
+        :param compact: yield __slots__ records instead of SimpleNamespace, see Parser.parse
+        :param attributes: 'keep' / 'intern' / 'drop' the attributes payload of compact records
+        :return: generator of accounts
+        """
+        return Paging.iter_query(self._sf, self.SELECT.bind(), batch_size=batch_size, compact=compact,
+                                 attributes=attributes)
+
+    def export(self, page_size=None, poll_interval=2.0, timeout=None, compact=False, attributes='keep'):
+        """
+        Export all accounts through a Bulk API 2.0 query job, streamed one CSV result page at a time
+        :param page_size: records per result page, Salesforce default if None
+        :param poll_interval: max seconds between job state polls
+        :param timeout: seconds to wait for the job to complete, no limit if None
+        :param compact: yield __slots__ records instead of SimpleNamespace, see Parser.parse
+        :param attributes: 'keep' / 'intern' / 'drop' the attributes payload of compact records
+        :return: generator of accounts
+        """
+        return Bulk.export(self._sf, self.SELECT.bind(), page_size=page_size, poll_interval=poll_interval,
+                           timeout=timeout, compact=compact, attributes=attributes)
+
+    def get_all_where(self, where_query=None, compact=False, attributes='keep'):
+        accounts = self._sf.query(self.SELECT.where(where_query).bind())
+        return Parser.parse(accounts, compact=compact, attributes=attributes)
 
     def get_count(self):
         """
         Number of accounts in database
         :return: Integer
         """
-        return (self._sf.query("SELECT Count() from Account"))['totalSize']
+        return (self._sf.query(self.COUNT.bind()))['totalSize']
 
     def get_by_id(self, accountId=None):
         """
             Get SF account
-            :param accountId: ID string / list of IDs
-            :return: JSON, JSON format list / False if account was not queried
+            :param accountId: ID string / list of IDs, a list is fetched with chunked 'WHERE Id IN' queries
+            :return: JSON, JSON format list / False if account was not queried,
+                     for a list of IDs the IDs that weren't found are listed in the result's .missing
             """
         if accountId is not None:
             try:
                 if isinstance(accountId, str):
-                    account = self._sf.Account.get(accountId)
-                    return [Parser.parse(account)]
+                    account = Cache.read_through(self._cache, 'Account', accountId,
+                                                 lambda: Parser.parse(self._sf.Account.get(accountId)))
+                    return [account]
                 elif isinstance(accountId, list):
-                    accounts = []
-                    for acc_id in accountId:
-                        account = self._sf.Account.get(acc_id)
-                        accounts.append(Parser.parse(account))
-                    return accounts
-            except SalesforceResourceNotFound as e:  # Not found
-                print(
-                    "[GET]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                    name=e.resource_name,
-                                                                                    errorCode=e.content[0][
-                                                                                        'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Field doesn't exist
-                print("[GET]{errorCode}: Malformed request {url}. {message} ID: {accountId}".format(
-                    message=e.content[0]['message'],
-                    url=e.url,
-                    errorCode=e.content[0][
-                        'errorCode'], accountId=accountId))
-                return False
+                    return Collections.retrieve(self._sf, 'Account', accountId, executor=self._executor,
+                                                metadata=self._metadata)
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
+                return Result.failure('GET', e, accountId)
+        else:
+            return Result.missing('Account ID')
 
-            return False
+    def fetch(self, accountIds=None, include=('Contacts', 'Cases', 'Opportunities', 'Contracts'), fields=None):
+        """
+        Get accounts with their related records as a linked graph, one query per chunk of IDs and include level
+        EXAMPLE: for contact in .fetch(ids, include=['Contacts.Cases'])[0].Contacts: contact.Cases ...
+        :param accountIds: ID string / list of IDs
+        :param include: relationship paths, 'Contacts.Cases' loads the cases of every contact too
+        :param fields: dict of {sobject: field names} overriding Prefetch.FIELDS
+        :return: Prefetch.PrefetchResult, accounts in input order with the IDs that weren't found in .missing
+        """
+        if accountIds is not None:
+            try:
+                return Prefetch.fetch(self._sf, 'Account', [accountIds] if isinstance(accountIds, str) else accountIds,
+                                      include=include, fields=fields, executor=self._executor, metadata=self._metadata)
+            except Exception as e:
+                return Result.failure('GET', e, accountIds)
         else:
-            print("Account ID is missing!")
-            return False
+            return Result.missing('Account ID')
 
     def get_by_domain(self, website):
-        accounts = self._sf.query(
-            "SELECT Id,AccountNumber,Name,CreatedDate,Website FROM Account WHERE Website='{website}'".format(
-                website=website))
-        return Parser.parse(accounts)
+        return Mirror.lookup(self._mirror, 'Account', self.BY_WEBSITE.fields, 'Website', website, lambda: Parser.parse(
+            self._sf.query(self.BY_WEBSITE.bind(website=website))))
 
     def get_by_name(self, name):
-        accounts = self._sf.query(
-            "SELECT Id,AccountNumber,Name,CreatedDate,Website FROM Account WHERE Name='{name}'".format(name=name))
-        return Parser.parse(accounts)  # Returns list of accounts
+        return Mirror.lookup(self._mirror, 'Account', self.BY_NAME.fields, 'Name', name, lambda: Parser.parse(
+            self._sf.query(self.BY_NAME.bind(name=name))))  # Returns list of accounts
 
     def get_cases(self, accountId=None):
-        cases = self._sf.query(f"SELECT Id,CaseNumber,ContactId,AccountId,Type,Status,Subject,Description FROM Case "
-                               f"WHERE AccountId='{accountId}'")
-        return Parser.parse(cases)
+        if accountId is None:
+            return Result.missing('Account ID')
+        return Mirror.lookup(self._mirror, 'Case', Case.BY_ACCOUNT.fields, 'AccountId', accountId, lambda: Parser.parse(
+            self._sf.query(Case.BY_ACCOUNT.bind(accountId=accountId))))
 
     def get_contacts(self, accountId=None):
-        contacts = self._sf.query(
-            f"SELECT Id,FirstName,LastName,Email,Phone,AccountId FROM Contact WHERE AccountId='{accountId}'")
-        return Parser.parse(contacts)
+        if accountId is None:
+            return Result.missing('Account ID')
+        return Mirror.lookup(self._mirror, 'Contact', Contact.BY_ACCOUNT.fields, 'AccountId', accountId,
+                             lambda: Parser.parse(self._sf.query(Contact.BY_ACCOUNT.bind(accountId=accountId))))
 
-    def purge(self, accountId=None):
+    def purge(self, accountId=None, max_workers=None, continue_on_error=False):
         """
-                Delete SF account and its records
+                Delete SF account and its records (case comments, cases, opportunities, contacts, contracts)
+                The records are loaded in two queries and deleted level by level with batched deletes,
+                independent levels run concurrently on the SalesforceQ executor
                 :param accountId:
-                :return: Dict [bool, cases, opportunities]
+                :param max_workers: size of a dedicated worker pool deleting the record chunks instead of the executor
+                :param continue_on_error: delete the parents even when deleting some of their records failed
+                :return: Dict [bool, cases, opportunities, contacts, contracts, comments, deleted, failed]
                 """
         if accountId is not None:
             try:
-                """Delete cases"""
-                cases = self.get_cases(accountId=accountId)
-                if len(cases) != 0:
-                    for case in cases:
-                        if self.Case.delete(caseId=case.Id):
-                            print(f"Deleted case #{case.CaseNumber}")
-                        else:
-                            print(f"Failed to delete case #{case.CaseNumber}")
-                else:
-                    print(f"No cases were found for account ID: {accountId}")
-
-                """Delete opportunities"""
-                opportunities = self.Opportunity.get_opportunities(accountId=accountId)
-                if len(opportunities) != 0:
-                    for opportunity in opportunities:
-                        if self.Opportunity.delete(opportunityId=opportunity.Id):
-                            print(f"Deleted opportunity ID: {opportunity.Id}")
-                        else:
-                            print(f"Failed to delete opportunity ID: {opportunity.Id}")
-                else:
-                    print(f"No opportunities were found for account ID: {accountId}")
-
-                """Delete account"""
-                status = self._sf.Account.delete(accountId)
-                if status == 204:
-                    print("Deleted account ID:{0}".format(accountId))
-                    return {'bool': True, 'cases': cases, 'opportunities': opportunities}
-            except SalesforceResourceNotFound as e:  # Account doesn't exist
-                print(
-                    "[DELETE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                       name=e.resource_name,
-                                                                                       errorCode=e.content[0][
-                                                                                           'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Deletion failed (could be due account being associated to existing cases)
-                print("[DELETE]{errorCode}: Malformed request {url}. {message} ID: {accountId}".format(
-                    message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode'],
-                    accountId=accountId))
-                return False
+                result = Purge.purge_account(self._sf, accountId, max_workers=max_workers, executor=self._executor,
+                                             continue_on_error=continue_on_error)
+                if result:
+                    for sobject, ids in result['deleted'].items():
+                        Cache.invalidate(self._cache, sobject, ids)
+                return result
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
-                return False
+                return Result.failure('DELETE', e, accountId)
         else:
-            print("Account ID is missing!")
-            return False
+            return Result.missing('Account ID')
 
+    @Result.timed
     def create(self, json={}):
         """
         Create new account, 'Name' field is required!
         :param json: JSON Formatted account data
-        :return: Created account ID
+        :return: Result, .id is the created account ID
         """
         try:
             status = self._sf.Account.create(json)
             if isinstance(status, collections.OrderedDict):
                 if status['success'] == True:
-                    return status['id']
+                    return Result.succeeded(status['id'])
                 else:
-                    raise Exception("Account creation failed")
+                    return Result.rejected('CREATE', status.get('errors'))
             else:
                 raise Exception("Account creation failed")
 
-        except SalesforceResourceNotFound as e:
-            print(
-                "[CREATE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                   name=e.resource_name,
-                                                                                   errorCode=e.content[0][
-                                                                                       'errorCode']))
-            return False
-        except SalesforceMalformedRequest as e:  # Field doesn't exist / Required fields are missing
-            print("[CREATE]{errorCode}: Malformed request {url}. {message}".format(message=e.content[0]['message'],
-                                                                                   url=e.url,
-                                                                                   errorCode=e.content[0][
-                                                                                       'errorCode']))
-            return False
         except Exception as e:
-            print("Something went wrong!")
-            print(e)
-        return False
+            return Result.failure('CREATE', e, None)
 
+    @Result.timed
     def update(self, accountId=None, json={}):
         """
         Update SF account
         :param accountId:
         :param json: JSON attributes object to be updated ex: {'Name': 'Mahameed'}
-        :return: True/False if account was updated/!updated
+        :return: Result, falsy if the account wasn't updated
         """
         if accountId is not None:
             try:
                 status = self._sf.Account.update(accountId,
                                                  json)  # Status code 204 is returned if info was updated succesfully
+                Cache.invalidate(self._cache, 'Account', accountId)
                 if status == 204:
-                    print("Updated account ID: " + str(accountId))
-                    return True
-            except SalesforceResourceNotFound as e:  # Not found
-                print(
-                    "[UPDATE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                       name=e.resource_name,
-                                                                                       errorCode=e.content[0][
-                                                                                           'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Field doesn't exist
-                print("[UPDATE]{errorCode}: Malformed request {url}. {message} ID: {accountId}".format(
-                    message=e.content[0]['message'],
-                    url=e.url,
-                    errorCode=e.content[0][
-                        'errorCode'], accountId=accountId))
-                return False
+                    Result.log.info("Updated account ID: %s", accountId)
+                    return Result.succeeded(accountId)
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
+                return Result.failure('UPDATE', e, accountId)
 
-            return False
+            return Result.unexpected_status('UPDATE', status, accountId)
         else:
-            print("Account ID is missing!")
-            return False
+            return Result.missing('Account ID')
 
+    @Result.timed
     def delete(self, accountId=None):
         """
         Delete SF account
         :param accountId:
-        :return: True/False
+        :return: Result, falsy if the record wasn't deleted
         """
         if accountId is not None:
             try:
                 status = self._sf.Account.delete(accountId)
+                Cache.invalidate(self._cache, 'Account', accountId)
                 if status == 204:
-                    print("Deleted account ID:{0}".format(accountId))
-                    return True
-            except SalesforceResourceNotFound as e:  # Account doesn't exist
-                print(
-                    "[DELETE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                       name=e.resource_name,
-                                                                                       errorCode=e.content[0][
-                                                                                           'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Deletion failed (could be due account being associated to existing cases)
-                print("[DELETE]{errorCode}: Malformed request {url}. {message} ID: {accountId}".format(
-                    message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode'],
-                    accountId=accountId))
-                return False
+                    Result.log.info("Deleted account ID:%s", accountId)
+                    return Result.succeeded(accountId)
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
+                return Result.failure('DELETE', e, accountId)
 
-            return False
+            return Result.unexpected_status('DELETE', status, accountId)
         else:
-            print("Account ID is missing!")
-            return False
+            return Result.missing('Account ID')
+
+    def create_many(self, accounts, all_or_none=False):
+        """
+        Create new accounts in batches of 200 records per composite/sobjects request
+        :param accounts: list of JSON formatted account data, 'Name' field is required!
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per account in input order
+        """
+        return Collections.create(self._sf, 'Account', accounts, all_or_none=all_or_none,
+                                  executor=self._executor)
+
+    def update_many(self, accounts, all_or_none=False):
+        """
+        Update accounts in batches of 200 records per composite/sobjects request
+        :param accounts: list of JSON attributes objects including 'Id' / dict of {id: JSON attributes object}
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per account in input order
+        """
+        results = Collections.update(self._sf, 'Account', accounts, all_or_none=all_or_none,
+                                     executor=self._executor)
+        Cache.invalidate(self._cache, 'Account', [result.id for result in results])
+        return results
+
+    def delete_many(self, accountIds, all_or_none=False):
+        """
+        Delete accounts in batches of 200 records per composite/sobjects request
+        :param accountIds: list of account IDs
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per ID in input order
+        """
+        results = Collections.delete(self._sf, 'Account', accountIds, all_or_none=all_or_none,
+                                     executor=self._executor)
+        Cache.invalidate(self._cache, 'Account', [result.id for result in results])
+        return results
\ No newline at end of file
@@ -0,0 +1,381 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : AsyncSFQuerier.py
+
+"""
+asyncio variant of SalesforceQ, built on aiohttp (pip install aiohttp).
+All requests share one connection pool and a concurrency limit, so thousands of lookups can be in
+flight at once without a thread per request.
+
+EXAMPLE:
+    async with AsyncSalesforceQ(instance='na1.salesforce.com', username=.., password=.., security_token=..) as sq:
+        accounts = await sq.Account.get_by_id(['0017j00000VLkZtAAL', ...])
+"""
+import asyncio
+import collections
+import json
+import time
+
+from simple_salesforce import SalesforceLogin
+from simple_salesforce.exceptions import *
+
+from SFQuerier import Parser, QueryBuilder, Result
+from SFQuerier.Account import Account
+from SFQuerier.Case import Case
+from SFQuerier.Collections import RetrieveResult
+from SFQuerier.Contact import Contact
+from SFQuerier.Contract import Contract
+from SFQuerier.Opportunity import Opportunity
+
+try:
+    import aiohttp
+except ImportError:  # Optional dependency, only needed for the asyncio client
+    aiohttp = None
+
+DEFAULT_API_VERSION = '52.0'
+
+_exceptions = {300: SalesforceMoreThanOneRecord, 400: SalesforceMalformedRequest, 401: SalesforceExpiredSession,
+               403: SalesforceRefusedRequest, 404: SalesforceResourceNotFound}
+
+
+class AsyncSalesforceQ:
+    def __init__(self, instance=None, instance_url=None, username=None, password=None, security_token=None,
+                 organizationId=None, domain='login', session_id=None, version=DEFAULT_API_VERSION,
+                 max_connections=100, max_concurrency=100, timeout=120):
+        """
+        :param instance / instance_url: Salesforce instance, instance_url may carry the scheme (default https)
+        :param username / password / security_token / organizationId / domain: SOAP login, done once on creation
+        :param session_id: existing session (access token), skips the login
+        :param max_connections: size of the shared connection pool
+        :param max_concurrency: max requests in flight at once
+        :param timeout: total seconds per request
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncSalesforceQ requires aiohttp, install it with: pip install aiohttp")
+        scheme = 'https'
+        if instance_url is not None:
+            scheme, _, instance = instance_url.rstrip('/').rpartition('://')
+            scheme = scheme or 'https'
+        if session_id is None:
+            if username is None or password is None or (security_token is None and organizationId is None):
+                raise SalesforceAuthenticationFailed('INVALID AUTH',
+                                                     'You must submit username and password either a security token or '
+                                                     'organizationId for authentication')
+            session_id, instance = SalesforceLogin(username=username, password=password,
+                                                   security_token=security_token, organizationId=organizationId,
+                                                   sf_version=version, domain=domain)
+        if instance is None:
+            raise SalesforceAuthenticationFailed('INVALID AUTH', 'An instance or instance_url is required')
+
+        self.session_id = session_id
+        self.sf_instance = instance
+        self.sf_version = version
+        self.instance_url = f'{scheme}://{instance}'
+        self.base_url = f'{self.instance_url}/services/data/v{version}/'
+        self.headers = {'Content-Type': 'application/json', 'Authorization': 'Bearer ' + session_id}
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._session = None
+        self._semaphore = None
+
+        self.Account = AsyncAccount(self)
+        self.Contact = AsyncContact(self)
+        self.Case = AsyncCase(self)
+        self.CaseComment = AsyncCaseComment(self)
+        self.Opportunity = AsyncOpportunity(self)
+        self.Contract = AsyncContract(self)
+
+    @classmethod
+    def from_client(cls, sq, **kwargs):
+        """Async client reusing the session of an authenticated SalesforceQ"""
+        return cls(session_id=sq.sf.session_id, instance=sq.sf.sf_instance, version=sq.sf.sf_version, **kwargs)
+
+    async def _get_session(self):
+        # Created lazily so the pool binds to the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_connections)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def request(self, method, url, name='', **kwargs):
+        """
+        Send a request through the shared pool, raises the simple-salesforce exception of an error status
+        :return: (status code, decoded JSON body or None)
+        """
+        session = await self._get_session()
+        async with self._semaphore:
+            async with session.request(method, url, **kwargs) as response:
+                status = response.status
+                body = await response.read()
+        content = None
+        if body:
+            try:
+                content = json.loads(body)
+            except ValueError:
+                content = body.decode('utf-8', 'replace')
+        if status >= 300:
+            raise _exceptions.get(status, SalesforceGeneralError)(url, status, name, content)
+        return status, content
+
+    async def restful(self, path, params=None, method='GET', **kwargs):
+        status, content = await self.request(method, self.base_url + path, name=path, params=params, **kwargs)
+        return None if status == 204 else content
+
+    async def _call(self, method, path, params=None, **kwargs):
+        try:
+            return await self.restful(path, params=params, method=method, **kwargs)
+        except Exception as e:
+            return Result.failure(method, e, None)
+
+    async def get(self, path, params=None, **kwargs):
+        """Async direct GET REST call, see SalesforceQ.get
+        :return JSON / False if issue has occurred"""
+        return await self._call('GET', path, params=params, **kwargs)
+
+    async def post(self, path, params=None, **kwargs):
+        """Async direct POST REST call, see SalesforceQ.post
+        :return JSON / False if issue has occurred"""
+        return await self._call('POST', path, params=params, **kwargs)
+
+    async def patch(self, path, params=None, **kwargs):
+        """Async direct PATCH REST call, see SalesforceQ.patch
+        :return JSON / False if issue has occurred"""
+        return await self._call('PATCH', path, params=params, **kwargs)
+
+    async def delete(self, path, params=None, **kwargs):
+        """Async direct DELETE REST call, see SalesforceQ.delete
+        :return JSON / False if issue has occurred"""
+        return await self._call('DELETE', path, params=params, **kwargs)
+
+    async def query(self, soql, include_deleted=False, **kwargs):
+        return await self.restful('queryAll/' if include_deleted else 'query/', params={'q': soql}, **kwargs)
+
+    async def query_more(self, next_records_identifier, identifier_is_url=False, include_deleted=False, **kwargs):
+        if identifier_is_url:
+            url = self.instance_url + next_records_identifier
+        else:
+            url = self.base_url + ('queryAll/' if include_deleted else 'query/') + next_records_identifier
+        return (await self.request('GET', url, name='query_more', **kwargs))[1]
+
+    async def iter_query(self, soql, batch_size=None, include_deleted=False, compact=False, attributes='keep'):
+        """Async generator of parsed records, following nextRecordsUrl lazily one page at a time"""
+        kwargs = {}
+        if batch_size is not None:
+            kwargs['headers'] = {'Sforce-Query-Options': 'batchSize={0}'.format(batch_size)}
+        result = await self.query(soql, include_deleted=include_deleted, **kwargs)
+        while True:
+            next_url = None if result['done'] else result.get('nextRecordsUrl')
+            for record in Parser.parse(result, compact=compact, attributes=attributes):
+                yield record
+            if next_url is None:
+                return
+            result = await self.query_more(next_url, identifier_is_url=True, **kwargs)
+
+    async def query_all(self, soql, include_deleted=False, **kwargs):
+        result = await self.query(soql, include_deleted=include_deleted, **kwargs)
+        records = list(result['records'])
+        while not result['done']:
+            result = await self.query_more(result['nextRecordsUrl'], identifier_is_url=True, **kwargs)
+            records.extend(result['records'])
+        return {'records': records, 'totalSize': len(records), 'done': True}
+
+    async def get_sobject(self, sobject=None, sobject_id=None):
+        """
+        Get sobjects by ID, a list of IDs is fetched concurrently (bounded by max_concurrency)
+        :return JSON objects list / False if issue has occurred,
+                for a list of IDs the IDs that weren't found are listed in the result's .missing
+        """
+        try:
+            if isinstance(sobject_id, str):
+                return [Parser.parse(await self.restful(f'sobjects/{sobject}/{sobject_id}'))]
+            elif isinstance(sobject_id, list):
+                ids = list(dict.fromkeys(sobject_id))
+                results = await asyncio.gather(*[self.restful(f'sobjects/{sobject}/{record_id}') for record_id in ids],
+                                               return_exceptions=True)
+                records, missing = [], []
+                for record_id, result in zip(ids, results):
+                    if isinstance(result, SalesforceResourceNotFound):
+                        missing.append(record_id)
+                    elif isinstance(result, BaseException):
+                        raise result
+                    else:
+                        records.append(Parser.parse(result))
+                if missing:
+                    Result.log.warning("[GET] %d of %d %s IDs were not found", len(missing), len(ids), sobject)
+                return RetrieveResult(records, missing)
+        except Exception as e:
+            return Result.failure('GET', e, None)
+
+    async def get_sobject_type(self, sobject_id):
+        """Get sobject type by ID"""
+        res = await self.get(path=f'ui-api/record-ui/{sobject_id}')
+        if not res:
+            return res
+        od = collections.OrderedDict(sorted(res['layouts'].items(), key=lambda x: x[1]))
+        return list(od.keys())[0]
+
+
+class AsyncSObject:
+    """Async helpers shared by every entity, mirrors get_by_id / create / update / delete of the sync classes"""
+    name = None
+
+    def __init__(self, sq):
+        self._sq = sq
+
+    async def _query(self, soql):
+        return Parser.parse(await self._sq.query(soql))
+
+    async def get_count(self):
+        return (await self._sq.query(QueryBuilder.select(self.name, "Count()").bind()))['totalSize']
+
+    async def get_by_id(self, recordId=None):
+        """
+        :param recordId: ID string / list of IDs fetched concurrently
+        :return: list of records / False if not queried
+        """
+        if recordId is None:
+            return Result.missing(f"{self.name} ID")
+        return await self._sq.get_sobject(self.name, recordId)
+
+    async def create(self, json={}):
+        """
+        :return: Result, .id is the created record ID
+        """
+        started = time.perf_counter()
+        try:
+            status = await self._sq.restful(f'sobjects/{self.name}/', method='POST', json=json)
+            if status and status.get('success'):
+                result = Result.succeeded(status['id'])
+            else:
+                result = Result.rejected('CREATE', status.get('errors') if status else None)
+        except Exception as e:
+            result = Result.failure('CREATE', e, None)
+        result.latency = time.perf_counter() - started
+        return result
+
+    async def update(self, recordId=None, json={}):
+        """
+        :return: Result, falsy if the record wasn't updated
+        """
+        if recordId is None:
+            return Result.missing(f"{self.name} ID")
+        started = time.perf_counter()
+        try:
+            await self._sq.restful(f'sobjects/{self.name}/{recordId}', method='PATCH', json=json)
+            result = Result.succeeded(recordId)
+        except Exception as e:
+            result = Result.failure('UPDATE', e, recordId)
+        result.latency = time.perf_counter() - started
+        return result
+
+    async def delete(self, recordId=None):
+        """
+        :return: Result, falsy if the record wasn't deleted
+        """
+        if recordId is None:
+            return Result.missing(f"{self.name} ID")
+        started = time.perf_counter()
+        try:
+            await self._sq.restful(f'sobjects/{self.name}/{recordId}', method='DELETE')
+            result = Result.succeeded(recordId)
+        except Exception as e:
+            result = Result.failure('DELETE', e, recordId)
+        result.latency = time.perf_counter() - started
+        return result
+
+    async def delete_many(self, recordIds):
+        """Delete records concurrently, :return: BatchResult of Results in input order"""
+        started = time.perf_counter()
+        results = await asyncio.gather(*[self.delete(recordId) for recordId in recordIds])
+        return Result.BatchResult(results, 'DELETE', self.name, time.perf_counter() - started)
+
+
+class AsyncAccount(AsyncSObject):
+    name = 'Account'
+
+    async def get_all(self):
+        return await self._query(Account.SELECT.bind())
+
+    async def get_by_domain(self, website):
+        return await self._query(Account.BY_WEBSITE.bind(website=website))
+
+    async def get_by_name(self, name):
+        return await self._query(Account.BY_NAME.bind(name=name))
+
+    async def get_cases(self, accountId=None):
+        if accountId is None:
+            return Result.missing('Account ID')
+        return await self._query(Case.BY_ACCOUNT.bind(accountId=accountId))
+
+    async def get_contacts(self, accountId=None):
+        if accountId is None:
+            return Result.missing('Account ID')
+        return await self._query(Contact.BY_ACCOUNT.bind(accountId=accountId))
+
+
+class AsyncContact(AsyncSObject):
+    name = 'Contact'
+
+    async def get_account_contacts(self, accountId=None):
+        if accountId is None:
+            return Result.missing('Account ID')
+        return await self._query(Contact.BY_ACCOUNT.bind(accountId=accountId))
+
+    async def get_cases(self, contactId=None):
+        if contactId is None:
+            return Result.missing('Contact ID')
+        return await self._query(Case.BY_CONTACT.bind(contactId=contactId))
+
+
+class AsyncCase(AsyncSObject):
+    name = 'Case'
+
+    async def get_by_number(self, caseNumber=None):
+        if caseNumber is None:
+            return Result.missing('Case number')
+        cases = await self._query(Case.BY_NUMBER.bind(caseNumber=caseNumber))
+        if cases:
+            return cases[0]
+        return Result.rejected('GET', [{'statusCode': 'NOT_FOUND', 'message': "Case was not found",
+                                        'fields': ['CaseNumber']}], caseNumber)
+
+
+class AsyncCaseComment(AsyncSObject):
+    name = 'CaseComment'
+
+    async def add(self, caseId=None, comment=None, isPublished=False):
+        return await self.create({'ParentId': caseId, 'CommentBody': comment, 'IsPublished': isPublished})
+
+
+class AsyncOpportunity(AsyncSObject):
+    name = 'Opportunity'
+
+    async def get_opportunities(self, accountId=None):
+        if accountId is None:
+            return Result.missing('Account ID')
+        return await self._query(Opportunity.BY_ACCOUNT.bind(accountId=accountId))
+
+
+class AsyncContract(AsyncSObject):
+    name = 'Contract'
+
+    async def get_account_contracts(self, accountId=None):
+        if accountId is None:
+            return Result.missing('Account ID')
+        return await self._query(Contract.BY_ACCOUNT.bind(accountId=accountId))
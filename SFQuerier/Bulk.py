@@ -0,0 +1,142 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Bulk.py
+
+"""
+Bulk API 2.0 query export, submits a query job, polls it until completion and streams the CSV
+result pages (Sforce-Locator) into the same records Parser.parse produces. Records carry the attributes
+(type, url) of a REST record when the sobject is known, relationship fields ({'Account': {'Name': ..}}) don't.
+A job that doesn't complete within the timeout is aborted so it stops counting against the org's Bulk limits.
+https://developer.salesforce.com/docs/atlas.en-us.api_asynch.meta/api_asynch/queries.htm
+"""
+import csv
+import io
+import re
+import time
+from urllib.parse import urlsplit
+
+from simple_salesforce.exceptions import SalesforceGeneralError
+from simple_salesforce.util import exception_handler
+
+from SFQuerier import Parser
+from SFQuerier.Result import log
+
+JOB_DONE = 'JobComplete'
+JOB_FAILED = ('Failed', 'Aborted')
+
+_FROM = re.compile(r'\sFROM\s+(\w+)', re.I)
+
+
+def create_job(sf, soql, include_deleted=False):
+    """
+    Submit a Bulk 2.0 query job
+    :return: job info dict (id, state, ...)
+    """
+    return sf.restful('jobs/query', method='POST',
+                      json={'operation': 'queryAll' if include_deleted else 'query', 'query': soql})
+
+
+def wait_for_job(sf, job_id, poll_interval=2.0, timeout=None):
+    """
+    Poll a query job until it completes, polling starts fast and backs off up to poll_interval
+    :return: job info dict
+    """
+    started = time.monotonic()
+    delay = min(0.5, poll_interval)
+    while True:
+        job = sf.restful(f'jobs/query/{job_id}')
+        if job['state'] == JOB_DONE:
+            return job
+        if job['state'] in JOB_FAILED:
+            raise SalesforceGeneralError(sf.base_url + f'jobs/query/{job_id}', 200, 'jobs/query', job)
+        if timeout is not None and time.monotonic() - started > timeout:
+            abort_job(sf, job_id)
+            raise TimeoutError(f"Bulk query job {job_id} did not complete within {timeout} seconds")
+        time.sleep(delay)
+        delay = min(delay * 2, poll_interval)
+
+
+def abort_job(sf, job_id):
+    """Abort a query job, a failure is logged, the job then runs to its end in the org"""
+    try:
+        sf.restful(f'jobs/query/{job_id}', method='PATCH', json={'state': 'Aborted'})
+    except Exception as e:
+        log.warning("[BULK] Could not abort query job %s: %s", job_id, e)
+
+
+def sobject_of(soql):
+    """:return: sobject of a SOQL query's FROM / None"""
+    match = _FROM.search(soql)
+    return match.group(1) if match else None
+
+
+def iter_result_pages(sf, job_id, page_size=None, sobject=None):
+    """
+    Yield the CSV result pages of a completed query job as lists of row dicts
+    :param page_size: maxRecords per result page, Salesforce default if None
+    :param sobject: queried sobject, records get the attributes of a REST record if given
+    """
+    url = sf.base_url + f'jobs/query/{job_id}/results'
+    records_url = urlsplit(sf.base_url).path + f'sobjects/{sobject}/' if sobject else None
+    headers = dict(sf.headers, Accept='text/csv')
+    locator = None
+    while True:
+        params = {}
+        if page_size is not None:
+            params['maxRecords'] = page_size
+        if locator is not None:
+            params['locator'] = locator
+        response = sf.session.request('GET', url, headers=headers, params=params)
+        if response.status_code >= 300:
+            exception_handler(response, name='jobs/query')
+        response.encoding = 'utf-8'
+        rows = csv.DictReader(io.StringIO(response.text))
+        if sobject:
+            yield [_row_to_record(row, sobject, records_url) for row in rows]
+        else:
+            yield [_row_to_record(row) for row in rows]
+        locator = response.headers.get('Sforce-Locator')
+        if not locator or locator == 'null':
+            return
+
+
+def _row_to_record(row, sobject=None, records_url=None):
+    """CSV row to the nested dict shape of a REST record, 'Account.Name' columns become {'Account': {'Name': ..}}"""
+    record = {}
+    if sobject:
+        record_id = row.get('Id')
+        record['attributes'] = {'type': sobject, 'url': records_url + record_id if record_id else None}
+    for column, value in row.items():
+        value = value if value != '' else None  # Bulk CSV has no null, empty columns are null fields
+        if '.' in column:
+            path = column.split('.')
+            parent = record
+            for name in path[:-1]:
+                child = parent.get(name)
+                if not isinstance(child, dict):
+                    child = parent[name] = {}
+                parent = child
+            parent[path[-1]] = value
+        else:
+            record[column] = value
+    return record
+
+
+def export(sf, soql, include_deleted=False, page_size=None, poll_interval=2.0, timeout=None, compact=False,
+           attributes='keep'):
+    """
+    Run a SOQL query through Bulk API 2.0 and stream the parsed records one result page at a time
+    :param sf: simple-salesforce client
+    :param soql: SOQL query
+    :param include_deleted: queryAll operation to include deleted / archived records
+    :param page_size: records per result page, Salesforce default if None
+    :param poll_interval: max seconds between job state polls
+    :param timeout: seconds to wait for the job to complete, no limit if None
+    :param compact / attributes: record options, see Parser.parse
+    :return: generator of records
+    """
+    job = create_job(sf, soql, include_deleted=include_deleted)
+    wait_for_job(sf, job['id'], poll_interval=poll_interval, timeout=timeout)
+    for page in iter_result_pages(sf, job['id'], page_size=page_size, sobject=sobject_of(soql)):
+        yield from Parser.parse({'records': page}, compact=compact, attributes=attributes)
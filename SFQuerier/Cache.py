@@ -0,0 +1,252 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Cache.py
+
+"""
+Read-through record cache for single record lookups (get_by_id / get_by_number).
+Records are kept in an in-process LRU with a TTL, optionally in front of a shared backend (e.g. Redis) so
+several processes reuse each other's lookups. Entries are keyed by sobject and 15 character ID. A lookup by
+another field (Case.CaseNumber) selects fewer fields than get_by_id, its record is kept in a key space of its
+own (sobject, ID and field) behind an alias from the field value to the ID, invalidating the ID drops both.
+
+The write paths of the entity classes (update, delete, *_many, purge) invalidate the records they touch.
+Another process invalidating the shared backend doesn't reach this process' LRU, the TTL bounds how stale
+its copy can get. Cached records are shared objects, don't modify them in place.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # Optional, only needed by RedisBackend
+    redis = None
+
+MAXSIZE = 1024
+TTL = 60  # Seconds
+
+MISSING = object()
+
+ALIAS_FIELDS = {'Case': ('CaseNumber',)}  # Lookup fields invalidate drops, fields cached by put are added
+
+
+def _id_key(sobject, record_id):
+    return f"{sobject}:{record_id[:15]}"
+
+
+def _alias_key(sobject, field, value):
+    return f"{sobject}.{field}:{value}"
+
+
+def _field_key(sobject, field, record_id):
+    """Key of a record looked up by field, apart from the full record of _id_key"""
+    return f"{sobject}:{record_id[:15]}:{field}"
+
+
+class CacheBackend:
+    """Interface of a cache store, values are records or alias IDs, get returns MISSING when there is no entry"""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    """Thread-safe in-process LRU, entries expire ttl seconds after they were set"""
+
+    def __init__(self, maxsize=MAXSIZE, ttl=TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()  # key: (expires, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend(CacheBackend):
+    """Shared backend on a Redis server, records are pickled"""
+
+    def __init__(self, client=None, prefix='SFQuerier:', **kwargs):
+        """
+        :param client: redis.Redis client, built from kwargs (host, port, db, ...) if None
+        :param prefix: key prefix, to share one Redis database between orgs use one prefix per org
+        """
+        if client is None:
+            if redis is None:
+                raise ImportError("RedisBackend requires the redis package: pip install redis")
+            client = redis.Redis(**kwargs)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return MISSING if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class RecordCache:
+    def __init__(self, maxsize=MAXSIZE, ttl=TTL, backend=None, backend_ttl=None):
+        """
+        :param maxsize: records kept in the in-process LRU
+        :param ttl: seconds a record is served from the LRU
+        :param backend: shared CacheBackend behind the LRU, None to cache in-process only
+        :param backend_ttl: seconds a record is kept in the backend, ttl if None
+        """
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.backend = backend
+        self.backend_ttl = ttl if backend_ttl is None else backend_ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._fields = {sobject: set(fields) for sobject, fields in ALIAS_FIELDS.items()}
+        self._lock = threading.Lock()  # Guards the counters and _fields, lookups run on the fan-out threads
+
+    def count(self, hit):
+        """Count a lookup as a hit / miss"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _get(self, key):
+        value = self.local.get(key)
+        if value is MISSING and self.backend is not None:
+            value = self.backend.get(key)
+            if value is not MISSING:
+                self.local.set(key, value)
+        return value
+
+    def _set(self, key, value):
+        self.local.set(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value, ttl=self.backend_ttl)
+
+    def get(self, sobject, value, field='Id'):
+        """
+        :param field: 'Id' or the alias field the record was cached by, e.g. 'CaseNumber'
+        :return: cached record / MISSING
+        """
+        if field == 'Id':
+            return self._get(_id_key(sobject, value))
+        record_id = self._get(_alias_key(sobject, field, value))
+        if record_id is MISSING:
+            return MISSING
+        return self._get(_field_key(sobject, field, record_id))
+
+    def put(self, sobject, record, field='Id', value=None):
+        """
+        Cache a record by its Id, or by field=value when field isn't 'Id': the record then only answers lookups
+        by that field, get_by_id still loads the full record
+        """
+        if field == 'Id':
+            self._set(_id_key(sobject, record.Id), record)
+            return
+        with self._lock:
+            self._fields.setdefault(sobject, set()).add(field)
+        self._set(_field_key(sobject, field, record.Id), record)
+        self._set(_alias_key(sobject, field, value), record.Id)
+
+    def invalidate(self, sobject, ids):
+        """Drop the records of the IDs (string / list), aliases pointing to them miss from now on"""
+        for record_id in [ids] if isinstance(ids, str) else ids:
+            if record_id:
+                with self._lock:
+                    fields = tuple(self._fields.get(sobject, ()))
+                keys = [_id_key(sobject, record_id)] + [_field_key(sobject, field, record_id) for field in fields]
+                for key in keys:
+                    self.local.delete(key)
+                    if self.backend is not None:
+                        self.backend.delete(key)
+                with self._lock:
+                    self.invalidations += 1
+
+    def clear(self):
+        self.local.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        """:return: dict [hits, misses, hit_rate, invalidations, evictions, size]"""
+        with self._lock:
+            hits, misses, invalidations = self.hits, self.misses, self.invalidations
+        lookups = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': hits / lookups if lookups else 0.0,
+                'invalidations': invalidations, 'evictions': self.local.evictions, 'size': len(self.local)}
+
+
+def read_through(cache, sobject, value, loader, field='Id'):
+    """
+    Cached record, loaded with loader() and cached on a miss, loader is called directly if there is no cache
+    :param cache: RecordCache / None
+    :param value: record ID, or the value of field
+    :param loader: callable returning the record, or None if it doesn't exist (not cached)
+    :return: record / None
+    """
+    if cache is None:
+        return loader()
+    record = cache.get(sobject, value, field=field)
+    if record is not MISSING:
+        cache.count(True)
+        return record
+    cache.count(False)
+    record = loader()
+    if record is not None and getattr(record, 'Id', None):
+        cache.put(sobject, record, field=field, value=value)
+    return record
+
+
+def invalidate(cache, sobject, ids):
+    """Drop the records of the IDs from the cache, nothing to do if there is no cache"""
+    if cache is not None and ids:
+        cache.invalidate(sobject, ids)
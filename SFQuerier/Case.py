@@ -5,16 +5,45 @@
 
 import collections
 
-from simple_salesforce import SalesforceMalformedRequest, SalesforceResourceNotFound
-
-from SFQuerier import Parser
+from SFQuerier import Bulk, Cache, Collections, Columnar, Entity, Mirror, Paging, Parser, QueryBuilder, Result
 from SFQuerier.CaseComment import CaseComment
 
 
 class Case:
-    def __init__(self, sf):
+    SELECT = QueryBuilder.select('Case', "Id,AccountId,CaseNumber,ContactId,Description,ParentId,Status")
+    BY_NUMBER = SELECT.where("CaseNumber = :caseNumber")
+    BY_ACCOUNT = QueryBuilder.select('Case', "Id,CaseNumber,ContactId,AccountId,Type,Status,Subject,Description") \
+        .where("AccountId = :accountId")
+    BY_CONTACT = QueryBuilder.select('Case', "Id,CaseNumber,ContactId,AccountId").where("ContactId = :contactId")
+    COUNT = QueryBuilder.select('Case', "Count()")
+
+    def __init__(self, sf, sq=None):
         self._sf = sf
-        self.CaseComment = CaseComment(sf)
+        self._sq = sq
+
+    @property
+    def _executor(self):
+        """FanOutExecutor of the owning SalesforceQ, calls run one after the other without one"""
+        return self._sq.executor if self._sq is not None else None
+
+    @property
+    def CaseComment(self):
+        return Entity.shared(self, CaseComment)
+
+    @property
+    def _cache(self):
+        """RecordCache of the owning SalesforceQ, None if caching is off"""
+        return self._sq.cache if self._sq is not None else None
+
+    @property
+    def _mirror(self):
+        """Mirror.SQLiteMirror of the owning SalesforceQ, None if lookups always query the API"""
+        return getattr(self._sq, 'mirror', None)
+
+    @property
+    def _metadata(self):
+        """MetadataCache of the owning SalesforceQ"""
+        return getattr(self._sq, 'metadata', None)
 
     def get_by_number(self, caseNumber=None):
         """
@@ -23,16 +52,19 @@ class Case:
         :return: Queried case
         """
         if caseNumber is not None:
-            case = self._sf.query(
-                f"SELECT Id,AccountId,CaseNumber,ContactId,Description,ParentId,Status FROM Case WHERE CaseNumber='{caseNumber}'")
-            if case['totalSize'] != 0:
-                return Parser.parse(case)[0]
+            def load():
+                cases = Mirror.lookup(self._mirror, 'Case', self.BY_NUMBER.fields, 'CaseNumber', caseNumber,
+                                      lambda: Parser.parse(self._sf.query(self.BY_NUMBER.bind(caseNumber=caseNumber))))
+                return cases[0] if cases else None
+
+            case = Cache.read_through(self._cache, 'Case', caseNumber, load, field='CaseNumber')
+            if case is not None:
+                return case
             else:
-                print("Case was not found")
-                return False
+                return Result.rejected('GET', [{'statusCode': 'NOT_FOUND', 'message': "Case was not found",
+                                                'fields': ['CaseNumber']}], caseNumber)
         else:
-            print("Case number is missing!")
-            return False
+            return Result.missing('Case number')
 
     def get_by_id(self, caseId=None):
         """
@@ -42,75 +74,80 @@ class Case:
         """
         if caseId is not None:
             try:
-                case = self._sf.Account.get(caseId)
-                # account =self.sf.query("SELECT Id,AccountNumber,Name,CreatedDate,Website FROM Account WHERE Id= '{id}'".format(id=id))
-                return Parser.parse(case)
-            except SalesforceResourceNotFound as e:  # Not found
-                print(
-                    "[GET]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                    name=e.resource_name,
-                                                                                    errorCode=e.content[0][
-                                                                                        'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Field doesn't exist
-                print("[GET]{errorCode}: Malformed request {url}. {message} ID: {id}".format(
-                    message=e.content[0]['message'],
-                    url=e.url,
-                    errorCode=e.content[0][
-                        'errorCode'], id=caseId))
-                return False
+                return Cache.read_through(self._cache, 'Case', caseId, lambda: Parser.parse(self._sf.Case.get(caseId)))
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
-
-            return False
+                return Result.failure('GET', e, caseId)
         else:
-            print("Account ID is missing!")
-            return False
+            return Result.missing('Case ID')
+
+    def iter_all(self, batch_size=None, compact=False, attributes='keep'):
+        """
+        Stream all cases one page at a time, memory stays flat regardless of the org size
+        :param batch_size: records per page (200-2000), Salesforce default if None
+        :param compact: yield __slots__ records instead of SimpleNamespace, see Parser.parse
+        :param attributes: 'keep' / 'intern' / 'drop' the attributes payload of compact records
+        :return: generator of cases
+        """
+        return Paging.iter_query(self._sf, self.SELECT.bind(), batch_size=batch_size, compact=compact,
+                                 attributes=attributes)
+
+    def export(self, page_size=None, poll_interval=2.0, timeout=None, compact=False, attributes='keep'):
+        """
+        Export all cases through a Bulk API 2.0 query job, streamed one CSV result page at a time
+        :param page_size: records per result page, Salesforce default if None
+        :param poll_interval: max seconds between job state polls
+        :param timeout: seconds to wait for the job to complete, no limit if None
+        :param compact: yield __slots__ records instead of SimpleNamespace, see Parser.parse
+        :param attributes: 'keep' / 'intern' / 'drop' the attributes payload of compact records
+        :return: generator of cases
+        """
+        return Bulk.export(self._sf, self.SELECT.bind(), page_size=page_size, poll_interval=poll_interval,
+                           timeout=timeout, compact=compact, attributes=attributes)
+
+    def get_columns(self, fields="Id,AccountId,CaseNumber,ContactId,ParentId,Status,CreatedDate,ClosedDate",
+                    where_query=None, batch_size=None, bulk=False):
+        """
+        Cases as typed columns for vectorized aggregation, see Columnar.ColumnarResult
+        EXAMPLE: .get_columns(where_query="IsClosed = true").to_arrow().group_by('Status').aggregate(...)
+        :param fields: comma separated fields, relationship fields (Account.Name) included
+        :param where_query: SOQL condition, every case if None
+        :param batch_size: records per query page (200-2000), Salesforce default if None
+        :param bulk: run the query as a Bulk API 2.0 job, for pulls of millions of rows
+        :return: ColumnarResult
+        """
+        query = QueryBuilder.select('Case', fields)
+        if where_query:
+            query = query.where(where_query)
+        return Columnar.query(self._sf, query.bind(), batch_size=batch_size, bulk=bulk, metadata=self._metadata)
 
     def get_count(self):
         """
         Number of cases in database
         :return: Integer
         """
-        return (self._sf.query("SELECT Count() from Case"))['totalSize']
+        return (self._sf.query(self.COUNT.bind()))['totalSize']
 
+    @Result.timed
     def create(self, contactId=None, subject=None, description=None):
         """
         Create new user case via contactID,subject,description
         :param description: Case description
         :param subject: Case subject
         :param contactId: Contact ID
-        :return: Created case ID
+        :return: Result, .id is the created case ID
         """
         try:
             case = self._sf.Case.create({'ContactId': contactId, "Subject": subject, "Description": description})
             if isinstance(case, collections.OrderedDict):
                 if case['success'] == True:
-                    return case['id']
+                    return Result.succeeded(case['id'])
                 else:
-                    print(case['errors'])
-                    raise Exception("Case creation failed")
+                    return Result.rejected('CREATE', case.get('errors'))
             else:
                 raise Exception("Case creation failed")
 
-        except SalesforceResourceNotFound as e:
-            print(
-                "[CASE CREATE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                        name=e.resource_name,
-                                                                                        errorCode=e.content[0][
-                                                                                            'errorCode']))
-            return False
-        except SalesforceMalformedRequest as e:  # Field doesn't exist / Required fields are missing
-            print("[CASE CREATE]{errorCode}: Malformed request {url}. {message}".format(message=e.content[0]['message'],
-                                                                                        url=e.url,
-                                                                                        errorCode=e.content[0][
-                                                                                            'errorCode']))
-            return False
         except Exception as e:
-            print("Something went wrong!")
-            print(e)
-        return False
+            return Result.failure('CREATE', e, None)
 
     # def create_case(self, json={}):
     #     """
@@ -147,70 +184,79 @@ class Case:
     #         print(e)
     #     return False
 
+    @Result.timed
     def update(self, id=None, json={}):
         """
         Update SF contact
         :param id: contact ID
         :param json: JSON attributes object to be updated ex: {'LastName': 'Mahameed', 'FirstName': 'Adam'}
-        :return: True/False if account was updated/!updated
+        :return: Result, falsy if the case wasn't updated
         """
         if id is not None:
             try:
                 status = self._sf.Case.update(id, json)  # Status code 204 is returned if info was updated succesfully
+                Cache.invalidate(self._cache, 'Case', id)
                 if status == 204:
-                    print("Case {id} was updated successfully!".format(id=id))
-                    return True
-            except SalesforceResourceNotFound as e:  # Not found
-                print(
-                    "[UPDATE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                       name=e.resource_name,
-                                                                                       errorCode=e.content[0][
-                                                                                           'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Field doesn't exist
-                print("[UPDATE]{errorCode}: Malformed request {url}. {message} ID: {id}".format(
-                    message=e.content[0]['message'],
-                    url=e.url,
-                    errorCode=e.content[0][
-                        'errorCode'], id=id))
-                return False
+                    Result.log.info("Case %s was updated successfully!", id)
+                    return Result.succeeded(id)
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
+                return Result.failure('UPDATE', e, id)
 
-            return False
+            return Result.unexpected_status('UPDATE', status, id)
         else:
-            print("Contact ID is missing!")
-            return False
+            return Result.missing('Case ID')
 
+    @Result.timed
     def delete(self, caseId=None):
         """
         Delete SF case
         :param caseId:
-        :return: True/False
+        :return: Result, falsy if the record wasn't deleted
         """
         if caseId is not None:
             try:
                 status = self._sf.Case.delete(caseId)
+                Cache.invalidate(self._cache, 'Case', caseId)
                 if status == 204:
-                    print("Deleted case ID:{0}".format(caseId))
-                    return True
-            except SalesforceResourceNotFound as e:  # Account doesn't exist
-                print(
-                    "[DELETE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                       name=e.resource_name,
-                                                                                       errorCode=e.content[0][
-                                                                                           'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Deletion failed (could be due account being associated to existing cases)
-                print("[DELETE]{errorCode}: Malformed request {url}. {message},case ID: {id}".format(
-                    message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode'], id=caseId))
-                return False
+                    Result.log.info("Deleted case ID:%s", caseId)
+                    return Result.succeeded(caseId)
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
+                return Result.failure('DELETE', e, caseId)
 
-            return False
+            return Result.unexpected_status('DELETE', status, caseId)
         else:
-            print("Case ID is missing!")
-            return False
+            return Result.missing('Case ID')
+
+    def create_many(self, cases, all_or_none=False):
+        """
+        Create new cases in batches of 200 records per composite/sobjects request
+        :param cases: list of JSON formatted case data ex: {'ContactId': .., 'Subject': .., 'Description': ..}
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per case in input order
+        """
+        return Collections.create(self._sf, 'Case', cases, all_or_none=all_or_none,
+                                  executor=self._executor)
+
+    def update_many(self, cases, all_or_none=False):
+        """
+        Update cases in batches of 200 records per composite/sobjects request
+        :param cases: list of JSON attributes objects including 'Id' / dict of {id: JSON attributes object}
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per case in input order
+        """
+        results = Collections.update(self._sf, 'Case', cases, all_or_none=all_or_none,
+                                     executor=self._executor)
+        Cache.invalidate(self._cache, 'Case', [result.id for result in results])
+        return results
+
+    def delete_many(self, caseIds, all_or_none=False):
+        """
+        Delete cases in batches of 200 records per composite/sobjects request
+        :param caseIds: list of case IDs
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per ID in input order
+        """
+        results = Collections.delete(self._sf, 'Case', caseIds, all_or_none=all_or_none,
+                                     executor=self._executor)
+        Cache.invalidate(self._cache, 'Case', [result.id for result in results])
+        return results
\ No newline at end of file
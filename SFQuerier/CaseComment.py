@@ -8,53 +8,56 @@ TODO:Case.Comment.get
 """
 import collections
 
-from simple_salesforce import SalesforceResourceNotFound, SalesforceMalformedRequest
+from SFQuerier import Collections, Paging, QueryBuilder, Result
 
 
 class CaseComment:
-    def __init__(self, sf):
+    SELECT = QueryBuilder.select('CaseComment', "Id,ParentId,CommentBody,IsPublished")
+
+    def __init__(self, sf, sq=None):
         self._sf = sf
+        self._sq = sq
+
+    @property
+    def _executor(self):
+        """FanOutExecutor of the owning SalesforceQ, calls run one after the other without one"""
+        return self._sq.executor if self._sq is not None else None
+
+    def iter_all(self, batch_size=None, compact=False, attributes='keep'):
+        """
+        Stream all case comments one page at a time, memory stays flat regardless of the org size
+        :param batch_size: records per page (200-2000), Salesforce default if None
+        :param compact: yield __slots__ records instead of SimpleNamespace, see Parser.parse
+        :param attributes: 'keep' / 'intern' / 'drop' the attributes payload of compact records
+        :return: generator of case comments
+        """
+        return Paging.iter_query(self._sf, self.SELECT.bind(), batch_size=batch_size, compact=compact,
+                                 attributes=attributes)
 
+    @Result.timed
     def add(self, caseId=None, comment=None, isPublished=False):
         try:
             comment = self._sf.CaseComment.create(
                 {'ParentId': caseId, 'CommentBody': comment, 'IsPublished': isPublished})
             if isinstance(comment, collections.OrderedDict):
                 if comment['success'] == True:
-                    return comment['id']
+                    return Result.succeeded(comment['id'])
                 else:
-                    print(comment['errors'])
-                    raise Exception("Case creation failed")
+                    return Result.rejected('CREATE', comment.get('errors'))
             else:
-                raise Exception("Case creation failed")
-
-        except SalesforceResourceNotFound as e:
-            print(
-                "[COMMENT CREATE]{errorCode}: Resource {name} not found. {message}".format(
-                    message=e.content[0]['message'],
-                    name=e.resource_name,
-                    errorCode=e.content[0][
-                        'errorCode']))
-            return False
-        except SalesforceMalformedRequest as e:  # Field doesn't exist / Required fields are missing
-            print("[COMMENT CREATE]{errorCode}: Malformed request {url}. {message}".format(
-                message=e.content[0]['message'],
-                url=e.url,
-                errorCode=e.content[0][
-                    'errorCode']))
-            return False
+                raise Exception("Comment creation failed")
+
         except Exception as e:
-            print("Something went wrong!")
-            print(e)
-        return False
+            return Result.failure('CREATE', e, None)
 
+    @Result.timed
     def update(self, commentId=None, comment=None, isPublished=None):
         """
         Update SF comment
         :param isPublished: boolean if comment is public
         :param commentId: comment ID
         :param comment: New comment value
-        :return: True/False if comment was updated/!updated
+        :return: Result, falsy if the comment wasn't updated
         """
         if commentId is not None:
             try:
@@ -66,58 +69,60 @@ class CaseComment:
                         "CommentBody": comment,
                         "IsPublished": isPublished})  # Status code 204 is returned if info was updated succesfully
                 if status == 204:
-                    return True
-            except SalesforceResourceNotFound as e:  # Not found
-                print(
-                    "[UPDATE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                       name=e.resource_name,
-                                                                                       errorCode=e.content[0][
-                                                                                           'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Field doesn't exist
-                print("[UPDATE]{errorCode}: Malformed request {url}. {message} ID: {id}".format(
-                    message=e.content[0]['message'],
-                    url=e.url,
-                    errorCode=e.content[0][
-                        'errorCode'], id=commentId))
-                return False
+                    return Result.succeeded(commentId)
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
+                return Result.failure('UPDATE', e, commentId)
 
-            return False
+            return Result.unexpected_status('UPDATE', status, commentId)
         else:
-            print("Comment ID is missing!")
-            return False
+            return Result.missing('Comment ID')
 
+    @Result.timed
     def delete(self, commentId=None):
         """
         Delete SF Comment
         :param commentId: comment ID to be deleted
-        :return: bool if deleted
+        :return: Result, falsy if the record wasn't deleted
         """
         if commentId is not None:
             try:
                 status = self._sf.CaseComment.delete(commentId)
                 if status == 204:
-                    print("Deleted comment ID:{0}".format(commentId))
-                    return True
-            except SalesforceResourceNotFound as e:  # Account doesn't exist
-                print(
-                    "[DELETE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                       name=e.resource_name,
-                                                                                       errorCode=e.content[0][
-                                                                                           'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Deletion failed (could be due account being associated to existing cases)
-                print("[DELETE]{errorCode}: Malformed request {url}. {message},contact ID: {id}".format(
-                    message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode'], id=commentId))
-                return False
+                    Result.log.info("Deleted comment ID:%s", commentId)
+                    return Result.succeeded(commentId)
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
+                return Result.failure('DELETE', e, commentId)
 
-            return False
+            return Result.unexpected_status('DELETE', status, commentId)
         else:
-            print("Contact ID is missing!")
-            return False
+            return Result.missing('Comment ID')
+
+    def add_many(self, comments, all_or_none=False):
+        """
+        Add case comments in batches of 200 records per composite/sobjects request
+        :param comments: list of JSON formatted comment data ex: {'ParentId': caseId, 'CommentBody': .., 'IsPublished': False}
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per comment in input order
+        """
+        return Collections.create(self._sf, 'CaseComment', comments, all_or_none=all_or_none,
+                                  executor=self._executor)
+
+    def update_many(self, comments, all_or_none=False):
+        """
+        Update comments in batches of 200 records per composite/sobjects request
+        :param comments: list of JSON attributes objects including 'Id' / dict of {id: JSON attributes object}
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per comment in input order
+        """
+        return Collections.update(self._sf, 'CaseComment', comments, all_or_none=all_or_none,
+                                  executor=self._executor)
+
+    def delete_many(self, commentIds, all_or_none=False):
+        """
+        Delete comments in batches of 200 records per composite/sobjects request
+        :param commentIds: list of comment IDs
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per ID in input order
+        """
+        return Collections.delete(self._sf, 'CaseComment', commentIds, all_or_none=all_or_none,
+                                  executor=self._executor)
\ No newline at end of file
@@ -0,0 +1,170 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Collections.py
+
+"""
+sObject Collections, create / update / delete up to 200 records per composite/sobjects request.
+https://developer.salesforce.com/docs/atlas.en-us.api_rest.meta/api_rest/resources_composite_sobjects_collections.htm
+
+Every record gets its own Result (id, success, errors, latency) in input order, allOrNone is off by default
+so a failing record doesn't roll back the rest of its chunk, and a chunk whose request fails entirely
+is reported as failed records without aborting the following chunks.
+
+Batched reads go through SOQL 'WHERE Id IN (...)' queries, chunked so each query URL stays under the
+request URI limit.
+"""
+import logging
+import time
+
+from SFQuerier import Paging, QueryBuilder
+from SFQuerier.Executor import fan_out
+from SFQuerier.Result import BatchResult, Result, error_details, log
+
+CHUNK_SIZE = 200
+MAX_QUERY_URL_LENGTH = QueryBuilder.MAX_QUERY_URL_LENGTH
+MAX_IDS_PER_QUERY = 800
+
+_queryable_fields = {}
+
+
+def chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _failed_chunk(e, ids, latency=None):
+    """Per-record failure results for a chunk whose whole request failed"""
+    errors = error_details(e)
+    return [Result(False, record_id, errors, latency) for record_id in ids]
+
+
+def _send(sf, method, ids, **kwargs):
+    started = time.perf_counter()
+    try:
+        results = sf.restful('composite/sobjects', method=method, **kwargs)
+    except Exception as e:
+        return _failed_chunk(e, ids, time.perf_counter() - started)
+    latency = time.perf_counter() - started
+    return [Result(result['success'], result.get('id') or record_id, result.get('errors'), latency)
+            for result, record_id in zip(results or [], ids)]
+
+
+def _batch(action, sobject, chunk_results, started):
+    """One BatchResult for the chunk results, a single log line if records failed"""
+    results = BatchResult([result for results in chunk_results for result in results], action, sobject,
+                          time.perf_counter() - started)
+    if log.isEnabledFor(logging.WARNING) and results.failures:
+        log.warning("%s", results.report())
+    return results
+
+
+def create(sf, sobject, records, all_or_none=False, executor=None):
+    """
+    Create records in chunks of 200
+    :param sf: simple-salesforce client
+    :param sobject: sobject name, e.g. 'Case'
+    :param records: list of field dicts
+    :param all_or_none: roll back the whole chunk if any record fails
+    :param executor: FanOutExecutor sending the chunks concurrently, one after the other if None
+    :return: BatchResult, one Result (id, success, errors, latency) per record in input order
+    """
+    def send(chunk):
+        body = {'allOrNone': all_or_none,
+                'records': [dict(record, attributes={'type': sobject}) for record in chunk]}
+        return _send(sf, 'POST', [None] * len(chunk), json=body)
+
+    started = time.perf_counter()
+    return _batch('CREATE', sobject, fan_out(executor, send, list(chunks(list(records)))), started)
+
+
+def update(sf, sobject, records, all_or_none=False, executor=None):
+    """
+    Update records in chunks of 200
+    :param records: list of field dicts including 'Id' / dict of {id: field dict}
+    :return: BatchResult, one Result per record in input order
+    """
+    if isinstance(records, dict):
+        records = [dict(fields, Id=record_id) for record_id, fields in records.items()]
+
+    def send(chunk):
+        body = {'allOrNone': all_or_none,
+                'records': [dict(record, attributes={'type': sobject}) for record in chunk]}
+        return _send(sf, 'PATCH', [record.get('Id') for record in chunk], json=body)
+
+    started = time.perf_counter()
+    return _batch('UPDATE', sobject, fan_out(executor, send, list(chunks(list(records)))), started)
+
+
+def delete(sf, sobject, ids, all_or_none=False, executor=None):
+    """
+    Delete records in chunks of 200
+    :param ids: list of record IDs
+    :return: BatchResult, one Result per ID in input order
+    """
+    def send(chunk):
+        params = {'ids': ','.join(chunk), 'allOrNone': str(all_or_none).lower()}
+        return _send(sf, 'DELETE', chunk, params=params)
+
+    started = time.perf_counter()
+    return _batch('DELETE', sobject, fan_out(executor, send, list(chunks(list(ids)))), started)
+
+
+class RetrieveResult(list):
+    """Records of a batched retrieve in input ID order, IDs that weren't found are listed in .missing"""
+
+    def __init__(self, records=(), missing=()):
+        super().__init__(records)
+        self.missing = list(missing)
+
+
+def queryable_fields(sf, sobject, metadata=None):
+    """All field names of an sobject that can be selected in SOQL (base64 fields can't), described once"""
+    if metadata is not None:
+        return metadata.field_names(sobject, queryable=True)
+    key = (sf.base_url, sobject)
+    if key not in _queryable_fields:
+        describe = sf.__getattr__(sobject).describe()
+        _queryable_fields[key] = [field['name'] for field in describe['fields'] if field['type'] != 'base64']
+    return _queryable_fields[key]
+
+
+def id_chunks(select, ids, max_length=MAX_QUERY_URL_LENGTH, max_ids=MAX_IDS_PER_QUERY):
+    """
+    Split IDs into "{select} WHERE Id IN (...)" queries, each query fits max_length once URL encoded
+    :return: generator of SOQL queries
+    """
+    return QueryBuilder.compile(select + " WHERE Id IN :ids").bind_chunks('ids', ids, max_length=max_length,
+                                                                          max_values=max_ids)
+
+
+def retrieve(sf, sobject, ids, fields=None, executor=None, metadata=None):
+    """
+    Get many records by ID with one query per chunk of IDs instead of one request per ID
+    :param sf: simple-salesforce client
+    :param sobject: sobject name, e.g. 'Account'
+    :param ids: list of record IDs (15 or 18 characters)
+    :param fields: field names to select, every queryable field (like sobject.get) if None
+    :param executor: FanOutExecutor running the chunk queries concurrently, one after the other if None
+    :param metadata: Metadata.MetadataCache the field list is read from, one describe per process if None
+    :return: RetrieveResult, records in input order with the IDs that weren't found in .missing
+    """
+    ids = list(dict.fromkeys(ids))
+    select = "SELECT {0} FROM {1}".format(','.join(fields or queryable_fields(sf, sobject, metadata)), sobject)
+    pages = fan_out(executor, lambda soql: list(Paging.iter_query(sf, soql)), list(id_chunks(select, ids)))
+    if pages.errors:
+        raise pages.errors[0][2]
+    found = {}
+    for page in pages:
+        for record in page:
+            found[record.Id[:15]] = record
+    records, missing = [], []
+    for record_id in ids:
+        record = found.get(record_id[:15])
+        if record is None:
+            missing.append(record_id)
+        else:
+            records.append(record)
+    if missing:
+        log.warning("[GET] %d of %d %s IDs were not found", len(missing), len(ids), sobject)
+    return RetrieveResult(records, missing)
@@ -0,0 +1,295 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Columnar.py
+
+"""
+Columnar query results: the records of every query page are appended straight to one typed buffer per field
+(array / bytearray, no record objects are built) and handed over to NumPy, Arrow or Parquet in one piece.
+
+Column types come from describe (cached by Metadata.MetadataCache):
+- double / currency / percent: float64, null is NaN
+- int / long: int64, float64 with NaN if the column has nulls
+- boolean: bool, object with None if the column has nulls
+- datetime: datetime64[ms] (UTC), date: datetime64[D], null is NaT
+- everything else (id, reference, string, picklist, time, ...): object / Arrow string
+Bulk API 2.0 CSV pages (text values) are converted with the same types.
+SELECT lists of plain and relationship fields (Account.Name) are supported, subqueries and aggregates aren't.
+Field names are case-insensitive like in SOQL, each is matched to the casing of the record keys on the first
+page that has a value for it, the columns keep the SELECT casing.
+"""
+import math
+import re
+from array import array
+from datetime import date, datetime
+
+from SFQuerier import Bulk, Paging
+from SFQuerier.Sync import from_salesforce
+
+try:
+    import numpy
+except ImportError:  # Optional, only needed by to_numpy_columns / to_arrow
+    numpy = None
+
+
+FLOAT = 'float'
+INT = 'int'
+BOOL = 'bool'
+DATETIME = 'datetime'
+DATE = 'date'
+STRING = 'string'
+
+KINDS = {'double': FLOAT, 'currency': FLOAT, 'percent': FLOAT, 'int': INT, 'long': INT, 'boolean': BOOL,
+         'datetime': DATETIME, 'date': DATE}
+
+_SELECT = re.compile(r'^\s*SELECT\s+(.+?)\s+FROM\s+(\w+)', re.I | re.S)
+_EPOCH = datetime(1970, 1, 1).toordinal()
+_NAN = float('nan')
+
+
+def _pyarrow():
+    """pyarrow, imported on first use, it's heavy and only the Arrow / Parquet paths need it"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:  # Optional, only needed by to_arrow / to_parquet
+        raise ImportError("to_arrow / to_parquet require the pyarrow package: pip install pyarrow") from None
+    if numpy is None:
+        raise ImportError("to_arrow / to_parquet require the numpy package: pip install numpy")
+    return pyarrow
+
+
+def _epoch_ms(value):
+    """Milliseconds since the epoch of a Salesforce datetime, e.g. '2021-04-05T10:00:00.000+0000'"""
+    return math.floor(from_salesforce(value).timestamp() * 1000 + 0.5)
+
+
+def _epoch_days(value):
+    return date.fromisoformat(value[:10]).toordinal() - _EPOCH
+
+
+def _bool(value):
+    return value is True or value == 'true'
+
+
+_CONVERT = {INT: int, BOOL: _bool, DATETIME: _epoch_ms, DATE: _epoch_days}
+
+
+def parse_select(soql):
+    """
+    :return: (sobject, [field]) of a SOQL query
+    :raise ValueError: subquery / aggregate in the SELECT list
+    """
+    match = _SELECT.match(soql)
+    if match is None or '(' in match.group(1):
+        raise ValueError("Columnar results need a SELECT of plain / relationship fields: {0}".format(soql))
+    return match.group(2), [field.strip() for field in match.group(1).split(',')]
+
+
+def _describe_fields(sf, sobject, metadata=None):
+    return metadata.fields(sobject) if metadata is not None else sf.__getattr__(sobject).describe()['fields']
+
+
+def field_types(sf, sobject, fields, metadata=None):
+    """
+    Describe types of selected fields, relationship fields are resolved through the describe of the parent
+    :param metadata: MetadataCache, sf describe calls if None
+    :return: dict of {field: describe type}, 'string' for a field describe doesn't list
+    """
+    cache = {}
+
+    def described(name):
+        if name not in cache:
+            cache[name] = _describe_fields(sf, name, metadata)
+        return cache[name]
+
+    types = {}
+    for field in fields:
+        sobject_name, path = sobject, field.split('.')
+        for relationship in path[:-1]:
+            parent = next((item for item in described(sobject_name)
+                           if (item.get('relationshipName') or '').lower() == relationship.lower()), None)
+            sobject_name = parent['referenceTo'][0] if parent and parent.get('referenceTo') else None
+            if sobject_name is None:
+                break
+        found = None
+        if sobject_name is not None:
+            found = next((item for item in described(sobject_name) if item['name'].lower() == path[-1].lower()),
+                         None)
+        types[field] = found['type'] if found else 'string'
+    return types
+
+
+class Column:
+    """Typed buffer of one field, values are appended page by page"""
+
+    def __init__(self, name, field_type='string'):
+        """:param field_type: describe type of the field"""
+        self.name = name
+        self.field_type = field_type
+        self.kind = KINDS.get(field_type, STRING)
+        self.values = array('d') if self.kind == FLOAT else bytearray() if self.kind == BOOL else \
+            array('q') if self.kind in (INT, DATETIME, DATE) else []
+        self.valid = bytearray() if self.kind in (INT, BOOL, DATETIME, DATE) else None  # 1 for a non null value
+        self.nulls = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def extend(self, values):
+        """Append a page of values (JSON values or Bulk CSV text, None for null)"""
+        if self.kind == STRING:
+            self.values.extend(values)
+            self.nulls += sum(1 for value in values if value is None)
+        elif self.kind == FLOAT:
+            self.values.extend([_NAN if value is None else float(value) for value in values])
+        else:
+            convert = _CONVERT[self.kind]
+            valid = [value is not None for value in values]
+            self.valid.extend(valid)
+            self.nulls += len(valid) - sum(valid)
+            self.values.extend([convert(value) if value is not None else 0 for value in values])
+
+    def _nulls_mask(self):
+        """:return: bool array, True for the null values"""
+        return ~numpy.frombuffer(bytes(self.valid), dtype=numpy.bool_)
+
+    def to_numpy(self):
+        """:return: numpy array, see the module docstring for the dtypes"""
+        if numpy is None:
+            raise ImportError("to_numpy requires the numpy package: pip install numpy")
+        if self.kind == STRING:
+            values = numpy.empty(len(self.values), dtype=object)
+            values[:] = self.values
+            return values
+        if self.kind == FLOAT:
+            return numpy.array(self.values, dtype=numpy.float64)
+        mask = self._nulls_mask()
+        if self.kind == BOOL:
+            values = numpy.frombuffer(bytes(self.values), dtype=numpy.bool_).copy()
+            if self.nulls:
+                values = values.astype(object)
+                values[mask] = None
+            return values
+        values = numpy.array(self.values, dtype=numpy.int64)
+        if self.kind == INT:
+            if self.nulls:
+                values = values.astype(numpy.float64)
+                values[mask] = numpy.nan
+            return values
+        values = values.view('datetime64[ms]' if self.kind == DATETIME else 'datetime64[D]')
+        values[mask] = numpy.datetime64('NaT')
+        return values
+
+    def to_arrow(self):
+        """:return: pyarrow Array, nulls as Arrow nulls"""
+        pyarrow = _pyarrow()
+        if self.kind == STRING:
+            return pyarrow.array(self.values, type=pyarrow.string())
+        if self.kind == FLOAT:
+            return pyarrow.array(numpy.array(self.values, dtype=numpy.float64), from_pandas=True)
+        mask = self._nulls_mask() if self.nulls else None
+        if self.kind == BOOL:
+            return pyarrow.array(numpy.frombuffer(bytes(self.values), dtype=numpy.bool_), mask=mask)
+        values = numpy.array(self.values, dtype=numpy.int64)
+        if self.kind == INT:
+            return pyarrow.array(values, mask=mask)
+        if self.kind == DATETIME:
+            return pyarrow.array(values, type=pyarrow.timestamp('ms', tz='UTC'), mask=mask)
+        return pyarrow.array(values.astype(numpy.int32), type=pyarrow.date32(), mask=mask)
+
+
+class ColumnarResult:
+    def __init__(self, fields, types=None, sobject=None):
+        """
+        :param fields: selected fields, in column order
+        :param types: dict of {field: describe type}, 'string' for a missing field
+        """
+        self.sobject = sobject
+        self.columns = {field: Column(field, (types or {}).get(field, 'string')) for field in fields}
+        self._paths = {field: field.split('.') for field in fields}  # Record keys of every field
+        self._unresolved = set(fields)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    @property
+    def fields(self):
+        return list(self.columns)
+
+    def _resolve(self, records):
+        """Match the SELECT fields (and relationship path segments) to the casing of the record keys"""
+        for field in list(self._unresolved):
+            path, level = [], records
+            for name in field.split('.'):
+                sample = next((item for item in level if isinstance(item, dict)), None)
+                if sample is None:  # No value on this page to match against
+                    break
+                key = {key.lower(): key for key in sample}.get(name.lower(), name)
+                path.append(key)
+                level = [item.get(key) for item in level if isinstance(item, dict)]
+            else:
+                self._paths[field] = path
+                self._unresolved.discard(field)
+
+    def append_page(self, records):
+        """Append a page of records (decoded JSON / Bulk.iter_result_pages dicts) to the column buffers"""
+        if self._unresolved and records:
+            self._resolve(records)
+        for field, column in self.columns.items():
+            path = self._paths[field]
+            if len(path) == 1:
+                column.extend([record.get(path[0]) for record in records])
+                continue
+            values = []
+            for record in records:
+                value = record
+                for name in path:
+                    value = value.get(name) if isinstance(value, dict) else None
+                values.append(value)
+            column.extend(values)
+
+    def to_numpy_columns(self):
+        """
+        :return: dict of {field: numpy array}, e.g. result.to_numpy_columns()['Amount'].sum()
+        """
+        return {field: column.to_numpy() for field, column in self.columns.items()}
+
+    def to_arrow(self):
+        """:return: pyarrow Table, one column per field"""
+        return _pyarrow().table({field: column.to_arrow() for field, column in self.columns.items()})
+
+    def to_parquet(self, path, **kwargs):
+        """
+        Write the result to a Parquet file
+        :param kwargs: pyarrow.parquet.write_table options, e.g. compression='zstd'
+        """
+        _pyarrow().parquet.write_table(self.to_arrow(), path, **kwargs)
+
+
+def query(sf, soql, batch_size=None, include_deleted=False, bulk=False, types=None, metadata=None, page_size=None,
+          poll_interval=2.0, timeout=None):
+    """
+    Run a SOQL query into a ColumnarResult, one page at a time
+    :param sf: simple-salesforce client
+    :param batch_size: records per REST query page (200-2000), Salesforce default if None
+    :param include_deleted: include deleted / archived records (queryAll)
+    :param bulk: run the query as a Bulk API 2.0 job (page_size / poll_interval / timeout, see Bulk.export)
+    :param types: dict of {field: describe type}, described (metadata / sf) if None
+    :param metadata: MetadataCache the types are described with
+    :return: ColumnarResult
+    """
+    sobject, fields = parse_select(soql)
+    if types is None:
+        types = field_types(sf, sobject, fields, metadata)
+    result = ColumnarResult(fields, types, sobject)
+    if bulk:
+        job = Bulk.create_job(sf, soql, include_deleted=include_deleted)
+        Bulk.wait_for_job(sf, job['id'], poll_interval=poll_interval, timeout=timeout)
+        pages = Bulk.iter_result_pages(sf, job['id'], page_size=page_size, sobject=sobject)
+    else:
+        pages = (page['records'] for page in Paging.iter_results(sf, soql, batch_size=batch_size,
+                                                                   include_deleted=include_deleted))
+    for page in pages:
+        result.append_page(page)
+    return result
@@ -5,16 +5,43 @@
 
 import collections
 
-from simple_salesforce import SalesforceMalformedRequest, SalesforceResourceNotFound
-
-from SFQuerier import Parser
+from SFQuerier import Bulk, Cache, Collections, Entity, Executor, Mirror, Paging, Parser, Prefetch, Purge, \
+    QueryBuilder, Result
 from SFQuerier.Case import Case
 
 
 class Contact:
-    def __init__(self, sf):
+    SELECT = QueryBuilder.select('Contact', "Id,FirstName,LastName,Email,Phone,AccountId")
+    BY_ACCOUNT = SELECT.where("AccountId = :accountId")
+    COUNT = QueryBuilder.select('Contact', "Count()")
+
+    def __init__(self, sf, sq=None):
         self._sf = sf
-        self.Case = Case(sf)
+        self._sq = sq
+
+    @property
+    def _executor(self):
+        """FanOutExecutor of the owning SalesforceQ, calls run one after the other without one"""
+        return self._sq.executor if self._sq is not None else None
+
+    @property
+    def Case(self):
+        return Entity.shared(self, Case)
+
+    @property
+    def _cache(self):
+        """RecordCache of the owning SalesforceQ, None if caching is off"""
+        return self._sq.cache if self._sq is not None else None
+
+    @property
+    def _mirror(self):
+        """Mirror.SQLiteMirror of the owning SalesforceQ, None if lookups always query the API"""
+        return getattr(self._sq, 'mirror', None)
+
+    @property
+    def _metadata(self):
+        """MetadataCache of the owning SalesforceQ"""
+        return getattr(self._sq, 'metadata', None)
 
     def get_by_id(self, contactId=None):
         """
@@ -24,206 +51,208 @@ class Contact:
                     """
         if contactId is not None:
             try:
-                contact = self._sf.Contact.get(contactId)
-                return Parser.parse(contact)
-            except SalesforceResourceNotFound as e:  # Not found
-                print(
-                    "[GET]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                    name=e.resource_name,
-                                                                                    errorCode=e.content[0][
-                                                                                        'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Field doesn't exist
-                print("[GET]{errorCode}: Malformed request {url}. {message} ID: {id}".format(
-                    message=e.content[0]['message'],
-                    url=e.url,
-                    errorCode=e.content[0][
-                        'errorCode'], id=contactId))
-                return False
+                return Cache.read_through(self._cache, 'Contact', contactId,
+                                          lambda: Parser.parse(self._sf.Contact.get(contactId)))
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
+                return Result.failure('GET', e, contactId)
+        else:
+            return Result.missing('Contact ID')
 
-            return False
+    def fetch(self, contactIds=None, include=('Cases',), fields=None):
+        """
+        Get contacts with their related records as a linked graph, one query per chunk of IDs and include level
+        EXAMPLE: .fetch(ids, include=['Cases.CaseComments'])
+        :param contactIds: ID string / list of IDs
+        :param include: relationship paths, e.g. 'Cases.CaseComments'
+        :param fields: dict of {sobject: field names} overriding Prefetch.FIELDS
+        :return: Prefetch.PrefetchResult, contacts in input order with the IDs that weren't found in .missing
+        """
+        if contactIds is not None:
+            try:
+                return Prefetch.fetch(self._sf, 'Contact', [contactIds] if isinstance(contactIds, str) else contactIds,
+                                      include=include, fields=fields, executor=self._executor, metadata=self._metadata)
+            except Exception as e:
+                return Result.failure('GET', e, contactIds)
         else:
-            print("Contact ID is missing!")
-            return False
+            return Result.missing('Contact ID')
+
+    def iter_all(self, batch_size=None, compact=False, attributes='keep'):
+        """
+        Stream all contacts one page at a time, memory stays flat regardless of the org size
+        :param batch_size: records per page (200-2000), Salesforce default if None
+        :param compact: yield __slots__ records instead of SimpleNamespace, see Parser.parse
+        :param attributes: 'keep' / 'intern' / 'drop' the attributes payload of compact records
+        :return: generator of contacts
+        """
+        return Paging.iter_query(self._sf, self.SELECT.bind(), batch_size=batch_size, compact=compact,
+                                 attributes=attributes)
 
-    def get_account_contacts(self, accountId=None):
-        contacts = self._sf.query(
-            f"SELECT Id,FirstName,LastName,Email,Phone,AccountId FROM Contact WHERE AccountId='{accountId}'")
-        return Parser.parse(contacts)
+    def export(self, page_size=None, poll_interval=2.0, timeout=None, compact=False, attributes='keep'):
+        """
+        Export all contacts through a Bulk API 2.0 query job, streamed one CSV result page at a time
+        :param page_size: records per result page, Salesforce default if None
+        :param poll_interval: max seconds between job state polls
+        :param timeout: seconds to wait for the job to complete, no limit if None
+        :param compact: yield __slots__ records instead of SimpleNamespace, see Parser.parse
+        :param attributes: 'keep' / 'intern' / 'drop' the attributes payload of compact records
+        :return: generator of contacts
+        """
+        return Bulk.export(self._sf, self.SELECT.bind(), page_size=page_size, poll_interval=poll_interval,
+                           timeout=timeout, compact=compact, attributes=attributes)
+
+    def get_account_contacts(self, accountId=None, compact=False, attributes='keep'):
+        if accountId is None:
+            return Result.missing('Account ID')
+        return Mirror.lookup(self._mirror, 'Contact', self.BY_ACCOUNT.fields, 'AccountId', accountId,
+                             lambda: Parser.parse(self._sf.query(self.BY_ACCOUNT.bind(accountId=accountId)),
+                                                  compact=compact, attributes=attributes),
+                             compact=compact, attributes=attributes)
 
     def get_cases(self, contactId=None):
-        cases = self._sf.query(f"SELECT Id,CaseNumber,ContactId,AccountId FROM Case WHERE ContactId='{contactId}'")
-        return Parser.parse(cases)
+        if contactId is None:
+            return Result.missing('Contact ID')
+        return Mirror.lookup(self._mirror, 'Case', Case.BY_CONTACT.fields, 'ContactId', contactId, lambda: Parser.parse(
+            self._sf.query(Case.BY_CONTACT.bind(contactId=contactId))))
 
     def get_count(self):
         """
         Number of contacts in database
         :return: Integer
         """
-        return (self._sf.query("SELECT Count() from Contact"))['totalSize']
+        return (self._sf.query(self.COUNT.bind()))['totalSize']
 
-    def purge(self, contactId=None):
+    def purge(self, contactId=None, max_workers=None, continue_on_error=False):
         """
-                Delete SF contact and its records
+                Delete SF contact and its records (cases and their comments)
+                The records are loaded in two queries and deleted level by level with batched deletes
                 :param contactId: Contact ID to be deleted
-                :return: Dict [bool, cases]
+                :param max_workers: size of a dedicated worker pool deleting the record chunks instead of the executor
+                :param continue_on_error: delete the parents even when deleting some of their records failed
+                :return: Dict [bool, cases, comments, deleted, failed]
                 """
-        sf.Adam
         if contactId is not None:
             try:
-                """Delete cases"""
-                cases = self.get_cases(contactId=contactId)
-                if len(cases) != 0:
-                    for case in cases:
-                        if self.Case.delete(caseId=case.Id):
-                            print(f"Deleted case #{case.CaseNumber}")
-                        else:
-                            print(f"Failed to delete case #{case.CaseNumber}")
-                else:
-                    print(f"No cases were found for contact ID: {contactId}")
-
-                """Delete contact"""
-                status = self._sf.Account.delete(contactId)
-                if status == 204:
-                    print("Deleted account ID:{0}".format(contactId))
-                    return {'bool': True, 'cases': cases}
-            except SalesforceResourceNotFound as e:  # Account doesn't exist
-                print(
-                    "[DELETE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                       name=e.resource_name,
-                                                                                       errorCode=e.content[0][
-                                                                                           'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Deletion failed (could be due account being associated to existing cases)
-                print("[DELETE]{errorCode}: Malformed request {url}. {message} ID: {contactId}".format(
-                    message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode'],
-                    contactId=contactId))
-                return False
+                result = Purge.purge_contact(self._sf, contactId, max_workers=max_workers, executor=self._executor,
+                                             continue_on_error=continue_on_error)
+                if result:
+                    for sobject, ids in result['deleted'].items():
+                        Cache.invalidate(self._cache, sobject, ids)
+                return result
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
-                return False
+                return Result.failure('DELETE', e, contactId)
         else:
-            print("Contact ID is missing!")
-            return False
+            return Result.missing('Contact ID')
 
+    @Result.timed
     def create(self, json={}):
         """
         Create new contact, 'LastName' field is required!
         :param json: JSON Formatted contact data
-        :return: Created account ID
+        :return: Result, .id is the created contact ID
         """
         try:
             status = self._sf.Contact.create(json)
             if isinstance(status, collections.OrderedDict):
                 if status['success'] == True:
-                    return status['id']
+                    return Result.succeeded(status['id'])
                 else:
-                    raise Exception("Contact creation failed")
+                    return Result.rejected('CREATE', status.get('errors'))
             else:
                 raise Exception("Contact creation failed")
 
-        except SalesforceResourceNotFound as e:
-            print(
-                "[CREATE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                   name=e.resource_name,
-                                                                                   errorCode=e.content[0][
-                                                                                       'errorCode']))
-            return False
-        except SalesforceMalformedRequest as e:  # Field doesn't exist / Required fields are missing
-            print("[CREATE]{errorCode}: Malformed request {url}. {message}".format(message=e.content[0]['message'],
-                                                                                   url=e.url,
-                                                                                   errorCode=e.content[0][
-                                                                                       'errorCode']))
-            return False
         except Exception as e:
-            print("Something went wrong!")
-            print(e)
-        return False
+            return Result.failure('CREATE', e, None)
 
+    @Result.timed
     def update(self, id=None, json={}):
         """
         Update SF contact
         :param id: contact ID
         :param json: JSON attributes object to be updated ex: {'LastName': 'Mahameed', 'FirstName': 'Adam'}
-        :return: True/False if account was updated/!updated
+        :return: Result, falsy if the contact wasn't updated
         """
         if id is not None:
             try:
                 status = self._sf.Contact.update(id,
                                                  json)  # Status code 204 is returned if info was updated succesfully
+                Cache.invalidate(self._cache, 'Contact', id)
                 if status == 204:
-                    return True
-            except SalesforceResourceNotFound as e:  # Not found
-                print(
-                    "[UPDATE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                       name=e.resource_name,
-                                                                                       errorCode=e.content[0][
-                                                                                           'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Field doesn't exist
-                print("[UPDATE]{errorCode}: Malformed request {url}. {message} ID: {id}".format(
-                    message=e.content[0]['message'],
-                    url=e.url,
-                    errorCode=e.content[0][
-                        'errorCode'], id=id))
-                return False
+                    return Result.succeeded(id)
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
+                return Result.failure('UPDATE', e, id)
 
-            return False
+            return Result.unexpected_status('UPDATE', status, id)
         else:
-            print("Contact ID is missing!")
-            return False
+            return Result.missing('Contact ID')
 
+    @Result.timed
     def delete(self, id=None):
         """
         Delete SF contact
         :param id: contact ID to be deleted
-        :return: True/False
+        :return: Result, falsy if the record wasn't deleted
         """
         if id is not None:
             try:
                 status = self._sf.Contact.delete(id)
+                Cache.invalidate(self._cache, 'Contact', id)
                 if status == 204:
-                    print("Deleted contact ID:{0}".format(id))
-                    return True
-            except SalesforceResourceNotFound as e:  # Account doesn't exist
-                print(
-                    "[DELETE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                       name=e.resource_name,
-                                                                                       errorCode=e.content[0][
-                                                                                           'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Deletion failed (could be due account being associated to existing cases)
-                print("[DELETE]{errorCode}: Malformed request {url}. {message},contact ID: {id}".format(
-                    message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode'], id=id))
-                return False
+                    Result.log.info("Deleted contact ID:%s", id)
+                    return Result.succeeded(id)
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
+                return Result.failure('DELETE', e, id)
 
-            return False
+            return Result.unexpected_status('DELETE', status, id)
         else:
-            print("Contact ID is missing!")
-            return False
+            return Result.missing('Contact ID')
 
     def delete_cases(self, contactId=None):
         if contactId is not None:
             cases = self.get_cases(contactId)
             if len(cases) != 0:
-                for case in cases:
-                    if self.Case.delete(caseId=case.Id):
-                        print(f"Deleted case #{case.CaseNumber}")
+                deleted = Executor.fan_out(self._executor, lambda case: self.Case.delete(caseId=case.Id), cases)
+                for case, status in zip(cases, deleted):
+                    if status:
+                        Result.log.info("Deleted case #%s", case.CaseNumber)
                     else:
-                        print(f"Failed to delete case #{case.CaseNumber}")
+                        Result.log.warning("Failed to delete case #%s", case.CaseNumber)
+                return Result.BatchResult(deleted, 'DELETE', 'Case')
             else:
-                print(f"No cases were found for contact ID: {contactId}")
-            return True
+                Result.log.info("No cases were found for contact ID: %s", contactId)
+            return Result.BatchResult(action='DELETE', sobject='Case')
         else:
-            print("Contact ID is missing!")
-            return False
+            return Result.missing('Contact ID')
+
+    def create_many(self, contacts, all_or_none=False):
+        """
+        Create new contacts in batches of 200 records per composite/sobjects request
+        :param contacts: list of JSON formatted contact data, 'LastName' field is required!
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per contact in input order
+        """
+        return Collections.create(self._sf, 'Contact', contacts, all_or_none=all_or_none,
+                                  executor=self._executor)
+
+    def update_many(self, contacts, all_or_none=False):
+        """
+        Update contacts in batches of 200 records per composite/sobjects request
+        :param contacts: list of JSON attributes objects including 'Id' / dict of {id: JSON attributes object}
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per contact in input order
+        """
+        results = Collections.update(self._sf, 'Contact', contacts, all_or_none=all_or_none,
+                                     executor=self._executor)
+        Cache.invalidate(self._cache, 'Contact', [result.id for result in results])
+        return results
+
+    def delete_many(self, contactIds, all_or_none=False):
+        """
+        Delete contacts in batches of 200 records per composite/sobjects request
+        :param contactIds: list of contact IDs
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per ID in input order
+        """
+        results = Collections.delete(self._sf, 'Contact', contactIds, all_or_none=all_or_none,
+                                     executor=self._executor)
+        Cache.invalidate(self._cache, 'Contact', [result.id for result in results])
+        return results
\ No newline at end of file
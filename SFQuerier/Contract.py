@@ -14,16 +14,28 @@ __created__ = "05/04/2021"
 
 import collections
 
-from simple_salesforce import SalesforceResourceNotFound, SalesforceMalformedRequest
-
-from SFQuerier import Parser
+from SFQuerier import Bulk, Collections, Entity, Paging, Parser, QueryBuilder, Result
 from SFQuerier.Account import Account
 
 
 class Contract:
-    def __init__(self, sf):
+    SELECT = QueryBuilder.select('Contract', "Id,ContractNumber,ContractTerm,CreatedById,CreatedDate,Description,"
+                                             "OwnerId,AccountId")
+    BY_ACCOUNT = SELECT.where("AccountId = :accountId")
+    COUNT = QueryBuilder.select('Contract', "Count()")
+
+    def __init__(self, sf, sq=None):
         self._sf = sf
-        self.Account = Account(sf)
+        self._sq = sq
+
+    @property
+    def _executor(self):
+        """FanOutExecutor of the owning SalesforceQ, calls run one after the other without one"""
+        return self._sq.executor if self._sq is not None else None
+
+    @property
+    def Account(self):
+        return Entity.shared(self, Account)
 
     def get_by_id(self, contractId=None):
         """
@@ -35,32 +47,39 @@ class Contract:
             try:
                 contract = self._sf.Contract.get(contractId)
                 return Parser.parse(contract)
-            except SalesforceResourceNotFound as e:  # Not found
-                print(
-                    "[GET]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                    name=e.resource_name,
-                                                                                    errorCode=e.content[0][
-                                                                                        'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Field doesn't exist
-                print("[GET]{errorCode}: Malformed request {url}. {message} ID: {contractId}".format(
-                    message=e.content[0]['message'],
-                    url=e.url,
-                    errorCode=e.content[0][
-                        'errorCode'], contractId=contractId))
-                return False
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
-
-            return False
+                return Result.failure('GET', e, contractId)
         else:
-            print("Contract ID is missing!")
-            return False
+            return Result.missing('Contract ID')
+
+    def iter_all(self, batch_size=None, compact=False, attributes='keep'):
+        """
+        Stream all contracts one page at a time, memory stays flat regardless of the org size
+        :param batch_size: records per page (200-2000), Salesforce default if None
+        :param compact: yield __slots__ records instead of SimpleNamespace, see Parser.parse
+        :param attributes: 'keep' / 'intern' / 'drop' the attributes payload of compact records
+        :return: generator of contracts
+        """
+        return Paging.iter_query(self._sf, self.SELECT.bind(), batch_size=batch_size, compact=compact,
+                                 attributes=attributes)
+
+    def export(self, page_size=None, poll_interval=2.0, timeout=None, compact=False, attributes='keep'):
+        """
+        Export all contracts through a Bulk API 2.0 query job, streamed one CSV result page at a time
+        :param page_size: records per result page, Salesforce default if None
+        :param poll_interval: max seconds between job state polls
+        :param timeout: seconds to wait for the job to complete, no limit if None
+        :param compact: yield __slots__ records instead of SimpleNamespace, see Parser.parse
+        :param attributes: 'keep' / 'intern' / 'drop' the attributes payload of compact records
+        :return: generator of contracts
+        """
+        return Bulk.export(self._sf, self.SELECT.bind(), page_size=page_size, poll_interval=poll_interval,
+                           timeout=timeout, compact=compact, attributes=attributes)
 
     def get_account_contracts(self, accountId=None):
-        contracts = self._sf.query(
-            f"SELECT Id,ContractNumber,ContractTerm,CreatedById,CreatedDate,Description,OwnerId,AccountId FROM Contract WHERE AccountId='{accountId}'")
+        if accountId is None:
+            return Result.missing('Account ID')
+        contracts = self._sf.query(self.BY_ACCOUNT.bind(accountId=accountId))
         return Parser.parse(contracts)
 
     def get_count(self):
@@ -68,107 +87,95 @@ class Contract:
         Number of contracts in database
         :return: Integer
         """
-        return (self._sf.query("SELECT Count() from Contract"))['totalSize']
+        return (self._sf.query(self.COUNT.bind()))['totalSize']
 
+    @Result.timed
     def create(self, json={}):
         """
         Create new contract
         :param json: JSON Formatted contract data
-        :return: Created contract ID
+        :return: Result, .id is the created contract ID
         """
         try:
             status = self._sf.Contract.create(json)
             if isinstance(status, collections.OrderedDict):
                 if status['success'] is True:
-                    return status['id']
+                    return Result.succeeded(status['id'])
                 else:
-                    raise Exception("Contact creation failed")
+                    return Result.rejected('CREATE', status.get('errors'))
             else:
-                raise Exception("Contact creation failed")
-
-        except SalesforceResourceNotFound as e:
-            print(
-                "[CREATE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                   name=e.resource_name,
-                                                                                   errorCode=e.content[0][
-                                                                                       'errorCode']))
-            return False
-        except SalesforceMalformedRequest as e:  # Field doesn't exist / Required fields are missing
-            print("[CREATE]{errorCode}: Malformed request {url}. {message}".format(message=e.content[0]['message'],
-                                                                                   url=e.url,
-                                                                                   errorCode=e.content[0][
-                                                                                       'errorCode']))
-            return False
+                raise Exception("Contract creation failed")
+
         except Exception as e:
-            print("Something went wrong!")
-            print(e)
-        return False
+            return Result.failure('CREATE', e, None)
 
+    @Result.timed
     def update(self, contractId=None, json={}):
         """
         Update SF contract
         :param contractId: Contract ID to be updated
         :param json: JSON attributes object to be updated
-        :return: True/False if contract was updated/!updated
+        :return: Result, falsy if the contract wasn't updated
         """
         if contractId is not None:
             try:
                 status = self._sf.Contract.update(contractId,
                                                   json)  # Status code 204 is returned if info was updated successfully
                 if status == 204:
-                    return True
-            except SalesforceResourceNotFound as e:  # Not found
-                print(
-                    "[UPDATE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                       name=e.resource_name,
-                                                                                       errorCode=e.content[0][
-                                                                                           'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Field doesn't exist
-                print("[UPDATE]{errorCode}: Malformed request {url}. {message} ID: {contractId}".format(
-                    message=e.content[0]['message'],
-                    url=e.url,
-                    errorCode=e.content[0][
-                        'errorCode'], contractId=contractId))
-                return False
+                    return Result.succeeded(contractId)
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
+                return Result.failure('UPDATE', e, contractId)
 
-            return False
+            return Result.unexpected_status('UPDATE', status, contractId)
         else:
-            print("Contract ID is missing!")
-            return False
+            return Result.missing('Contract ID')
 
+    @Result.timed
     def delete(self, contractId=None):
         """
         Delete SF contract
         :param contractId: contract ID to be deleted
-        :return: True/False
+        :return: Result, falsy if the record wasn't deleted
         """
         if contractId is not None:
             try:
                 status = self._sf.Contract.delete(contractId)
                 if status == 204:
-                    print("Deleted contract ID:{0}".format(contractId))
-                    return True
-            except SalesforceResourceNotFound as e:  # Account doesn't exist
-                print(
-                    "[DELETE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                       name=e.resource_name,
-                                                                                       errorCode=e.content[0][
-                                                                                           'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Deletion failed (could be due account being associated to existing cases)
-                print("[DELETE]{errorCode}: Malformed request {url}. {message},contact ID: {contractId}".format(
-                    message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode'],
-                    contractId=contractId))
-                return False
+                    Result.log.info("Deleted contract ID:%s", contractId)
+                    return Result.succeeded(contractId)
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
+                return Result.failure('DELETE', e, contractId)
 
-            return False
+            return Result.unexpected_status('DELETE', status, contractId)
         else:
-            print("Contact ID is missing!")
-            return False
+            return Result.missing('Contract ID')
+
+    def create_many(self, contracts, all_or_none=False):
+        """
+        Create new contracts in batches of 200 records per composite/sobjects request
+        :param contracts: list of JSON formatted contract data
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per contract in input order
+        """
+        return Collections.create(self._sf, 'Contract', contracts, all_or_none=all_or_none,
+                                  executor=self._executor)
+
+    def update_many(self, contracts, all_or_none=False):
+        """
+        Update contracts in batches of 200 records per composite/sobjects request
+        :param contracts: list of JSON attributes objects including 'Id' / dict of {id: JSON attributes object}
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per contract in input order
+        """
+        return Collections.update(self._sf, 'Contract', contracts, all_or_none=all_or_none,
+                                  executor=self._executor)
+
+    def delete_many(self, contractIds, all_or_none=False):
+        """
+        Delete contracts in batches of 200 records per composite/sobjects request
+        :param contractIds: list of contract IDs
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per ID in input order
+        """
+        return Collections.delete(self._sf, 'Contract', contractIds, all_or_none=all_or_none,
+                                  executor=self._executor)
\ No newline at end of file
@@ -0,0 +1,31 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Entity.py
+
+"""
+Lazily built, shared entity accessors. Account.Contact, Contract.Account, ... are built on first access and
+come from the owning SalesforceQ, so every path to an entity returns the same object (sq.Contract.Account is
+sq.Account). An entity built without a SalesforceQ keeps its own nested entities.
+"""
+import threading
+
+_lock = threading.Lock()
+
+
+def shared(entity, cls):
+    """
+    Entity of class cls for the owner of entity, built on first access
+    :param entity: Account / Contact / ... instance asking for a nested entity
+    :param cls: class of the nested entity
+    :return: cls instance
+    """
+    registry = getattr(entity._sq, 'entity', None)
+    if registry is not None:
+        return registry(cls)
+    nested = entity.__dict__.setdefault('_entities', {})
+    instance = nested.get(cls)
+    if instance is None:
+        with _lock:
+            instance = nested.setdefault(cls, cls(entity._sf))
+    return instance
@@ -0,0 +1,91 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Executor.py
+
+"""
+Thread-pool fan-out for independent per-record calls. Results come back in input order and an
+exception raised for one item is collected instead of aborting the others.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+
+from SFQuerier.Http import TrackingAdapter
+
+MAX_WORKERS = 8
+
+
+class FanOutResult(list):
+    """Results in input order (None where the call raised), the failures are listed in .errors as (index, item, exception)"""
+
+    def __init__(self, results=(), errors=()):
+        super().__init__(results)
+        self.errors = list(errors)
+
+
+class FanOutExecutor:
+    def __init__(self, max_workers=MAX_WORKERS, pool_maxsize=None):
+        """
+        :param max_workers: threads issuing requests concurrently
+        :param pool_maxsize: connections kept per host, max_workers if None so no worker waits for a connection
+        """
+        self.max_workers = max_workers
+        self.pool_maxsize = pool_maxsize or max_workers
+        self._pool = None
+
+    def mount(self, session):
+        """Size the per-host connection pool of a requests session for max_workers concurrent requests"""
+        adapter = session.get_adapter('https://')
+        if isinstance(adapter, TrackingAdapter):  # Resize in place, keeps the adapter and its other settings
+            if adapter.pool_maxsize < self.pool_maxsize:
+                adapter.init_poolmanager(adapter.pool_connections, self.pool_maxsize, block=adapter.pool_block)
+        elif isinstance(adapter, HTTPAdapter):  # Custom adapter, sized from the settings of its urllib3 PoolManager
+            settings = adapter.poolmanager.connection_pool_kw
+            if settings.get('maxsize', 1) < self.pool_maxsize:
+                adapter.init_poolmanager(self.pool_maxsize, self.pool_maxsize, block=settings.get('block', False))
+        else:
+            session.mount('https://', HTTPAdapter(pool_connections=self.pool_maxsize, pool_maxsize=self.pool_maxsize))
+        return session
+
+    def map(self, func, items):
+        """
+        Call func for every item concurrently
+        :return: FanOutResult
+        """
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= 1:
+            return fan_out(None, func, items)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='SFQuerier')
+        futures = [self._pool.submit(func, item) for item in items]
+        results, errors = [], []
+        for index, (item, future) in enumerate(zip(items, futures)):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(None)
+                errors.append((index, item, e))
+        return FanOutResult(results, errors)
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+
+def fan_out(executor, func, items):
+    """
+    Map func over items with the executor, serially in the calling thread if there is none
+    :return: FanOutResult
+    """
+    if executor is not None:
+        return executor.map(func, items)
+    results, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            results.append(func(item))
+        except Exception as e:
+            results.append(None)
+            errors.append((index, item, e))
+    return FanOutResult(results, errors)
@@ -0,0 +1,115 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Http.py
+
+"""
+Tuned requests session shared by the simple-salesforce client and every entity object. The connection
+pool is sized for the fan-out workers, connections are kept alive between calls, response bodies are
+negotiated gzip and large JSON request bodies are sent gzip encoded (Content-Encoding: gzip).
+https://developer.salesforce.com/docs/atlas.en-us.api_rest.meta/api_rest/intro_rest_compression.htm
+
+The adapter counts requests against opened sockets so connection reuse can be checked with .stats().
+"""
+import gzip
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_CONNECTIONS = 10  # Hosts kept in the pool manager (login, instance, ...)
+POOL_MAXSIZE = 8
+COMPRESS_MIN_BYTES = 1024  # Smaller bodies aren't worth the gzip overhead
+
+
+class TrackingAdapter(HTTPAdapter):
+    """HTTPAdapter counting the requests it sends and the sockets its connection pools open"""
+
+    def __init__(self, *args, **kwargs):
+        self._lock = threading.Lock()
+        self._counts = {'requests': 0, 'connections': 0}
+        super().__init__(*args, **kwargs)
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _counting_pool(self, pool_cls):
+        """Pool class whose connections report every (re)connect, a closed keep-alive socket reconnects silently"""
+        count = self._count
+
+        class CountingConnection(pool_cls.ConnectionCls):
+            def connect(self):
+                super().connect()
+                count('connections')
+
+        return type(pool_cls.__name__, (pool_cls,), {'ConnectionCls': CountingConnection})
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        """Keeps the pool settings in pool_connections / pool_maxsize / pool_block, e.g. for FanOutExecutor.mount"""
+        self.pool_connections = connections
+        self.pool_maxsize = maxsize
+        self.pool_block = block
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {scheme: self._counting_pool(pool_cls) for scheme, pool_cls
+                                                   in self.poolmanager.pool_classes_by_scheme.items()}
+
+    def send(self, request, **kwargs):
+        self._count('requests')
+        return super().send(request, **kwargs)
+
+    def stats(self):
+        """:return: dict [requests, connections, reused]"""
+        with self._lock:
+            counts = dict(self._counts)
+        counts['reused'] = max(counts['requests'] - counts['connections'], 0)
+        return counts
+
+
+class SalesforceSession(requests.Session):
+    def __init__(self, pool_maxsize=POOL_MAXSIZE, pool_connections=POOL_CONNECTIONS, pool_block=False, max_retries=0,
+                 keep_alive=True, compression=True):
+        """
+        :param pool_maxsize: connections kept per host, at least the number of concurrent workers
+        :param pool_connections: hosts kept in the pool
+        :param pool_block: wait for a free connection instead of opening a throwaway one when the pool is exhausted
+        :param max_retries: connection level retries (DNS, refused connections), no retry if 0
+        :param keep_alive: keep connections open between requests, 'Connection: close' if False
+        :param compression: gzip responses and request bodies of COMPRESS_MIN_BYTES or more
+        """
+        super().__init__()
+        self.compression = compression
+        self.adapter = TrackingAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                       pool_block=pool_block, max_retries=max_retries)
+        self.mount('https://', self.adapter)
+        self.mount('http://', self.adapter)
+        self.headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        self.headers['Accept-Encoding'] = 'gzip' if compression else 'identity'
+
+    def send(self, request, **kwargs):
+        if self.compression:
+            _compress_body(request)
+        return super().send(request, **kwargs)
+
+    def stats(self):
+        """
+        Connection reuse counters
+        :return: dict [requests, connections, reused]
+        """
+        return self.adapter.stats()
+
+
+def _compress_body(request):
+    """Gzip a prepared JSON request body in place, bodies already encoded or below COMPRESS_MIN_BYTES are left as is"""
+    body = request.body
+    if body is None or 'Content-Encoding' in request.headers:
+        return
+    if not request.headers.get('Content-Type', '').startswith('application/json'):
+        return
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if not isinstance(body, bytes) or len(body) < COMPRESS_MIN_BYTES:
+        return
+    request.body = gzip.compress(body, compresslevel=5)
+    request.headers['Content-Encoding'] = 'gzip'
+    request.headers['Content-Length'] = str(len(request.body))
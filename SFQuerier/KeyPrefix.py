@@ -0,0 +1,89 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : KeyPrefix.py
+
+"""
+Sobject type of a record ID from its key prefix, the first 3 ID characters (001 Account, 003 Contact, 500 Case...).
+The prefix index is built once from the global describe and persisted next to the describe cache, so resolving
+an ID is a dict lookup without any request. An unknown prefix (e.g. a custom object created since the index was
+built) revalidates the global describe, at most once every refresh_after seconds.
+https://help.salesforce.com/s/articleView?id=000325244&type=1
+"""
+import threading
+import time
+
+INDEX = '_key_prefixes'  # MetadataCache entry name of the persisted index
+REFRESH_AFTER = 300  # Seconds between rebuilds triggered by unknown prefixes
+
+
+class KeyPrefixIndex:
+    def __init__(self, metadata, refresh_after=REFRESH_AFTER):
+        """
+        :param metadata: Metadata.MetadataCache providing the global describe and the cache directory
+        :param refresh_after: min seconds between rebuilds on an unknown prefix
+        """
+        self._metadata = metadata
+        self.refresh_after = refresh_after
+        self._prefixes = None
+        self._built = 0
+        self._lock = threading.Lock()
+
+    def _build(self, revalidate=False):
+        describe = self._metadata.describe_global(revalidate=revalidate)
+        self._prefixes = {sobject['keyPrefix']: sobject['name'] for sobject in describe['sobjects']
+                          if sobject.get('keyPrefix')}
+        self._built = time.time()
+        self._metadata.save_entry(INDEX, {'prefixes': self._prefixes, 'built': self._built})
+
+    def _index(self):
+        if self._prefixes is None:
+            with self._lock:
+                if self._prefixes is None:
+                    entry = self._metadata.load_entry(INDEX)
+                    if entry is not None:
+                        self._prefixes, self._built = entry['prefixes'], entry['built']
+                    else:
+                        self._build()
+        return self._prefixes
+
+    def _refresh(self):
+        """Rebuild from a revalidated global describe unless it was rebuilt less than refresh_after seconds ago"""
+        with self._lock:
+            if time.time() - self._built >= self.refresh_after:
+                self._build(revalidate=True)
+                return True
+        return False
+
+    def sobject_type(self, record_id):
+        """
+        :param record_id: 15 / 18 character ID
+        :return: sobject name / None if the prefix is unknown
+        """
+        prefix = record_id[:3]
+        sobject = self._index().get(prefix)
+        if sobject is None and self._refresh():
+            sobject = self._prefixes.get(prefix)
+        return sobject
+
+    def classify(self, record_ids):
+        """
+        Group IDs by sobject type, the index is refreshed at most once for the whole batch
+        :return: dict of {sobject: [ids]} in input order, IDs with an unknown prefix under None
+        """
+        index = self._index()
+        groups = {}
+        for record_id in record_ids:
+            groups.setdefault(index.get(record_id[:3]), []).append(record_id)
+        if None in groups and self._refresh():
+            unknown = groups.pop(None)
+            for record_id in unknown:
+                groups.setdefault(self._prefixes.get(record_id[:3]), []).append(record_id)
+        return groups
+
+    def prefix(self, sobject):
+        """:return: key prefix of an sobject / None"""
+        for prefix, name in self._index().items():
+            if name == sobject:
+                return prefix
+        return None
@@ -0,0 +1,157 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Metadata.py
+
+"""
+describe() metadata cache. Global and per-sobject describe results are kept in memory and persisted on disk,
+one JSON file per sobject under <path>/<instance>/v<version>/, and are loaded lazily on first use.
+An entry older than revalidate_after seconds is revalidated with an If-Modified-Since request, Salesforce
+answers 304 Not Modified without a body when the metadata didn't change.
+Every entry has its own lock, describes of different sobjects (e.g. on the fan-out executor) run concurrently
+and concurrent lookups of one sobject share a single request.
+https://developer.salesforce.com/docs/atlas.en-us.api_rest.meta/api_rest/resources_sobject_describe.htm
+"""
+import json
+import os
+import re
+import threading
+import time
+from email.utils import formatdate
+
+from simple_salesforce.exceptions import SalesforceGeneralError
+
+from SFQuerier.Result import log
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.sfquerier', 'metadata')
+REVALIDATE_AFTER = 3600  # Seconds
+GLOBAL = '_global'  # Entry name of the global describe (sobjects list)
+
+
+class MetadataCache:
+    def __init__(self, sf, path=CACHE_DIR, revalidate_after=REVALIDATE_AFTER):
+        """
+        :param sf: simple-salesforce client
+        :param path: cache directory, memory only if None
+        :param revalidate_after: seconds an entry is trusted before it is revalidated
+        """
+        self._sf = sf
+        self.revalidate_after = revalidate_after
+        self.directory = None
+        if path is not None:
+            self.directory = os.path.join(path, re.sub(r'[^\w.-]', '_', sf.sf_instance), 'v' + sf.sf_version)
+        self._entries = {}
+        self._locks = {}  # Entry name: lock held while the entry is loaded / fetched
+        self._lock = threading.Lock()
+
+    def _file(self, name):
+        return os.path.join(self.directory, name + '.json')
+
+    def load_entry(self, name):
+        """
+        Persisted entry, also used by KeyPrefix.KeyPrefixIndex for its own entry
+        :return: JSON value read from disk / None if it isn't persisted, can't be read or the cache is memory only
+        """
+        if self.directory is None:
+            return None
+        try:
+            with open(self._file(name), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_entry(self, name, entry):
+        """Persist a JSON serializable entry atomically, nothing to do if the cache is memory only"""
+        if self.directory is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp = self._file(name) + f'.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(temp, self._file(name))  # Readers never see a half written file
+        except OSError as e:
+            log.warning("[METADATA] Could not persist %s describe: %s", name, e)
+
+    def _fetch(self, url, last_modified=None):
+        """
+        GET a describe resource, conditionally if last_modified is given
+        :return: (describe, Last-Modified) / None if it wasn't modified
+        """
+        headers = {'If-Modified-Since': last_modified} if last_modified else {}
+        try:
+            response = self._sf._call_salesforce('GET', url, name='describe', headers=headers)
+        except SalesforceGeneralError as e:
+            if e.status == 304:
+                return None
+            raise
+        return response.json(), response.headers.get('Last-Modified') or response.headers.get('Date') or \
+            formatdate(usegmt=True)
+
+    def _entry_lock(self, name):
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _get(self, name, url, revalidate=False):
+        with self._entry_lock(name):
+            with self._lock:
+                entry = self._entries.get(name)
+            if entry is None:
+                entry = self.load_entry(name)
+            if entry is not None and not revalidate and time.time() - entry['checked'] < self.revalidate_after:
+                with self._lock:
+                    self._entries[name] = entry
+                return entry['describe']
+            fetched = self._fetch(url, entry['last_modified'] if entry is not None else None)
+            if fetched is None:
+                entry = dict(entry, checked=time.time())
+            else:
+                entry = {'describe': fetched[0], 'last_modified': fetched[1], 'checked': time.time()}
+            with self._lock:
+                self._entries[name] = entry
+            self.save_entry(name, entry)
+            return entry['describe']
+
+    def describe(self, sobject):
+        """
+        Cached sobjects/{sobject}/describe
+        :return: describe dict
+        """
+        return self._get(sobject, self._sf.base_url + f'sobjects/{sobject}/describe')
+
+    def describe_global(self, revalidate=False):
+        """
+        Cached global describe, every sobject with its name, keyPrefix, ...
+        :param revalidate: revalidate now even if the entry is still trusted
+        :return: describe dict
+        """
+        return self._get(GLOBAL, self._sf.base_url + 'sobjects', revalidate=revalidate)
+
+    def fields(self, sobject):
+        """:return: list of field describe dicts"""
+        return self.describe(sobject)['fields']
+
+    def field_names(self, sobject, queryable=False):
+        """
+        :param queryable: only fields that can be selected in SOQL (base64 fields can't)
+        :return: list of field names
+        """
+        return [field['name'] for field in self.fields(sobject) if not queryable or field['type'] != 'base64']
+
+    def field_types(self, sobject):
+        """:return: dict of {field name: type}"""
+        return {field['name']: field['type'] for field in self.fields(sobject)}
+
+    def invalidate(self, sobject=None):
+        """Drop a persisted entry (GLOBAL for the global describe), every entry if sobject is None"""
+        with self._lock:
+            names = [sobject] if sobject is not None else list(self._entries)
+            if sobject is None and self.directory is not None and os.path.isdir(self.directory):
+                names += [name[:-len('.json')] for name in os.listdir(self.directory) if name.endswith('.json')]
+            for name in set(names):
+                self._entries.pop(name, None)
+                if self.directory is not None:
+                    try:
+                        os.remove(self._file(name))
+                    except OSError:
+                        pass
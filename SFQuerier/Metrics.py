@@ -0,0 +1,326 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Metrics.py
+
+"""
+Per-call instrumentation, installed on the client's requests session outside the scheduler and the retry policy.
+
+Every request is recorded once it returns: endpoint (e.g. 'query', 'sobjects/Account/{id}'), method, status,
+wall time (scheduler waits and retries included), bytes sent / received, retries and a hash of the SOQL text.
+The Parser.parse call of the JSON a request returned is recorded as a separate 'parse' record with the same
+endpoint, so network and parse time of a call can be told apart, together with its record count. The decoded
+JSON comes back as a Parser.TimedPayload carrying the metrics and request record of its own client: a page
+fetched by a fan-out worker and parsed on another thread is credited to the right call, other clients and
+parses of anything else aren't affected, and nothing outlives the payload.
+
+Records go to pluggable exporters: HistogramExporter (in memory), LoggingExporter, PrometheusExporter (text
+exposition format). Without a Metrics object nothing is installed, a disabled one costs an attribute check.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from SFQuerier import Parser
+from SFQuerier.Result import log
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+REQUEST = 'request'
+PARSE = 'parse'
+
+_API_PATH = re.compile(r'^/services/(?:data/v[\d.]+|async/[\d.]+)/?')
+_RECORD_ID = re.compile(r'^(?=[a-zA-Z0-9]*\d)[a-zA-Z0-9]{15}(?:[a-zA-Z0-9]{3})?$|^[a-zA-Z0-9]{15,18}-\d+$')
+
+
+class CallRecord:
+    __slots__ = ('kind', 'endpoint', 'method', 'status', 'seconds', 'sent', 'received', 'records', 'soql_hash',
+                 'retries')
+
+    def __init__(self, kind, endpoint, method=None, status=None, seconds=0.0, sent=0, received=None, records=None,
+                 soql_hash=None, retries=0):
+        """
+        :param kind: REQUEST / PARSE
+        :param endpoint: path after the API version, IDs replaced by {id}, e.g. 'sobjects/Account/{id}'
+        :param seconds: wall time of the request / the parse
+        :param sent / received: body bytes, received is None for a streamed response without Content-Length
+        :param records: records built by the parse
+        :param soql_hash: first 12 hex characters of the SOQL sha1, query endpoints only
+        """
+        self.kind = kind
+        self.endpoint = endpoint
+        self.method = method
+        self.status = status
+        self.seconds = seconds
+        self.sent = sent
+        self.received = received
+        self.records = records
+        self.soql_hash = soql_hash
+        self.retries = retries
+
+    def _asdict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return "CallRecord({0})".format(', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__))
+
+
+def endpoint(url):
+    """
+    :param url: request URL
+    :return: (endpoint, soql_hash), e.g. ('sobjects/Account/{id}', None) / ('query', '3f2a...')
+    """
+    parts = urlsplit(url)
+    if parts.path.startswith('/services/Soap/'):
+        return 'login', None
+    path = _API_PATH.sub('', parts.path)
+    name = '/'.join('{id}' if _RECORD_ID.match(segment) else segment for segment in path.strip('/').split('/'))
+    soql_hash = None
+    if parts.query and name in ('query', 'queryAll'):
+        soql = parse_qs(parts.query).get('q')
+        if soql:
+            soql_hash = hashlib.sha1(soql[0].encode('utf-8')).hexdigest()[:12]
+    return name or '/', soql_hash
+
+
+class Exporter:
+    """Interface of a metrics exporter, export is called on the thread that made the call"""
+
+    def export(self, record):
+        raise NotImplementedError
+
+
+class _Series:
+    __slots__ = ('count', 'sum', 'max', 'buckets', 'errors', 'sent', 'received', 'records', 'retries')
+
+    def __init__(self, size):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = [0] * size
+        self.errors = 0
+        self.sent = 0
+        self.received = 0
+        self.records = 0
+        self.retries = 0
+
+
+class HistogramExporter(Exporter):
+    """In memory latency histograms and byte / record / retry counters per (kind, endpoint)"""
+
+    def __init__(self, buckets=BUCKETS):
+        """:param buckets: upper bounds in seconds, ascending"""
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def export(self, record):
+        with self._lock:
+            series = self._series.get((record.kind, record.endpoint))
+            if series is None:
+                series = self._series[(record.kind, record.endpoint)] = _Series(len(self.buckets))
+            series.count += 1
+            series.sum += record.seconds
+            series.max = max(series.max, record.seconds)
+            for i, bound in enumerate(self.buckets):
+                if record.seconds <= bound:
+                    series.buckets[i] += 1
+                    break
+            if record.status is not None and record.status >= 400:
+                series.errors += 1
+            series.sent += record.sent or 0
+            series.received += record.received or 0
+            series.records += record.records or 0
+            series.retries += record.retries
+
+    def quantile(self, series, q):
+        """Upper bound of the bucket holding the q quantile, max if it is past the last bucket"""
+        rank = q * series.count
+        seen = 0
+        for bound, count in zip(self.buckets, series.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return series.max
+
+    def snapshot(self):
+        """
+        :return: dict of {kind: {endpoint: dict [count, avg, p50, p95, max, ...]}}, requests add
+                 [errors, sent, received, retries], parses add [records]
+        """
+        snapshot = {}
+        with self._lock:
+            for (kind, name), series in sorted(self._series.items()):
+                values = {'count': series.count, 'avg': series.sum / series.count,
+                          'p50': self.quantile(series, 0.5), 'p95': self.quantile(series, 0.95), 'max': series.max}
+                if kind == PARSE:
+                    values['records'] = series.records
+                else:
+                    values.update(errors=series.errors, sent=series.sent, received=series.received,
+                                  retries=series.retries)
+                snapshot.setdefault(kind, {})[name] = values
+        return snapshot
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class LoggingExporter(Exporter):
+    """One log line per record, formatted only if the logger takes the level"""
+
+    def __init__(self, logger=log, level=logging.DEBUG):
+        self.logger = logger
+        self.level = level
+
+    def export(self, record):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        if record.kind == PARSE:
+            self.logger.log(self.level, "[METRICS] parse %s %.1f ms %s records", record.endpoint,
+                            record.seconds * 1e3, record.records)
+        else:
+            self.logger.log(self.level, "[METRICS] %s %s %s %.1f ms sent %d received %s bytes retries %d%s",
+                            record.method, record.endpoint, record.status, record.seconds * 1e3, record.sent,
+                            record.received, record.retries,
+                            f" soql {record.soql_hash}" if record.soql_hash else '')
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class PrometheusExporter(HistogramExporter):
+    """HistogramExporter rendered in the Prometheus text exposition format, serve render() on /metrics"""
+
+    def __init__(self, buckets=BUCKETS, prefix='sfquerier'):
+        super().__init__(buckets)
+        self.prefix = prefix
+
+    def render(self):
+        """:return: text exposition of every series"""
+        with self._lock:
+            series = sorted(self._series.items())
+            lines = []
+            for kind, help_text in ((REQUEST, "Wall time of Salesforce requests, retries included"),
+                                    (PARSE, "Time spent parsing responses into records")):
+                metric = f"{self.prefix}_{kind}_seconds"
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+                for (series_kind, name), values in series:
+                    if series_kind != kind:
+                        continue
+                    label = f'endpoint="{_label(name)}"'
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, values.buckets):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {values.count}')
+                    lines.append(f'{metric}_sum{{{label}}} {values.sum}')
+                    lines.append(f'{metric}_count{{{label}}} {values.count}')
+            for counter, attribute, kind, help_text in (
+                    ('request_errors_total', 'errors', REQUEST, "Requests answered with a 4xx / 5xx status"),
+                    ('request_retries_total', 'retries', REQUEST, "Retries of transient failures"),
+                    ('sent_bytes_total', 'sent', REQUEST, "Request body bytes"),
+                    ('received_bytes_total', 'received', REQUEST, "Response body bytes"),
+                    ('parsed_records_total', 'records', PARSE, "Records built from responses")):
+                metric = f"{self.prefix}_{counter}"
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+                lines += [f'{metric}{{endpoint="{_label(name)}"}} {getattr(values, attribute)}'
+                          for (series_kind, name), values in series if series_kind == kind]
+        return '\n'.join(lines) + '\n'
+
+
+class Metrics:
+    def __init__(self, exporters=None, enabled=True):
+        """
+        :param exporters: list of Exporter, a single HistogramExporter if None
+        :param enabled: record calls, can be switched at any time
+        """
+        self.exporters = list(exporters) if exporters is not None else [HistogramExporter()]
+        self.enabled = enabled
+
+    def emit(self, record):
+        for exporter in self.exporters:
+            exporter.export(record)
+
+    def snapshot(self):
+        """:return: snapshot of the first HistogramExporter / None if there is none"""
+        for exporter in self.exporters:
+            if isinstance(exporter, HistogramExporter):
+                return exporter.snapshot()
+        return None
+
+
+def _received(response, stream):
+    if not stream and response._content_consumed:
+        return len(response.content or b'')
+    length = response.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+class _ParseTimer:
+    """Parser.TimedPayload timer, records the parses of the JSON of one request"""
+    __slots__ = ('metrics', 'request')
+
+    def __init__(self, metrics, request):
+        self.metrics = metrics
+        self.request = request
+
+    def __call__(self, parse, *args):
+        started = time.perf_counter()
+        records = parse(*args)
+        if self.metrics.enabled:
+            request = self.request
+            self.metrics.emit(CallRecord(PARSE, request.endpoint, request.method,
+                                         seconds=time.perf_counter() - started,
+                                         records=len(records) if isinstance(records, list) else 1,
+                                         soql_hash=request.soql_hash))
+        return records
+
+
+def _decoding(response, metrics, request):
+    """Wrap response.json so the JSON object it returns is a TimedPayload of the request"""
+    decode = response.json
+
+    def json(**kwargs):
+        payload = decode(**kwargs)
+        if isinstance(payload, dict):
+            payload = Parser.TimedPayload(payload, timer=_ParseTimer(metrics, request))
+        return payload
+
+    response.json = json
+
+
+def install(session, metrics):
+    """Record every request of a requests session, install it outside the scheduler and the retry policy"""
+    send = session.send
+    local = threading.local()
+
+    def instrumented_send(request, **kwargs):
+        if not metrics.enabled or getattr(local, 'active', False):  # Disabled / redirect of a recorded request
+            return send(request, **kwargs)
+        local.active = True
+        started = time.perf_counter()
+        response = None
+        try:
+            response = send(request, **kwargs)
+            return response
+        finally:
+            local.active = False
+            name, soql_hash = endpoint(request.url)
+            body = request.body
+            policy = getattr(session, 'retry', None)
+            record = CallRecord(REQUEST, name, request.method,
+                                status=response.status_code if response is not None else None,
+                                seconds=time.perf_counter() - started, sent=len(body) if body else 0,
+                                received=_received(response, kwargs.get('stream')) if response is not None else None,
+                                soql_hash=soql_hash, retries=policy.last_retries() if policy is not None else 0)
+            metrics.emit(record)
+            if response is not None:
+                _decoding(response, metrics, record)
+
+    session.send = instrumented_send
+    session.metrics = metrics
+    return session
@@ -0,0 +1,226 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Mirror.py
+
+"""
+Local SQLite mirror of Accounts, Contacts, Cases and Opportunities for offline read-only lookups.
+
+- The mirror is a Sync.RecordStore and a Sync.StateStore: Sync.SyncEngine keeps it up to date
+  (SalesforceQ.sync_mirror), records and watermarks live in the same database file.
+- A table per sobject keeps every record as JSON, next to indexed lookup columns (INDEXES): Website and Name
+  compare case-insensitively like SOQL, ID lookups use the 15 character ID so 15 and 18 character IDs match.
+- The entity lookups (Account.get_by_domain / get_by_name / get_cases / get_contacts, Contact.get_cases /
+  get_account_contacts, Case.get_by_number, Opportunity.get_opportunities) answer from the mirror through
+  lookup() when the sobject was synced less than max_staleness seconds ago and the mirror holds the selected
+  fields, from the API otherwise.
+- Writes made through the entity classes reach the mirror with the next sync, max_staleness bounds how long
+  a lookup may miss them.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from SFQuerier import Parser
+from SFQuerier.Sync import FULL, RecordStore, StateStore, from_salesforce
+
+MIRROR_DIR = os.path.join(os.path.expanduser('~'), '.sfquerier', 'mirror')
+MAX_STALENESS = 3600  # Seconds since the last sync a lookup is answered locally
+SOBJECTS = ('Account', 'Contact', 'Case', 'Opportunity')
+
+INDEXES = {  # Indexed lookup columns per sobject: (field, kind)
+    'Account': (('Website', 'text'), ('Name', 'text')),
+    'Contact': (('AccountId', 'id'),),
+    'Case': (('AccountId', 'id'), ('ContactId', 'id'), ('CaseNumber', 'exact')),
+    'Opportunity': (('AccountId', 'id'), ('Name', 'text')),
+}
+
+_NAME = re.compile(r'^\w+$')
+_SAFE_NAME = re.compile(r'[^\w.-]')
+
+
+def default_path(instance):
+    """:return: mirror file of an instance in MIRROR_DIR"""
+    return os.path.join(MIRROR_DIR, _SAFE_NAME.sub('_', instance) + '.db')
+
+
+def _column(value, kind):
+    if value is None:
+        return None
+    return value[:15] if kind == 'id' else value
+
+
+def _fields(fields):
+    return [field.strip() for field in fields.split(',')] if isinstance(fields, str) else list(fields)
+
+
+class SQLiteMirror(RecordStore, StateStore):
+    def __init__(self, path=':memory:', max_staleness=MAX_STALENESS, version=None):
+        """
+        :param path: database file, use one per org, in memory if ':memory:'
+        :param max_staleness: seconds since the last sync a lookup is answered locally, None for no limit
+        :param version: API version of the attributes url of local records, set by SalesforceQ
+        """
+        self.path = path
+        self.max_staleness = max_staleness
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            if path != ':memory:':
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS sync_state (sobject TEXT PRIMARY KEY, state TEXT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS mirror_fields (sobject TEXT PRIMARY KEY, fields TEXT)")
+
+    @staticmethod
+    def _table(sobject):
+        if not _NAME.match(sobject):
+            raise ValueError(f"Invalid sobject name {sobject!r}")
+        return f'"mirror_{sobject}"'
+
+    def _create(self, sobject):
+        table = self._table(sobject)
+        indexes = INDEXES.get(sobject, ())
+        columns = ''.join(f', "{field}" TEXT' for field, kind in indexes)
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, record TEXT NOT NULL{columns})")
+        for field, kind in indexes:
+            collate = ' COLLATE NOCASE' if kind == 'text' else ''
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS "mirror_{sobject}_{field}" ON {table} ("{field}"{collate})')
+
+    # Sync.StateStore
+
+    def load(self, sobject):
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM sync_state WHERE sobject = ?", (sobject,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, sobject, state):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO sync_state (sobject, state) VALUES (?, ?)",
+                               (sobject, json.dumps(state)))
+
+    # Sync.RecordStore
+
+    def upsert(self, sobject, records):
+        if not records:
+            return
+        indexes = INDEXES.get(sobject, ())
+        columns = ''.join(f', "{field}"' for field, kind in indexes)
+        marks = ', ?' * len(indexes)
+        rows = [(record['Id'][:15], json.dumps(record), *(_column(record.get(field), kind) for field, kind in indexes))
+                for record in records]
+        with self._lock, self._conn:
+            self._create(sobject)
+            self._conn.executemany(f"INSERT OR REPLACE INTO {self._table(sobject)} (key, record{columns}) "
+                                   f"VALUES (?, ?{marks})", rows)
+            held = set(records[0])
+            for record in records:
+                held.intersection_update(record)
+            row = self._conn.execute("SELECT fields FROM mirror_fields WHERE sobject = ?", (sobject,)).fetchone()
+            if row is not None:
+                held.intersection_update(json.loads(row[0]))
+            self._conn.execute("INSERT OR REPLACE INTO mirror_fields (sobject, fields) VALUES (?, ?)",
+                               (sobject, json.dumps(sorted(held))))
+
+    def delete(self, sobject, ids):
+        with self._lock, self._conn:
+            self._create(sobject)
+            self._conn.executemany(f"DELETE FROM {self._table(sobject)} WHERE key = ?",
+                                   [(record_id[:15],) for record_id in ids])
+
+    def clear(self, sobject):
+        with self._lock, self._conn:
+            self._conn.execute(f"DROP TABLE IF EXISTS {self._table(sobject)}")
+            self._conn.execute("DELETE FROM mirror_fields WHERE sobject = ?", (sobject,))
+
+    # Lookups
+
+    def age(self, sobject):
+        """:return: seconds since the watermark of the last complete sync of an sobject / None if never synced"""
+        state = self.load(sobject) or {}
+        run = state.get('run')
+        if not state.get('updated') or run is not None and run['mode'] == FULL:  # Cleared for a full pull
+            return None
+        return (datetime.now(timezone.utc) - from_salesforce(state['updated'])).total_seconds()
+
+    def fresh(self, sobject):
+        age = self.age(sobject)
+        return age is not None and (self.max_staleness is None or age <= self.max_staleness)
+
+    def select(self, sobject, fields, field, value):
+        """
+        Records of an sobject whose field equals value, from the mirror
+        :param fields: selected fields, list / comma separated string
+        :param field: lookup field, one of INDEXES[sobject]
+        :return: list of record dicts with only the selected fields (and attributes) /
+                 None if the mirror is stale or doesn't hold the fields
+        """
+        kind = dict(INDEXES.get(sobject, ())).get(field)
+        if kind is None or not self.fresh(sobject):
+            return None
+        fields = _fields(fields)
+        with self._lock:
+            row = self._conn.execute("SELECT fields FROM mirror_fields WHERE sobject = ?", (sobject,)).fetchone()
+            if row is None or not set(fields) <= set(json.loads(row[0])):
+                return None
+            collate = ' COLLATE NOCASE' if kind == 'text' else ''
+            rows = self._conn.execute(f'SELECT record FROM {self._table(sobject)} WHERE "{field}" = ?{collate}',
+                                      (_column(value, kind),)).fetchall()
+        records = []
+        for (record,) in rows:
+            record = json.loads(record)
+            url = f"/services/data/v{self.version}/sobjects/{sobject}/{record['Id']}" if self.version else None
+            selected = {'attributes': {'type': sobject, 'url': url}}
+            selected.update((name, record[name]) for name in fields)
+            records.append(selected)
+        return records
+
+    def count(self, sobject):
+        """:return: records of an sobject in the mirror"""
+        with self._lock:
+            try:
+                return self._conn.execute(f"SELECT COUNT(*) FROM {self._table(sobject)}").fetchone()[0]
+            except sqlite3.OperationalError:  # Never synced
+                return 0
+
+    def stats(self):
+        """:return: dict [hits, misses, hit_rate, max_staleness, sobjects: {sobject: {records, age}}]"""
+        lookups = self.hits + self.misses
+        with self._lock:
+            synced = [row[0] for row in self._conn.execute("SELECT sobject FROM sync_state ORDER BY sobject")]
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else None,
+                'max_staleness': self.max_staleness,
+                'sobjects': {sobject: {'records': self.count(sobject), 'age': self.age(sobject)}
+                             for sobject in synced}}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def lookup(mirror, sobject, fields, field, value, loader, compact=False, attributes='keep'):
+    """
+    Records answered from the mirror if it is fresh and holds the fields, loader() otherwise
+    :param mirror: SQLiteMirror / None
+    :param fields: selected fields of the API query, list / comma separated string
+    :param field: lookup field, equal to value
+    :param loader: callable querying the API, returning parsed records
+    :param compact / attributes: record options of local records, see Parser.parse
+    :return: list of records, parsed like Parser.parse
+    """
+    if mirror is None:
+        return loader()
+    records = mirror.select(sobject, fields, field, value)
+    if records is None:
+        mirror.misses += 1
+        return loader()
+    mirror.hits += 1
+    return Parser.materialize_compact(records, attributes) if compact else Parser.materialize(records)
@@ -3,52 +3,94 @@
 # @Author  : Adam Mahameed
 # @File    : Opportunity.py
 
-from simple_salesforce import SalesforceResourceNotFound, SalesforceMalformedRequest
-
-from SFQuerier import Parser
+from SFQuerier import Collections, Columnar, Mirror, Paging, Parser, QueryBuilder, Result
 
 __author__ = "Adam Mahameed"
 __created__ = "01/04/2021"
 __version__ = "1.0"
 
 class Opportunity:
-    def __init__(self, sf):
+    SELECT = QueryBuilder.select('Opportunity', "Id,Amount,IsClosed,IsWon,Type")
+    BY_ACCOUNT = SELECT.where("AccountId = :accountId")
+
+    def __init__(self, sf, sq=None):
         self._sf = sf
+        self._sq = sq
+
+    @property
+    def _executor(self):
+        """FanOutExecutor of the owning SalesforceQ, calls run one after the other without one"""
+        return self._sq.executor if self._sq is not None else None
+
+    @property
+    def _mirror(self):
+        """Mirror.SQLiteMirror of the owning SalesforceQ, None if lookups always query the API"""
+        return getattr(self._sq, 'mirror', None)
+
+    @property
+    def _metadata(self):
+        """MetadataCache of the owning SalesforceQ"""
+        return getattr(self._sq, 'metadata', None)
+
+    def iter_all(self, batch_size=None, compact=False, attributes='keep'):
+        """
+        Stream all opportunities one page at a time, memory stays flat regardless of the org size
+        :param batch_size: records per page (200-2000), Salesforce default if None
+        :param compact: yield __slots__ records instead of SimpleNamespace, see Parser.parse
+        :param attributes: 'keep' / 'intern' / 'drop' the attributes payload of compact records
+        :return: generator of opportunities
+        """
+        return Paging.iter_query(self._sf, self.SELECT.bind(), batch_size=batch_size, compact=compact,
+                                 attributes=attributes)
+
+    def get_columns(self, fields="Id,AccountId,Amount,IsClosed,IsWon,Type", where_query=None, batch_size=None,
+                    bulk=False):
+        """
+        Opportunities as typed columns for vectorized aggregation, see Columnar.ColumnarResult
+        EXAMPLE: .get_columns("Id,Amount,CloseDate", "IsWon = true").to_numpy_columns()['Amount'].sum()
+        :param fields: comma separated fields, relationship fields (Account.Name) included
+        :param where_query: SOQL condition, every opportunity if None
+        :param batch_size: records per query page (200-2000), Salesforce default if None
+        :param bulk: run the query as a Bulk API 2.0 job, for pulls of millions of rows
+        :return: ColumnarResult
+        """
+        query = QueryBuilder.select('Opportunity', fields)
+        if where_query:
+            query = query.where(where_query)
+        return Columnar.query(self._sf, query.bind(), batch_size=batch_size, bulk=bulk, metadata=self._metadata)
 
     def get_opportunities(self, accountId=None):
-        cases = self._sf.query(
-            f"SELECT Id,Amount,IsClosed,IsWon,Type FROM Opportunity "
-            f"WHERE AccountId='{accountId}'")
-        return Parser.parse(cases)
+        if accountId is None:
+            return Result.missing('Account ID')
+        return Mirror.lookup(self._mirror, 'Opportunity', self.BY_ACCOUNT.fields, 'AccountId', accountId,
+                             lambda: Parser.parse(self._sf.query(self.BY_ACCOUNT.bind(accountId=accountId))))
 
+    @Result.timed
     def delete(self, opportunityId=None):
         """
         Delete an account opportunity
         :param opportunityId:
-        :return: True/False if deleted
+        :return: Result, falsy if the record wasn't deleted
         """
         if opportunityId is not None:
             try:
                 status = self._sf.Opportunity.delete(opportunityId)
                 if status == 204:
-                    print("Deleted Opportunity ID:{0}".format(opportunityId))
-                    return True
-            except SalesforceResourceNotFound as e:  # Account doesn't exist
-                print(
-                    "[DELETE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                       name=e.resource_name,
-                                                                                       errorCode=e.content[0][
-                                                                                           'errorCode']))
-                return False
-            except SalesforceMalformedRequest as e:  # Deletion failed (could be due account being associated to existing cases)
-                print("[DELETE]{errorCode}: Malformed request {url}. {message},Opportunity ID: {opportunityId}".format(
-                    message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode'], opportunityId=opportunityId))
-                return False
+                    Result.log.info("Deleted Opportunity ID:%s", opportunityId)
+                    return Result.succeeded(opportunityId)
             except Exception as e:
-                print("Something went wrong!")
-                print(e)
+                return Result.failure('DELETE', e, opportunityId)
 
-            return False
+            return Result.unexpected_status('DELETE', status, opportunityId)
         else:
-            print("Opportunity ID is missing!")
-            return False
\ No newline at end of file
+            return Result.missing('Opportunity ID')
+
+    def delete_many(self, opportunityIds, all_or_none=False):
+        """
+        Delete opportunities in batches of 200 records per composite/sobjects request
+        :param opportunityIds: list of opportunity IDs
+        :param all_or_none: roll back the whole batch if any record fails
+        :return: BatchResult of Results (success, id, errors, latency), one per ID in input order
+        """
+        return Collections.delete(self._sf, 'Opportunity', opportunityIds, all_or_none=all_or_none,
+                                  executor=self._executor)
\ No newline at end of file
@@ -0,0 +1,70 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Paging.py
+
+"""
+Lazy paging over SOQL results, follows nextRecordsUrl one page at a time so only a single page
+of records is held in memory no matter how large the result set is.
+"""
+from SFQuerier import Parser
+
+
+def iter_results(sf, soql, batch_size=None, include_deleted=False):
+    """
+    Yield every page of a SOQL query as the decoded query result, unparsed
+    :param sf: simple-salesforce client
+    :param soql: SOQL query
+    :param batch_size: records per page (Sforce-Query-Options batchSize, 200-2000), Salesforce default if None
+    :param include_deleted: use queryAll to include deleted / archived records
+    :return: generator of query results (dict with 'records')
+    """
+    kwargs = {}
+    if batch_size is not None:
+        kwargs['headers'] = {'Sforce-Query-Options': 'batchSize={0}'.format(batch_size)}
+    result = sf.query(soql, include_deleted=include_deleted, **kwargs)
+    while True:
+        next_url = None if result['done'] else result.get('nextRecordsUrl')
+        yield result
+        result = None  # The caller holds the only reference while it consumes the page
+        if next_url is None:
+            return
+        result = sf.query_more(next_url, identifier_is_url=True, **kwargs)
+
+
+def iter_pages(sf, soql, batch_size=None, include_deleted=False, compact=False, attributes='keep'):
+    """
+    Yield every page of a SOQL query as a list of parsed records
+    :param compact: parse pages to __slots__ records, see Parser.parse
+    :param attributes: 'keep' / 'intern' / 'drop' the attributes payload of compact records
+    :return: generator of record lists, see iter_results for the other parameters
+    """
+    for result in iter_results(sf, soql, batch_size=batch_size, include_deleted=include_deleted):
+        yield Parser.parse(result, compact=compact, attributes=attributes)
+
+
+def children(sf, parent, relationship):
+    """
+    All records of a parent-child subquery, following nextRecordsUrl when the subquery is paged
+    :param parent: decoded parent record
+    :param relationship: relationship name of the subquery, e.g. 'Cases'
+    :return: list of decoded child records
+    """
+    result = parent.get(relationship)
+    records = []
+    while result:
+        records.extend(result['records'])
+        if result['done'] or not result.get('nextRecordsUrl'):
+            break
+        result = sf.query_more(result['nextRecordsUrl'], identifier_is_url=True)
+    return records
+
+
+def iter_query(sf, soql, batch_size=None, include_deleted=False, compact=False, attributes='keep'):
+    """
+    Yield parsed records of a SOQL query, fetching the next page only once the current one is consumed
+    :return: generator of records
+    """
+    for page in iter_pages(sf, soql, batch_size=batch_size, include_deleted=include_deleted, compact=compact,
+                           attributes=attributes):
+        yield from page
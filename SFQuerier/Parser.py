@@ -4,10 +4,147 @@
 # @File    : Parser.py
 
 import json
+import keyword
 from types import SimpleNamespace
 
+ATTRIBUTES_MODES = ('keep', 'intern', 'drop')
 
-def parse(orderedDict, indent=2):
+_record_classes = {}
+
+
+class TimedPayload(dict):
+    """Decoded response JSON of an instrumented client (Metrics.install), parse calls timer to be recorded"""
+    __slots__ = ('timer',)
+
+    def __init__(self, payload, timer):
+        super().__init__(payload)
+        self.timer = timer
+
+
+def parse(orderedDict, indent=2, engine='walk', compact=False, attributes='keep'):
+    """
+    Parse a simple-salesforce response into attribute-access records
+    :param orderedDict: query result (with 'records') or a single sobject
+    :param indent: kept for backwards compatibility, only used by the 'json' engine
+    :param engine: 'walk' builds the records in a single pass, 'json' uses the old dumps/loads round trip
+    :param compact: build __slots__ records (one cached class per field list) instead of SimpleNamespace
+    :param attributes: compact mode only, 'keep' the per-record attributes (type, url),
+                       'intern' them as one shared per-type object (type only) or 'drop' them
+    :return: list of records for query results, a single record otherwise
+    """
+    if type(orderedDict) is TimedPayload:
+        return orderedDict.timer(_parse, orderedDict, indent, engine, compact, attributes)
+    return _parse(orderedDict, indent, engine, compact, attributes)
+
+
+def _parse(orderedDict, indent, engine, compact, attributes):
+    if engine == 'json':
+        return parse_json(orderedDict, indent=indent)
+    value = orderedDict['records'] if 'records' in orderedDict else orderedDict
+    if compact:
+        if attributes not in ATTRIBUTES_MODES:
+            raise ValueError("attributes must be one of {0}".format(', '.join(ATTRIBUTES_MODES)))
+        return materialize_compact(value, attributes=attributes)
+    return materialize(value)
+
+
+def materialize(value):
+    """
+    Walk a decoded JSON payload once and build SimpleNamespace records directly,
+    producing the same shape as the json.loads object_hook without an intermediate string
+    :param value: dict / list / scalar
+    :return: SimpleNamespace / list / scalar
+    """
+    if isinstance(value, dict):
+        record = SimpleNamespace()
+        fields = record.__dict__
+        for key, item in value.items():
+            if isinstance(item, (dict, list)):
+                item = materialize(item)
+            fields[key] = item
+        return record
+    if isinstance(value, list):
+        return [materialize(item) if isinstance(item, (dict, list)) else item for item in value]
+    return value
+
+
+class Record:
+    """Base class of the compact records generated by record_class"""
+    __slots__ = ()
+    _fields = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self._fields, values):
+            setattr(self, name, value)
+
+    def _asdict(self):
+        return {name: getattr(self, name) for name in self._fields}
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self._fields)
+
+    def __repr__(self):
+        return "{0}({1})".format(type(self).__name__,
+                                 ', '.join(f"{name}={getattr(self, name)!r}" for name in self._fields))
+
+
+def record_class(fields, sobject=None, attributes='keep'):
+    """
+    Get (or generate and cache) the __slots__ record class of a field list
+    :param fields: tuple of field names in SELECT order
+    :param sobject: sobject type, used as the class name
+    :param attributes: 'intern' exposes one shared attributes object on the class instead of a slot
+    :return: Record subclass / None if the field names can't be used as slots
+    """
+    key = (sobject, fields, attributes)
+    try:
+        return _record_classes[key]
+    except KeyError:
+        pass
+    cls = None
+    if all(name.isidentifier() and not keyword.iskeyword(name) and not name.startswith('_') for name in fields):
+        namespace = {'__slots__': fields, '_fields': fields}
+        if attributes == 'intern':
+            namespace['attributes'] = SimpleNamespace(type=sobject)
+        cls = type(sobject or 'Record', (Record,), namespace)
+    _record_classes[key] = cls
+    return cls
+
+
+def materialize_compact(value, attributes='keep'):
+    """
+    Single pass materializer building __slots__ records, one generated class per distinct field list
+    :param value: dict / list / scalar
+    :param attributes: 'keep', 'intern' or 'drop' the attributes payload of every sobject
+    :return: Record / list / scalar
+    """
+    if isinstance(value, dict):
+        meta = value.get('attributes')
+        if isinstance(meta, dict) and attributes != 'keep':
+            mode = attributes
+            fields = tuple(key for key in value if key != 'attributes')
+        else:
+            mode = 'keep'
+            fields = tuple(value)
+        cls = record_class(fields, meta.get('type') if isinstance(meta, dict) else None, mode)
+        if cls is None:
+            return materialize(value)
+        record = object.__new__(cls)
+        for name in fields:
+            item = value[name]
+            if isinstance(item, (dict, list)):
+                item = materialize_compact(item, attributes)
+            setattr(record, name, item)
+        return record
+    if isinstance(value, list):
+        return [materialize_compact(item, attributes) if isinstance(item, (dict, list)) else item for item in value]
+    return value
+
+
+def parse_json(orderedDict, indent=2):
+    """Previous parse implementation, serializes to JSON and re-parses with a SimpleNamespace object_hook"""
     if 'records' in orderedDict:
         json_object = json.dumps(orderedDict['records'], indent=indent)
     else:
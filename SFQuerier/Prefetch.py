@@ -0,0 +1,171 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Prefetch.py
+
+"""
+Prefetch of records with their related records as a linked object graph, in place of a query per parent
+(Account.get_contacts, then Contact.get_cases for every contact).
+
+- Every include level is one 'SELECT ..., (SELECT ... FROM <relationship>) FROM <sobject> WHERE Id IN (...)'
+  query per chunk of IDs (Collections.id_chunks), the chunks run on the executor. 'Contacts.Cases' adds a level
+  over the IDs of every contact loaded, so a traversal costs a fixed number of round trips whatever the number
+  of parents. Paged subqueries are followed with query_more.
+- Children are listed on their parent under the relationship name (account.Contacts) and point back to it
+  under the lookup's relationship name (contact.Account, casecomment.Parent).
+- A record loaded through several paths is a single object (account.Cases and account.Contacts[0].Cases share
+  their cases), the graph is indexed by sobject and 15 character ID in the result's .graph.
+- Relationships outside CHILDREN are resolved from describe childRelationships when a MetadataCache is given.
+"""
+from SFQuerier import Paging, Parser
+from SFQuerier.Collections import RetrieveResult, id_chunks
+from SFQuerier.Executor import fan_out
+from SFQuerier.Result import log
+
+CHILDREN = {  # (parent, relationship): (child, lookup field)
+    ('Account', 'Contacts'): ('Contact', 'AccountId'),
+    ('Account', 'Cases'): ('Case', 'AccountId'),
+    ('Account', 'Opportunities'): ('Opportunity', 'AccountId'),
+    ('Account', 'Contracts'): ('Contract', 'AccountId'),
+    ('Contact', 'Cases'): ('Case', 'ContactId'),
+    ('Case', 'CaseComments'): ('CaseComment', 'ParentId'),
+}
+
+FIELDS = {  # Fields loaded by default, the ones the entity classes select
+    'Account': ('Id', 'AccountNumber', 'Name', 'CreatedDate', 'Website'),
+    'Contact': ('Id', 'FirstName', 'LastName', 'Email', 'Phone', 'AccountId'),
+    'Case': ('Id', 'CaseNumber', 'ContactId', 'AccountId', 'Type', 'Status', 'Subject', 'Description'),
+    'Opportunity': ('Id', 'AccountId', 'Amount', 'IsClosed', 'IsWon', 'Type'),
+    'Contract': ('Id', 'ContractNumber', 'AccountId', 'Status'),
+    'CaseComment': ('Id', 'ParentId', 'CommentBody', 'IsPublished'),
+}
+
+
+class PrefetchResult(RetrieveResult):
+    """Root records in input ID order with their related records linked, .graph is {sobject: {ID15: record}}"""
+
+    def __init__(self, records=(), missing=(), graph=None):
+        super().__init__(records, missing)
+        self.graph = graph if graph is not None else {}
+
+
+def parse_include(include):
+    """
+    :param include: relationship paths, e.g. ['Contacts.Cases', 'Opportunities']
+    :return: tree of {relationship: {nested relationship: ...}}
+    """
+    tree = {}
+    for path in include:
+        node = tree
+        for relationship in path.split('.'):
+            node = node.setdefault(relationship.strip(), {})
+    return tree
+
+
+def _parent_name(lookup):
+    """Relationship name of a lookup field, AccountId -> Account, Parent__c -> Parent__r"""
+    if lookup.endswith('__c'):
+        return lookup[:-3] + '__r'
+    return lookup[:-2] if lookup.endswith('Id') else lookup
+
+
+class _Prefetch:
+    def __init__(self, sf, fields=None, executor=None, metadata=None):
+        self._sf = sf
+        self._fields = dict(FIELDS, **{sobject: tuple(names.split(',')) if isinstance(names, str) else tuple(names)
+                                       for sobject, names in (fields or {}).items()})
+        self._executor = executor
+        self._metadata = metadata
+        self.graph = {}
+
+    def _child(self, sobject, relationship):
+        """:return: (child sobject, lookup field) of a parent-child relationship"""
+        child = CHILDREN.get((sobject, relationship))
+        if child is not None:
+            return child
+        if self._metadata is not None:
+            for item in self._metadata.describe(sobject).get('childRelationships', ()):
+                if item.get('relationshipName') == relationship:
+                    return item['childSObject'], item['field']
+        raise ValueError(f"Unknown relationship {sobject}.{relationship}")
+
+    def _fields_of(self, sobject, lookup=None):
+        """Selected fields of an sobject, Id first (the graph is keyed by it) and the lookup to the parent level"""
+        fields = [field for field in self._fields.get(sobject, ()) if field.strip().lower() != 'id']
+        fields.insert(0, 'Id')
+        if lookup is not None and lookup.lower() not in {field.strip().lower() for field in fields}:
+            fields.append(lookup)
+        return fields
+
+    def _node(self, sobject, raw, relationships):
+        """Record of the graph for a decoded record, merged into the record already loaded with the same ID"""
+        values = {key: value for key, value in raw.items() if key not in relationships}
+        nodes = self.graph.setdefault(sobject, {})
+        node = nodes.get(raw['Id'][:15])
+        if node is None:
+            node = nodes[raw['Id'][:15]] = Parser.materialize(values)
+        else:
+            node.__dict__.update(Parser.materialize(values).__dict__)
+        return node
+
+    def load(self, sobject, ids, tree, lookup=None):
+        """
+        Load one level: the records of ids with the children of every relationship of tree, then the next levels
+        :param lookup: lookup field to the parent level, kept in the selected fields
+        :return: dict of {ID15: record}
+        """
+        children = {relationship: self._child(sobject, relationship) for relationship in tree}
+        subqueries = ''.join(",(SELECT {0} FROM {1})".format(','.join(self._fields_of(child, child_lookup)),
+                                                             relationship)
+                             for relationship, (child, child_lookup) in children.items())
+        select = "SELECT {0}{1} FROM {2}".format(','.join(self._fields_of(sobject, lookup)), subqueries, sobject)
+        pages = fan_out(self._executor,
+                        lambda soql: [record for result in Paging.iter_results(self._sf, soql)
+                                      for record in result['records']],
+                        list(id_chunks(select, list(dict.fromkeys(ids)))))
+        if pages.errors:
+            raise pages.errors[0][2]
+        loaded = {}
+        linked = {relationship: [] for relationship in tree}
+        for page in pages:
+            for raw in page:
+                node = loaded[raw['Id'][:15]] = self._node(sobject, raw, children)
+                for relationship, (child, child_lookup) in children.items():
+                    records = [self._node(child, record, ())
+                               for record in Paging.children(self._sf, raw, relationship)]
+                    for record in records:
+                        setattr(record, _parent_name(child_lookup), node)
+                    setattr(node, relationship, records)
+                    linked[relationship].extend(records)
+        for relationship, nested in tree.items():
+            if nested and linked[relationship]:
+                child, child_lookup = children[relationship]
+                self.load(child, [record.Id for record in linked[relationship]], nested, child_lookup)
+        return loaded
+
+
+def fetch(sf, sobject, ids, include=(), fields=None, executor=None, metadata=None):
+    """
+    Records with their related records, a fixed number of queries per include level
+    :param sf: simple-salesforce client
+    :param sobject: sobject of the IDs, e.g. 'Account'
+    :param ids: list of record IDs (15 or 18 characters)
+    :param include: relationship paths, e.g. ['Contacts.Cases', 'Opportunities', 'Contracts']
+    :param fields: dict of {sobject: field names} overriding FIELDS, Id is always selected
+    :param executor: FanOutExecutor running the chunk queries of a level concurrently, one after the other if None
+    :param metadata: MetadataCache resolving relationships outside CHILDREN
+    :return: PrefetchResult
+    """
+    ids = list(dict.fromkeys(ids))
+    prefetch = _Prefetch(sf, fields=fields, executor=executor, metadata=metadata)
+    loaded = prefetch.load(sobject, ids, parse_include(include))
+    records, missing = [], []
+    for record_id in ids:
+        record = loaded.get(record_id[:15])
+        if record is None:
+            missing.append(record_id)
+        else:
+            records.append(record)
+    if missing:
+        log.warning("[GET] %d of %d %s IDs were not found", len(missing), len(ids), sobject)
+    return PrefetchResult(records, missing, prefetch.graph)
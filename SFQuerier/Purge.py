@@ -0,0 +1,145 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Purge.py
+
+"""
+Cascading purge engine, loads the whole dependency tree of a record with relationship subqueries and
+deletes it bottom-up with sObject Collections deletes. Levels that don't depend on each other run
+concurrently on a bounded worker pool, every 200 record chunk being its own task. A wave with failed deletes
+ends the purge: deleting the parents would have Salesforce cascade to the children reported as failed.
+"""
+from SFQuerier import Collections, Paging, Parser, QueryBuilder
+from SFQuerier.Executor import FanOutExecutor
+from SFQuerier.Result import Result, log
+
+MAX_WORKERS = 4
+
+ACCOUNT_TREE = QueryBuilder.select('Account', "Id,"
+                                              "(SELECT Id,CaseNumber FROM Cases),"
+                                              "(SELECT Id FROM Opportunities),"
+                                              "(SELECT Id FROM Contacts),"
+                                              "(SELECT Id,ContractNumber FROM Contracts)").where("Id = :id")
+ACCOUNT_COMMENTS = QueryBuilder.select('CaseComment', "Id,ParentId") \
+    .where("ParentId IN (SELECT Id FROM Case WHERE AccountId = :id)")
+
+CONTACT_TREE = QueryBuilder.select('Contact', "Id,(SELECT Id,CaseNumber FROM Cases)").where("Id = :id")
+CONTACT_COMMENTS = QueryBuilder.select('CaseComment', "Id,ParentId") \
+    .where("ParentId IN (SELECT Id FROM Case WHERE ContactId = :id)")
+
+# Deletion waves, every sobject in a wave only depends on sobjects of earlier waves
+ACCOUNT_WAVES = (('CaseComment', 'Opportunity', 'Contract'), ('Case',), ('Contact',), ('Account',))
+CONTACT_WAVES = (('CaseComment',), ('Case',), ('Contact',))
+
+
+def _children(sf, parent, relationship):
+    """All records of a parent-child subquery, parsed"""
+    return Parser.materialize(Paging.children(sf, parent, relationship))
+
+
+def load_account_tree(sf, accountId):
+    """
+    Load the records depending on an account in two queries
+    :return: dict of {sobject: records}, empty if the account doesn't exist
+    """
+    accounts = sf.query(ACCOUNT_TREE.bind(id=accountId))['records']
+    if not accounts:
+        return {}
+    account = accounts[0]
+    return {'Account': [Parser.materialize(account)],
+            'Case': _children(sf, account, 'Cases'),
+            'Opportunity': _children(sf, account, 'Opportunities'),
+            'Contact': _children(sf, account, 'Contacts'),
+            'Contract': _children(sf, account, 'Contracts'),
+            'CaseComment': Parser.materialize(sf.query_all(ACCOUNT_COMMENTS.bind(id=accountId))['records'])}
+
+
+def load_contact_tree(sf, contactId):
+    """
+    Load the records depending on a contact in two queries
+    :return: dict of {sobject: records}, empty if the contact doesn't exist
+    """
+    contacts = sf.query(CONTACT_TREE.bind(id=contactId))['records']
+    if not contacts:
+        return {}
+    contact = contacts[0]
+    return {'Contact': [Parser.materialize(contact)],
+            'Case': _children(sf, contact, 'Cases'),
+            'CaseComment': Parser.materialize(sf.query_all(CONTACT_COMMENTS.bind(id=contactId))['records'])}
+
+
+def delete_tree(sf, tree, waves, executor, continue_on_error=False):
+    """
+    Delete a loaded tree wave by wave, the chunks of every sobject in a wave are deleted concurrently
+    :param executor: FanOutExecutor running the chunk deletes
+    :param continue_on_error: run the later waves after a wave had failed deletes, stop before them if False
+    :return: (deleted {sobject: [ids]}, failed [results])
+    """
+    deleted = {sobject: [] for wave in waves for sobject in wave}
+    failed = []
+    for number, wave in enumerate(waves):
+        if failed and not continue_on_error:
+            log.warning("%d deletes failed, stopping before the %s deletes", len(failed),
+                        ' / '.join(sobject for later in waves[number:] for sobject in later))
+            break
+        tasks = [(sobject, chunk) for sobject in wave
+                 for chunk in Collections.chunks([record.Id for record in tree.get(sobject, [])])]
+        chunk_results = executor.map(lambda task: Collections.delete(sf, task[0], task[1]), tasks)
+        for (index, task, e) in chunk_results.errors:
+            chunk_results[index] = Collections._failed_chunk(e, task[1])
+        for (sobject, chunk), results in zip(tasks, chunk_results):
+            for result in results:
+                if result.success:
+                    deleted[sobject].append(result.id)
+                else:
+                    failed.append(result)
+        for sobject in wave:
+            if deleted[sobject]:
+                log.info("Deleted %d %s records", len(deleted[sobject]), sobject)
+    return deleted, failed
+
+
+def _purge(sf, tree, waves, max_workers, executor, continue_on_error):
+    """Delete with the shared executor, or a dedicated pool when max_workers is given or there is no executor"""
+    if executor is not None and max_workers is None:
+        return delete_tree(sf, tree, waves, executor, continue_on_error)
+    executor = FanOutExecutor(max_workers=max_workers or MAX_WORKERS)
+    try:
+        return delete_tree(sf, tree, waves, executor, continue_on_error)
+    finally:
+        executor.shutdown()
+
+
+def purge_account(sf, accountId, max_workers=None, executor=None, continue_on_error=False):
+    """
+    Delete an account with its case comments, cases, opportunities, contacts and contracts
+    :param max_workers: size of a dedicated worker pool, MAX_WORKERS if there is no executor either
+    :param executor: shared FanOutExecutor
+    :param continue_on_error: keep deleting the parents after failed deletes, see delete_tree
+    :return: Dict [bool, cases, opportunities, contacts, contracts, comments, deleted, failed]
+    """
+    tree = load_account_tree(sf, accountId)
+    if not tree:
+        log.warning("Account ID: %s was not found", accountId)
+        return Result(False, accountId, [{'statusCode': 'NOT_FOUND', 'message': 'Account was not found', 'fields': []}])
+    deleted, failed = _purge(sf, tree, ACCOUNT_WAVES, max_workers, executor, continue_on_error)
+    return {'bool': not failed, 'cases': tree['Case'], 'opportunities': tree['Opportunity'],
+            'contacts': tree['Contact'], 'contracts': tree['Contract'], 'comments': tree['CaseComment'],
+            'deleted': deleted, 'failed': failed}
+
+
+def purge_contact(sf, contactId, max_workers=None, executor=None, continue_on_error=False):
+    """
+    Delete a contact with its cases and their comments
+    :param max_workers: size of a dedicated worker pool, MAX_WORKERS if there is no executor either
+    :param executor: shared FanOutExecutor
+    :param continue_on_error: keep deleting the contact after failed deletes, see delete_tree
+    :return: Dict [bool, cases, comments, deleted, failed]
+    """
+    tree = load_contact_tree(sf, contactId)
+    if not tree:
+        log.warning("Contact ID: %s was not found", contactId)
+        return Result(False, contactId, [{'statusCode': 'NOT_FOUND', 'message': 'Contact was not found', 'fields': []}])
+    deleted, failed = _purge(sf, tree, CONTACT_WAVES, max_workers, executor, continue_on_error)
+    return {'bool': not failed, 'cases': tree['Case'], 'comments': tree['CaseComment'],
+            'deleted': deleted, 'failed': failed}
@@ -0,0 +1,206 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : QueryBuilder.py
+
+"""
+SOQL query builder with escaped bind parameters and a cache of compiled statements.
+
+    BY_NAME = QueryBuilder.select('Account', 'Id,Name').where('Name = :name').limit(10)
+    sf.query(BY_NAME.bind(name="O'Reilly"))  # SELECT Id,Name FROM Account WHERE Name = 'O\\'Reilly' LIMIT 10
+
+- :name placeholders (outside quoted strings) are bound to SOQL literals: strings are quoted and escaped,
+  None is null, booleans true / false, datetimes UTC literals, lists and tuples IN value lists.
+- A statement is parsed once into literal text and placeholders (compile, LRU cached on the template),
+  binding only joins the escaped values in, the statements of the entity classes are built at import.
+- bind_chunks splits a list bound to IN over as many queries as needed to keep every query URL under
+  MAX_QUERY_URL_LENGTH once URL encoded (queries are sent as GET), for lookups of thousands of values.
+https://developer.salesforce.com/docs/atlas.en-us.soql_sosl.meta/soql_sosl/sforce_api_calls_soql_select_quotedstringescapes.htm
+"""
+import re
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from functools import lru_cache
+from urllib.parse import quote
+
+MAX_QUERY_URL_LENGTH = 15000  # Encoded SOQL length per GET, below the 16,384 character URI limit
+CACHE_SIZE = 512  # Compiled statements
+
+_ESCAPES = {'\\': '\\\\', "'": "\\'", '"': '\\"', '\n': '\\n', '\r': '\\r', '\t': '\\t', '\b': '\\b', '\f': '\\f'}
+_ESCAPED = re.compile('|'.join(re.escape(char) for char in _ESCAPES))
+_TOKENS = re.compile(r"'(?:[^'\\]|\\.)*'|:([A-Za-z_]\w*)", re.S)  # Quoted strings are skipped
+
+
+def escape(text):
+    """Escape a string for a quoted SOQL literal"""
+    return _ESCAPED.sub(lambda match: _ESCAPES[match.group(0)], text)
+
+
+def literal(value):
+    """
+    SOQL literal of a Python value
+    :param value: str / None / bool / int / float / Decimal / datetime (naive is UTC) / date / list / tuple / set
+    :return: literal text, e.g. 'O\\'Reilly' / null / true / 2021-04-05T10:00:00Z / ('a','b')
+    """
+    if value is None:
+        return 'null'
+    if isinstance(value, str):
+        return "'" + escape(value) + "'"
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, Decimal)):
+        return str(value)
+    if isinstance(value, float):
+        if value != value or value in (float('inf'), float('-inf')):
+            raise ValueError(f"No SOQL literal for {value}")
+        return format(Decimal(repr(value)), 'f')  # No exponent, SOQL doesn't take 1e-07
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (list, tuple, set, frozenset)):
+        if not value:
+            raise ValueError("An IN list needs at least one value")
+        return '(' + ','.join(literal(item) for item in value) + ')'
+    raise TypeError(f"No SOQL literal for {type(value).__name__}")
+
+
+class Statement:
+    """Compiled SOQL template: literal parts with the placeholder names between them"""
+
+    def __init__(self, template):
+        self.template = template
+        self.parts = []
+        self.names = []
+        start = 0
+        for match in _TOKENS.finditer(template):
+            if match.group(1) is not None:
+                self.parts.append(template[start:match.start()])
+                self.names.append(match.group(1))
+                start = match.end()
+        self.parts.append(template[start:])
+
+    def _render(self, params, start=0, stop=None):
+        """:return: text from part start to part stop, with the placeholders between them bound"""
+        stop = len(self.parts) - 1 if stop is None else stop
+        pieces = [self.parts[start]]
+        for name, part in zip(self.names[start:stop], self.parts[start + 1:stop + 1]):
+            try:
+                pieces.append(literal(params[name]))
+            except KeyError:
+                raise ValueError(f"Missing bind parameter :{name} of {self.template}") from None
+            pieces.append(part)
+        return ''.join(pieces)
+
+    def bind(self, **params):
+        """:return: SOQL with every placeholder replaced by the literal of its parameter"""
+        if not self.names:
+            return self.template
+        return self._render(params)
+
+    def bind_chunks(self, param, values, max_length=MAX_QUERY_URL_LENGTH, max_values=None, **params):
+        """
+        Split the values of one IN placeholder over as many queries as needed
+        :param param: name of the placeholder the values are bound to, it appears once
+        :param values: list of values, duplicates are kept
+        :param max_length: URL encoded length of every query
+        :param max_values: values per query, no limit if None
+        :return: generator of SOQL queries, none if values is empty
+        """
+        if self.names.count(param) != 1:
+            raise ValueError(f"bind_chunks needs :{param} exactly once in {self.template}")
+        index = self.names.index(param)
+        head, tail = self._render(params, stop=index), self._render(params, start=index + 1)
+        budget = max_length - len(quote(head + '()' + tail))
+        chunk, used = [], 0
+        for value in values:
+            text = literal(value)
+            cost = len(quote(text + ','))
+            if chunk and (used + cost > budget or max_values is not None and len(chunk) >= max_values):
+                yield head + '(' + ','.join(chunk) + ')' + tail
+                chunk, used = [], 0
+            chunk.append(text)
+            used += cost
+        if chunk:
+            yield head + '(' + ','.join(chunk) + ')' + tail
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile(template):
+    """:return: Statement of a SOQL template, compiled once per template"""
+    return Statement(template)
+
+
+class Query:
+    """Immutable SELECT builder, every method returns a new Query"""
+
+    def __init__(self, sobject, fields='Id', conditions=(), order=None, limit=None):
+        """
+        :param fields: comma separated string (kept as is, subqueries included) / list of field names
+        :param conditions: WHERE conditions, joined with AND
+        """
+        self.sobject = sobject
+        self.fields = fields if isinstance(fields, str) else ','.join(fields)
+        self.conditions = tuple(conditions)
+        self.order = order
+        self.row_limit = limit
+        self.soql = "SELECT {0} FROM {1}".format(self.fields, sobject)
+        if self.conditions:
+            self.soql += " WHERE " + ' AND '.join(
+                f"({condition})" if len(self.conditions) > 1 and ' OR ' in condition.upper() else condition
+                for condition in self.conditions)
+        if order:
+            self.soql += f" ORDER BY {order}"
+        if limit is not None:
+            self.soql += f" LIMIT {int(limit)}"
+        self._statement = None
+
+    def _replace(self, **changes):
+        values = dict(sobject=self.sobject, fields=self.fields, conditions=self.conditions, order=self.order,
+                      limit=self.row_limit)
+        values.update(changes)
+        return Query(**values)
+
+    def where(self, condition):
+        """:param condition: SOQL condition with :name placeholders, ANDed with the previous ones"""
+        return self._replace(conditions=self.conditions + (condition,))
+
+    def in_(self, field, param=None):
+        """Condition 'field IN :param', param defaults to the field name"""
+        return self.where(f"{field} IN :{param or field}")
+
+    def order_by(self, fields):
+        return self._replace(order=fields if isinstance(fields, str) else ','.join(fields))
+
+    def limit(self, count):
+        return self._replace(limit=count)
+
+    @property
+    def statement(self):
+        if self._statement is None:
+            self._statement = compile(self.soql)
+        return self._statement
+
+    def bind(self, **params):
+        """:return: SOQL of the query, see Statement.bind"""
+        return self.statement.bind(**params)
+
+    def bind_chunks(self, param, values, max_length=MAX_QUERY_URL_LENGTH, max_values=None, **params):
+        """:return: generator of SOQL queries, see Statement.bind_chunks"""
+        return self.statement.bind_chunks(param, values, max_length=max_length, max_values=max_values, **params)
+
+    def __str__(self):
+        return self.soql
+
+    def __repr__(self):
+        return f"Query({self.soql!r})"
+
+
+def select(sobject, fields='Id'):
+    """
+    :param fields: comma separated string / list of field names
+    :return: Query
+    """
+    return Query(sobject, fields)
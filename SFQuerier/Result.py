@@ -0,0 +1,187 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Result.py
+
+"""
+Structured results and the logging error channel.
+
+Write methods (create / update / delete / add) return a Result (success, id, errors, latency), a failing
+call of any method returns a falsy Result instead of False, so 'if not result' and 'result == False' keep
+working while the errors can be read programmatically. Batched writes return a BatchResult, one Result per
+record, with an aggregated report() and a single log line per batch.
+
+Messages go to the 'SFQuerier' logger (warnings for errors, info for completed writes) instead of stdout,
+formatted only if a handler takes them. set_logging(False) switches the channel off.
+"""
+import functools
+import logging
+import time
+
+from simple_salesforce.exceptions import SalesforceError, SalesforceMalformedRequest, SalesforceResourceNotFound
+
+log = logging.getLogger('SFQuerier')
+
+
+def set_logging(enabled=True):
+    """Switch the SFQuerier log channel on / off"""
+    log.disabled = not enabled
+
+
+def error_details(e):
+    """
+    Salesforce errors of an exception
+    :return: list of error dicts [statusCode, message, fields]
+    """
+    if isinstance(e, SalesforceError) and isinstance(e.content, list):
+        return [{'statusCode': error.get('errorCode'), 'message': error.get('message'),
+                 'fields': error.get('fields', [])} for error in e.content if isinstance(error, dict)]
+    return [{'statusCode': type(e).__name__, 'message': str(e), 'fields': []}]
+
+
+class Result:
+    __slots__ = ('success', 'id', 'errors', 'latency', 'value')
+
+    def __init__(self, success, id=None, errors=None, latency=None, value=None):
+        """
+        :param success: True if the call succeeded
+        :param id: record ID the call was about (created record ID for creates)
+        :param errors: list of error dicts [statusCode, message, fields]
+        :param latency: seconds the call took
+        :param value: returned payload, if any
+        """
+        self.success = success
+        self.id = id
+        self.errors = errors or []
+        self.latency = latency
+        self.value = value
+
+    def __bool__(self):
+        return self.success
+
+    def __eq__(self, other):
+        if isinstance(other, bool):
+            return self.success is other
+        if isinstance(other, Result):
+            return (self.success, self.id, self.errors) == (other.success, other.id, other.errors)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        if self.success:
+            return f"Result(success=True, id={self.id!r})"
+        return f"Result(success=False, id={self.id!r}, errors={self.errors!r})"
+
+    @property
+    def error_codes(self):
+        return [error['statusCode'] for error in self.errors]
+
+    def _asdict(self):
+        return {'success': self.success, 'id': self.id, 'errors': self.errors, 'latency': self.latency}
+
+
+def succeeded(record_id=None, value=None):
+    """Truthy Result of a completed call"""
+    return Result(True, record_id, value=value)
+
+
+def failure(action, e, record_id=None):
+    """
+    Log a failed call and build its falsy Result
+    :param action: 'GET' / 'CREATE' / 'UPDATE' / 'DELETE' ...
+    :param e: exception the call raised
+    :param record_id: ID the call was about
+    :return: Result
+    """
+    errors = error_details(e)
+    if log.isEnabledFor(logging.WARNING):
+        code, message = errors[0]['statusCode'], errors[0]['message']
+        if isinstance(e, SalesforceResourceNotFound):
+            log.warning("[%s]%s: Resource %s not found. %s", action, code, e.resource_name, message)
+        elif isinstance(e, SalesforceMalformedRequest):
+            log.warning("[%s]%s: Malformed request %s. %s ID: %s", action, code, e.url, message, record_id)
+        else:
+            log.warning("[%s] Something went wrong! %s ID: %s", action, e, record_id)
+    return Result(False, record_id, errors)
+
+
+def rejected(action, errors, record_id=None):
+    """Failed Result of a call Salesforce answered without raising (success false, unexpected status)"""
+    log.warning("[%s] Failed ID: %s %s", action, record_id, errors)
+    return Result(False, record_id, errors)
+
+
+def unexpected_status(action, status, record_id=None):
+    """Failed Result of a call answered with a status other than the expected one"""
+    return rejected(action, [{'statusCode': str(status), 'message': "Unexpected response status", 'fields': []}],
+                    record_id)
+
+
+def missing(name):
+    """Falsy Result of a call missing a required argument, e.g. missing('Account ID')"""
+    log.warning("%s is missing!", name)
+    return Result(False, errors=[{'statusCode': 'MISSING_ARGUMENT', 'message': f"{name} is missing", 'fields': []}])
+
+
+def timed(method):
+    """Set the latency of the Result a method returns"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        result = method(*args, **kwargs)
+        if isinstance(result, Result) and result.latency is None:
+            result.latency = time.perf_counter() - started
+        return result
+    return wrapper
+
+
+class BatchReport:
+    """Aggregated outcome of a batch: total, succeeded, failed, failures by statusCode and latency"""
+
+    def __init__(self, results, action='', sobject='', latency=None):
+        self.action = action
+        self.sobject = sobject
+        self.latency = latency
+        self.total = len(results)
+        self.failed = 0
+        self.errors = {}
+        for result in results:
+            if not result.success:
+                self.failed += 1
+                for code in result.error_codes or [None]:
+                    self.errors[code] = self.errors.get(code, 0) + 1
+        self.succeeded = self.total - self.failed
+
+    def __str__(self):
+        errors = ', '.join(f"{code}: {count}" for code, count in sorted(self.errors.items(), key=str))
+        return "[{action} MANY] {failed} of {total} {sobject} records failed{errors}".format(
+            action=self.action, failed=self.failed, total=self.total, sobject=self.sobject,
+            errors=f" ({errors})" if errors else '')
+
+    def _asdict(self):
+        return {'total': self.total, 'succeeded': self.succeeded, 'failed': self.failed, 'errors': dict(self.errors),
+                'latency': self.latency}
+
+
+class BatchResult(list):
+    """Results of a batch in input order, failures and the aggregated report are available without any I/O"""
+
+    def __init__(self, results=(), action='', sobject='', latency=None):
+        """:param latency: seconds the whole batch took, every record's latency is the one of its chunk request"""
+        super().__init__(results)
+        self.action = action
+        self.sobject = sobject
+        self.latency = latency
+
+    @property
+    def failures(self):
+        return [result for result in self if not result.success]
+
+    @property
+    def success(self):
+        return all(result.success for result in self)
+
+    def report(self):
+        """:return: BatchReport"""
+        return BatchReport(self, self.action, self.sobject, self.latency)
@@ -0,0 +1,161 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Retry.py
+
+"""
+Retry with exponential backoff and full jitter for transient failures (503, 502, 504, 429, connection resets,
+timeouts), installed on the client's requests session so every call of every method is covered.
+
+Requests are only replayed when that is safe:
+- GET / HEAD / PATCH / PUT / DELETE are idempotent, they are retried on every transient failure.
+- POST creates records (or jobs), it is only retried when Salesforce can't have processed it: the connection
+  couldn't be opened, or the request was refused with 429 / 503 before processing. A reset or a timeout
+  after the request was sent may have created the record, it isn't replayed.
+A Retry-After header is honored when it asks for a longer wait than the backoff.
+"""
+import random
+import threading
+import time
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+MAX_RETRIES = 3
+BACKOFF = 0.5  # Seconds before the first retry, doubled on every retry
+MAX_BACKOFF = 30
+RETRY_STATUSES = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PATCH', 'PUT', 'DELETE')
+REFUSED_STATUSES = (429, 503)  # Answered before processing, safe to replay a POST
+
+
+def _not_sent(e):
+    """True if the request never reached Salesforce (connection couldn't be opened)"""
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(e.args[0], 'reason', None) if e.args else None
+    return isinstance(e, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+class RetryPolicy:
+    def __init__(self, max_retries=MAX_RETRIES, backoff=BACKOFF, max_backoff=MAX_BACKOFF, statuses=RETRY_STATUSES,
+                 methods=IDEMPOTENT_METHODS, retry_posts=True, max_elapsed=None):
+        """
+        :param max_retries: retries after the first attempt, 0 disables retrying
+        :param backoff: seconds before the first retry, doubled on every retry, full jitter
+        :param max_backoff: cap of a single wait
+        :param statuses: HTTP statuses retried for idempotent methods
+        :param methods: idempotent methods, retried on every transient failure
+        :param retry_posts: replay POSTs Salesforce didn't process (connection refused, 429 / 503), never if False
+        :param max_elapsed: seconds after which no retry starts, no limit if None
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = tuple(statuses)
+        self.methods = tuple(method.upper() for method in methods)
+        self.retry_posts = retry_posts
+        self.max_elapsed = max_elapsed
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {'calls': 0, 'attempts': 0, 'retries': 0, 'recovered': 0, 'gave_up': 0,
+                       'latency_total': 0.0, 'latency_max': 0.0, 'backoff_total': 0.0}
+        self.reasons = {}
+
+    def retryable(self, method, response=None, error=None):
+        """True if a failed attempt may be replayed"""
+        method = method.upper()
+        if error is not None:
+            if _not_sent(error):
+                return method in self.methods or (method == 'POST' and self.retry_posts)
+            return method in self.methods and isinstance(error, (requests.exceptions.ConnectionError,
+                                                                 requests.exceptions.Timeout))
+        if method in self.methods:
+            return response.status_code in self.statuses
+        return method == 'POST' and self.retry_posts and response.status_code in REFUSED_STATUSES
+
+    def delay(self, retry, response=None):
+        """Seconds to wait before retry number retry (0 based)"""
+        wait = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** retry))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            wait = max(wait, min(self.max_backoff, int(retry_after)))
+        return wait
+
+    def _count(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                self._stats[name] += value
+
+    def send(self, send, request, **kwargs):
+        """Send a prepared request with send, retrying transient failures"""
+        started = time.monotonic()
+        retry = 0
+        try:
+            while True:
+                response, error = None, None
+                self._count(attempts=1)
+                try:
+                    response = send(request, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = e
+                failed = error is not None or response.status_code in self.statuses
+                if not failed:
+                    if retry:
+                        self._count(recovered=1)
+                    return response
+                elapsed = time.monotonic() - started
+                if retry >= self.max_retries or not self.retryable(request.method, response, error) or \
+                        (self.max_elapsed is not None and elapsed >= self.max_elapsed):
+                    if retry:
+                        self._count(gave_up=1)
+                    if error is not None:
+                        raise error
+                    return response
+                reason = type(error).__name__ if error is not None else str(response.status_code)
+                wait = self.delay(retry, response)
+                with self._lock:
+                    self.reasons[reason] = self.reasons.get(reason, 0) + 1
+                self._count(retries=1, backoff_total=wait)
+                if response is not None:
+                    response.close()
+                time.sleep(wait)
+                retry += 1
+        finally:
+            self._local.retries = retry
+            latency = time.monotonic() - started
+            with self._lock:
+                self._stats['calls'] += 1
+                self._stats['latency_total'] += latency
+                self._stats['latency_max'] = max(self._stats['latency_max'], latency)
+
+    def last_retries(self):
+        """Retries of the last request sent by the current thread"""
+        return getattr(self._local, 'retries', 0)
+
+    def stats(self):
+        """:return: dict [calls, attempts, retries, recovered, gave_up, latency_avg, latency_max, backoff_total, reasons]"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['reasons'] = dict(self.reasons)
+        stats['latency_avg'] = stats.pop('latency_total') / stats['calls'] if stats['calls'] else 0.0
+        return stats
+
+
+def install(session, policy):
+    """Route every request of a requests session through the retry policy, outside an installed scheduler"""
+    send = session.send
+    local = threading.local()
+
+    def retried_send(request, **kwargs):
+        if getattr(local, 'active', False):  # Redirect of a request already being retried
+            return send(request, **kwargs)
+        local.active = True
+        try:
+            return policy.send(send, request, **kwargs)
+        finally:
+            local.active = False
+
+    session.send = retried_send
+    session.retry = policy
+    return session
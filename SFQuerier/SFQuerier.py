@@ -4,6 +4,7 @@
 # @File    : SFQuerier.py
 
 import collections
+import threading
 from html import escape
 
 from simple_salesforce import Salesforce
@@ -22,7 +23,9 @@ This module is an extension of simple-salesforce REST API
 https://github.com/simple-salesforce/simple-salesforce/
 """
 
-from SFQuerier import Parser
+from SFQuerier import Bulk, Cache, Collections, Columnar, Http, KeyPrefix, Metadata, Metrics, Mirror, Paging, \
+    Parser, Result, Retry, Scheduler, SessionCache, Sync
+from SFQuerier.Executor import FanOutExecutor, MAX_WORKERS
 from SFQuerier.Account import Account
 from SFQuerier.Case import Case
 from SFQuerier.Contact import Contact
@@ -32,7 +35,45 @@ from SFQuerier.Opportunity import Opportunity
 
 class SalesforceQ:
     def __init__(self, instance=None, instance_url=None, username=None, password=None, security_token=None,
-                 organizationId=None, domain='login'):
+                 organizationId=None, domain='login', max_workers=MAX_WORKERS, pool_maxsize=None, session=None,
+                 keep_alive=True, compression=True, cache=None, metadata_path=Metadata.CACHE_DIR,
+                 session_cache=None, scheduler=None, retry=True, metrics=None, mirror=None):
+        """
+        :param max_workers: threads the list paths (get_sobject, get_by_id, batched writes, purge) fan out to
+        :param pool_maxsize: connections kept per host, max_workers if None
+        :param session: requests session shared by every entity, a tuned Http.SalesforceSession if None
+        :param keep_alive: keep connections open between requests (ignored with a given session)
+        :param compression: gzip responses and large request bodies (ignored with a given session)
+        :param cache: Cache.RecordCache in front of get_by_id / get_by_number, True for the default LRU, off if None
+        :param metadata_path: directory describe() results are persisted in, kept in memory only if None
+        :param session_cache: SessionCache.SessionStore reusing the login session across processes,
+                              True for SessionCache.EncryptedFileStore(), a SOAP login every time if None
+        :param scheduler: Scheduler.RequestScheduler pacing every request on the API limits, True for the default
+                          one, requests go out unscheduled if None
+        :param retry: Retry.RetryPolicy replaying transient failures (503, resets, timeouts) with backoff,
+                      True for the default policy, no retry if None / False
+        :param metrics: Metrics.Metrics recording latency, bytes and retries of every request and parse, True for
+                        an in-memory HistogramExporter, nothing recorded if None
+        :param mirror: Mirror.SQLiteMirror answering the entity lookups offline while it is fresh, True for a
+                       mirror file per instance in Mirror.MIRROR_DIR, lookups always query the API if None;
+                       kept up to date with sync_mirror()
+        """
+        self.executor = FanOutExecutor(max_workers=max_workers, pool_maxsize=pool_maxsize)
+        self.session = session or Http.SalesforceSession(pool_maxsize=self.executor.pool_maxsize,
+                                                         keep_alive=keep_alive, compression=compression)
+        self.cache = Cache.RecordCache() if cache is True else cache or None
+        self.session_cache = SessionCache.EncryptedFileStore() if session_cache is True else session_cache or None
+        self.scheduler = Scheduler.RequestScheduler() if scheduler is True else scheduler or None
+        if self.scheduler is not None:
+            Scheduler.install(self.session, self.scheduler)
+        self.retry = Retry.RetryPolicy() if retry is True else retry or None
+        if self.retry is not None:
+            Retry.install(self.session, self.retry)  # Outside the scheduler, every attempt waits for its slot
+        self.metrics = Metrics.Metrics() if metrics is True else metrics or None
+        if self.metrics is not None:
+            Metrics.install(self.session, self.metrics)  # Outermost, a call is recorded once with its retries
+        self._entities = {}
+        self._entities_lock = threading.Lock()
         self.username = escape(username) if username else None
         self.password = escape(password) if password else None
         self.instance = escape(instance) if instance else None
@@ -42,30 +83,24 @@ class SalesforceQ:
         if self.username is not None and self.password is not None and self.instance is not None or self.instance_url is not None or self.instance is not None:
             if security_token is not None:
                 self.security_token = security_token
-                self.sf = Salesforce(instance=self.instance, username=self.username, password=self.password,
-                                     security_token=self.security_token, domain=domain)
-                self.Account = Account(self.sf)
-                self.Contact = Contact(self.sf)
-                self.Case = Case(self.sf)
-                self.Opportunity = Opportunity(self.sf)
-                self.Contract = Contract(self.sf)
+                self.sf = self._connect(domain, security_token=self.security_token)
 
             elif organizationId is not None:
                 self.organizationId = organizationId
-                self.sf = Salesforce(instance=self.instance, username=self.username, password=self.password,
-                                     organizationId=self.organizationId, domain=domain)
-
-                self.Account = Account(self.sf)
-                self.Contact = Contact(self.sf)
-                self.Case = Case(self.sf)
-                self.Opportunity = Opportunity(self.sf)
-                self.Contract = Contract(self.sf)
+                self.sf = self._connect(domain, organizationId=self.organizationId)
 
             if self.sf is None:
                 raise SalesforceAuthenticationFailed('INVALID AUTH',
                                                      'You must submit username and password either a security token or '
                                                      'organizationId for authentication')
             else:
+                self.executor.mount(self.session)
+                self.metadata = Metadata.MetadataCache(self.sf, path=metadata_path)
+                self.key_prefixes = KeyPrefix.KeyPrefixIndex(self.metadata)
+                self.mirror = Mirror.SQLiteMirror(Mirror.default_path(self.sf.sf_instance)) if mirror is True \
+                    else mirror or None
+                if self.mirror is not None and self.mirror.version is None:
+                    self.mirror.version = self.sf.sf_version
                 """SOQL queries: 
                 
                 query:  #Equivalent to .get(path='query', params='q=SELECT Id, Name FROM Contact WHERE LastName = 'Adam'')
@@ -83,6 +118,10 @@ class SalesforceQ:
                 query_all:
                 A convenience of query_more, to retrieve all of the results in a single local method call use
                     .query_all("SELECT Id, Email FROM Contact WHERE LastName = 'Jones'")
+                
+                iter_query:
+                Lazy alternative to query_all, yields parsed records and fetches the next page only when needed
+                    .iter_query("SELECT Id, Email FROM Contact", batch_size=2000)
                 """
                 self.query = self.sf.query
                 self.query_more = self.sf.query_more
@@ -93,6 +132,95 @@ class SalesforceQ:
                                                  'You must submit username and password either a security token or '
                                                  'organizationId for authentication')
 
+    def connection_stats(self):
+        """Connection reuse of the shared session
+        :return Dict [requests, connections, reused] / None if the given session doesn't count connections
+                """
+        stats = getattr(self.session, 'stats', None)
+        return stats() if callable(stats) else None
+
+    def _connect(self, domain, **credentials):
+        """simple-salesforce client, logged in or on the cached session of the user"""
+        if self.session_cache is not None:
+            return SessionCache.connect(self.session_cache, self.username, self.password, domain=domain,
+                                        session=self.session, **credentials)
+        return Salesforce(instance=self.instance, username=self.username, password=self.password, domain=domain,
+                          session=self.session, **credentials)
+
+    def entity(self, cls):
+        """Shared entity object of a class (Account, Contact, ...), built on first access"""
+        instance = self._entities.get(cls)
+        if instance is None:
+            with self._entities_lock:
+                instance = self._entities.get(cls)
+                if instance is None:
+                    instance = self._entities[cls] = cls(self.sf, self)
+        return instance
+
+    @property
+    def Account(self):
+        return self.entity(Account)
+
+    @property
+    def Contact(self):
+        return self.entity(Contact)
+
+    @property
+    def Case(self):
+        return self.entity(Case)
+
+    @property
+    def Opportunity(self):
+        return self.entity(Opportunity)
+
+    @property
+    def Contract(self):
+        return self.entity(Contract)
+
+    def cache_stats(self):
+        """Hits and misses of the record cache
+        :return Dict [hits, misses, hit_rate, invalidations, evictions, size] / None if caching is off
+                """
+        return self.cache.stats() if self.cache is not None else None
+
+    def api_usage(self):
+        """Daily API usage and pacing of the scheduler
+        :return Dict [api_used, api_limit, rate, concurrency, in_flight, throttled, waited, backoffs] / None without a scheduler
+                """
+        return self.scheduler.stats() if self.scheduler is not None else None
+
+    def retry_stats(self):
+        """Retries of transient failures and call latency including the retries
+        :return Dict [calls, attempts, retries, recovered, gave_up, latency_avg, latency_max, backoff_total, reasons]
+                / None without a retry policy
+                """
+        return self.retry.stats() if self.retry is not None else None
+
+    def metrics_snapshot(self):
+        """Latency histograms and byte / record / retry counters per endpoint, see Metrics.HistogramExporter
+        :return Dict of {'request' / 'parse': {endpoint: Dict [count, avg, p50, p95, max, errors, sent, received,
+                records, retries]}} / None without metrics
+                """
+        return self.metrics.snapshot() if self.metrics is not None else None
+
+    def sync_mirror(self, sobjects=Mirror.SOBJECTS):
+        """Bring the local mirror up to date, incrementally after the first sync, see Sync.SyncEngine
+        EXAMPLE: .sync_mirror(['Account', 'Case'])
+                Arguments:
+                * sobjects: sobjects to sync, Mirror.SOBJECTS if None
+                :return Dict of {sobject: Sync.SyncReport} / None without a mirror
+                """
+        if self.mirror is None:
+            return None
+        return Sync.SyncEngine(self, self.mirror, self.mirror).sync_all(sobjects or Mirror.SOBJECTS)
+
+    def mirror_stats(self):
+        """Lookups answered by the local mirror and the age of every mirrored sobject
+        :return Dict [hits, misses, hit_rate, max_staleness, sobjects: {sobject: {records, age}}]
+                / None without a mirror
+                """
+        return self.mirror.stats() if self.mirror is not None else None
+
     def get(self, path, params=None, **kwargs):
         """Allows you to make a direct GET REST call if you know the path
         EXAMPLE: .get(path='sobjects/Account/0017j00000VLkZtAAL', params={"fields" : "Name"}))
@@ -107,21 +235,50 @@ class SalesforceQ:
         try:
             res = self.sf.restful(path=path, params=params, method='GET', **kwargs)
             return res
-        except SalesforceResourceNotFound as e:
-            print(
-                "[GET]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                name=e.resource_name,
-                                                                                errorCode=e.content[0][
-                                                                                    'errorCode']))
-            return False
-        except SalesforceMalformedRequest as e:  # Deletion failed (could be due account being associated to existing cases)
-            print("[GET]{errorCode}: Malformed request {url}. {message}".format(
-                message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode']))
-            return False
         except Exception as e:
-            print("Something went wrong!")
-            print(e)
-        return False
+            return Result.failure('GET', e, None)
+
+    def iter_query(self, soql, batch_size=None, include_deleted=False, compact=False, attributes='keep'):
+        """Stream the records of a SOQL query, following nextRecordsUrl lazily one page at a time
+        EXAMPLE: for contact in .iter_query("SELECT Id, Email FROM Contact", batch_size=2000): ...
+                Arguments:
+                * soql: SOQL query
+                * batch_size: records per page (200-2000), Salesforce default if None
+                * include_deleted: True to include deleted / archived records (queryAll)
+                * compact / attributes: record options, see Parser.parse
+                :return generator of parsed records
+                """
+        return Paging.iter_query(self.sf, soql, batch_size=batch_size, include_deleted=include_deleted,
+                                 compact=compact, attributes=attributes)
+
+    def bulk_export(self, soql, include_deleted=False, page_size=None, poll_interval=2.0, timeout=None,
+                    compact=False, attributes='keep'):
+        """Export a SOQL query through a Bulk API 2.0 query job, for full-table pulls of millions of rows
+        EXAMPLE: for case in .bulk_export("SELECT Id, CaseNumber FROM Case", page_size=100000): ...
+                Arguments:
+                * soql: SOQL query
+                * include_deleted: True to include deleted / archived records (queryAll)
+                * page_size: records per CSV result page, Salesforce default if None
+                * poll_interval: max seconds between job state polls
+                * timeout: seconds to wait for the job to complete, no limit if None
+                * compact / attributes: record options, see Parser.parse
+                :return generator of parsed records
+                """
+        return Bulk.export(self.sf, soql, include_deleted=include_deleted, page_size=page_size,
+                           poll_interval=poll_interval, timeout=timeout, compact=compact, attributes=attributes)
+
+    def query_columns(self, soql, batch_size=None, include_deleted=False, bulk=False):
+        """Run a SOQL query into typed column buffers instead of records, for reporting on large pulls
+        EXAMPLE: .query_columns("SELECT Id, Amount, CloseDate FROM Opportunity").to_numpy_columns()['Amount'].sum()
+                Arguments:
+                * soql: SOQL query of plain / relationship fields, no subqueries or aggregates
+                * batch_size: records per page (200-2000), Salesforce default if None
+                * include_deleted: True to include deleted / archived records (queryAll)
+                * bulk: run the query as a Bulk API 2.0 job
+                :return Columnar.ColumnarResult [to_numpy_columns(), to_arrow(), to_parquet(path)]
+                """
+        return Columnar.query(self.sf, soql, batch_size=batch_size, include_deleted=include_deleted, bulk=bulk,
+                              metadata=self.metadata)
 
     def get_sobject(self, sobject=None, sobject_id=None):
         """Allows you to make a direct GET REST call if you know the path
@@ -132,55 +289,55 @@ class SalesforceQ:
                 * params: dict of parameters to pass to the path
                 * method: HTTP request method, default GET
                 * other arguments supported by requests.request (e.g. json, timeout)
-                :return JSON objects list / False if issue has occurred
+                * sobject_id: ID string / list of IDs, a list is fetched with chunked 'WHERE Id IN' queries
+                :return JSON objects list / False if issue has occurred,
+                        for a list of IDs the IDs that weren't found are listed in the result's .missing
                 """
         try:
             if isinstance(sobject_id, str):
                 sobject_data = self.__getattr__(sobject).get(sobject_id)
                 return [Parser.parse(sobject_data)]
             elif isinstance(sobject_id, list):
-                sobjects_data = []
-                for sobject_sid in sobject_id:
-                    sobject_data = self.__getattr__(sobject).get(sobject_sid)
-                    sobjects_data.append(Parser.parse(sobject_data))
-                return sobjects_data
-        except SalesforceResourceNotFound as e:
-            print(
-                "[GET]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                name=e.resource_name,
-                                                                                errorCode=e.content[0][
-                                                                                    'errorCode']))
-            return False
-        except SalesforceMalformedRequest as e:  # Deletion failed (could be due account being associated to existing cases)
-            print("[GET]{errorCode}: Malformed request {url}. {message}".format(
-                message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode']))
-            return False
+                return Collections.retrieve(self.sf, sobject, sobject_id, executor=self.executor,
+                                            metadata=self.metadata)
+        except Exception as e:
+            return Result.failure('GET', e, None)
+
+    def describe(self, sobject=None):
+        """Cached describe metadata, revalidated with If-Modified-Since, see Metadata.MetadataCache
+        EXAMPLE: .describe('Account')['fields']
+                Arguments:
+                * sobject: sobject name, global describe (every sobject) if None
+                :return describe dict / False if issue has occurred
+                """
+        try:
+            return self.metadata.describe(sobject) if sobject is not None else self.metadata.describe_global()
         except Exception as e:
-            print("Something went wrong!")
-            print(e)
-        return False
+            return Result.failure('GET', e, None)
 
     def get_sobject_type(self, sobject_id):
-        """Get sobject type by ID"""
+        """Get sobject type by ID, resolved locally from the ID key prefix, see KeyPrefix.KeyPrefixIndex"""
         try:
+            sobject = self.key_prefixes.sobject_type(sobject_id)
+            if sobject is not None:
+                return sobject
             res = self.get(path=f'ui-api/record-ui/{sobject_id}')
             od = collections.OrderedDict(sorted(res['layouts'].items(), key=lambda x: x[1]))
             return list(od.keys())[0]
-        except SalesforceResourceNotFound as e:
-            print(
-                "[GET]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                name=e.resource_name,
-                                                                                errorCode=e.content[0][
-                                                                                    'errorCode']))
-            return False
-        except SalesforceMalformedRequest as e:  # Deletion failed (could be due account being associated to existing cases)
-            print("[GET]{errorCode}: Malformed request {url}. {message}".format(
-                message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode']))
-            return False
         except Exception as e:
-            print("Something went wrong!")
-            print(e)
-        return False
+            return Result.failure('GET', e, None)
+
+    def get_sobject_types(self, sobject_ids):
+        """Group many IDs by sobject type from their key prefixes, without a request per ID
+        EXAMPLE: .get_sobject_types(['0017j00000VLkZtAAL', '5007j00000ABCdeAAH'])
+                Arguments:
+                * sobject_ids: list of IDs
+                :return Dict of {sobject: [ids]}, IDs with an unknown key prefix under None / False if issue has occurred
+                """
+        try:
+            return self.key_prefixes.classify(sobject_ids)
+        except Exception as e:
+            return Result.failure('GET', e, None)
 
     def post(self, path, params=None, **kwargs):
         """Allows you to make a direct POST REST call if you know the path
@@ -196,21 +353,8 @@ class SalesforceQ:
         try:
             res = self.sf.restful(path=path, params=params, method='POST', **kwargs)
             return res
-        except SalesforceResourceNotFound as e:
-            print(
-                "[POST]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                 name=e.resource_name,
-                                                                                 errorCode=e.content[0][
-                                                                                     'errorCode']))
-            return False
-        except SalesforceMalformedRequest as e:
-            print("[POST]{errorCode}: Malformed request {url}. {message}".format(
-                message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode']))
-            return False
         except Exception as e:
-            print("Something went wrong!")
-            print(e)
-        return False
+            return Result.failure('POST', e, None)
 
     def patch(self, path, params=None, **kwargs):
         """Allows you to make a direct POST REST call if you know the path
@@ -226,21 +370,8 @@ class SalesforceQ:
         try:
             res = self.sf.restful(path=path, params=params, method='PATCH', **kwargs)
             return res
-        except SalesforceResourceNotFound as e:
-            print(
-                "[PATCH]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                  name=e.resource_name,
-                                                                                  errorCode=e.content[0][
-                                                                                      'errorCode']))
-            return False
-        except SalesforceMalformedRequest as e:
-            print("[PATCH]{errorCode}: Malformed request {url}. {message}".format(
-                message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode']))
-            return False
         except Exception as e:
-            print("Something went wrong!")
-            print(e)
-        return False
+            return Result.failure('PATCH', e, None)
 
     def delete(self, path, params=None, **kwargs):
         """Allows you to make a direct DELETE REST call if you know the path
@@ -256,21 +387,8 @@ class SalesforceQ:
         try:
             res = self.sf.restful(path=path, params=params, method='DELETE', **kwargs)
             return res
-        except SalesforceResourceNotFound as e:
-            print(
-                "[DELETE]{errorCode}: Resource {name} not found. {message}".format(message=e.content[0]['message'],
-                                                                                   name=e.resource_name,
-                                                                                   errorCode=e.content[0][
-                                                                                       'errorCode']))
-            return False
-        except SalesforceMalformedRequest as e:
-            print("[DELETE]{errorCode}: Malformed request {url}. {message}".format(
-                message=e.content[0]['message'], url=e.url, errorCode=e.content[0]['errorCode']))
-            return False
         except Exception as e:
-            print("Something went wrong!")
-            print(e)
-        return False
+            return Result.failure('DELETE', e, None)
 
     def __getattr__(self, name):
         """
@@ -0,0 +1,195 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Scheduler.py
+
+"""
+Request scheduler under every call of a client, installed on its requests session so the SalesforceQ
+wrappers, the entity methods and the fan-out workers all go through it.
+
+- Token bucket: at most rate requests per second with bursts of burst requests, callers wait for a token.
+- Daily API usage: every response carries 'Sforce-Limit-Info: api-usage=used/limit'. Past slow_at of the
+  limit the rate is scaled down towards min_rate, past stop_at calls raise ApiLimitReached so the remaining
+  budget is left to the org's other integrations.
+- Adaptive concurrency (AIMD): requests in flight are capped, the cap halves when Salesforce refuses
+  concurrent requests (503 / 429 / REQUEST_LIMIT_EXCEEDED) and grows back by one per cap successes.
+https://developer.salesforce.com/docs/atlas.en-us.salesforce_app_limits_cheatsheet.meta/salesforce_app_limits_cheatsheet/salesforce_app_limits_platform_api.htm
+"""
+import re
+import threading
+import time
+
+RATE = 20.0  # Requests per second
+MAX_CONCURRENCY = 20  # Below the 25 concurrent long-running requests of a production org
+SLOW_AT = 0.8  # Share of the daily limit used before slowing down
+STOP_AT = 0.95  # Share of the daily limit used before refusing calls
+MIN_RATE = 0.5
+
+_API_USAGE = re.compile(r'(?:^|[\s,;])api-usage=(\d+)/(\d+)')
+
+
+class ApiLimitReached(Exception):
+    """Daily API usage reached the scheduler's stop_at share of the org limit"""
+
+    def __init__(self, used, limit):
+        self.used = used
+        self.limit = limit
+        super().__init__(f"API usage {used}/{limit} reached the scheduler limit, call refused")
+
+
+def parse_api_usage(header):
+    """
+    :param header: Sforce-Limit-Info value, e.g. 'api-usage=25/15000'
+    :return: (used, limit) / None
+    """
+    match = _API_USAGE.search(header or '')
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+class RequestScheduler:
+    def __init__(self, rate=RATE, burst=None, max_concurrency=MAX_CONCURRENCY, min_concurrency=1, slow_at=SLOW_AT,
+                 stop_at=STOP_AT, min_rate=MIN_RATE):
+        """
+        :param rate: requests per second, no token bucket if None
+        :param burst: requests allowed at once after an idle period, rate if None, at least 1
+        :param max_concurrency: requests in flight at most
+        :param min_concurrency: the adaptive cap never goes below it
+        :param slow_at: share of the daily API limit from which the rate is scaled down
+        :param stop_at: share of the daily API limit from which calls raise ApiLimitReached, never if None
+        :param min_rate: requests per second when the usage reaches stop_at
+        """
+        self.rate = rate
+        self.burst = max(1.0, burst or rate or 1)  # Below 1 the bucket never holds a whole token
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.slow_at = slow_at
+        self.stop_at = stop_at
+        self.min_rate = min_rate
+        self.api_used = None
+        self.api_limit = None
+        self.concurrency = max_concurrency
+        self.in_flight = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self.backoffs = 0
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def _usage(self):
+        if self.api_limit:
+            return self.api_used / self.api_limit
+        return 0.0
+
+    def current_rate(self):
+        """Token bucket rate scaled down with the daily API usage, None if there is no rate limit"""
+        usage = self._usage()
+        if usage <= self.slow_at:
+            return self.rate
+        stop_at = self.stop_at if self.stop_at is not None else 1.0
+        share = max(0.0, (stop_at - usage) / (stop_at - self.slow_at)) if stop_at > self.slow_at else 0.0
+        return max(self.min_rate, (self.rate if self.rate is not None else RATE) * share)
+
+    def _take_token(self, now):
+        """:return: seconds to wait for a token, 0 if one was taken"""
+        rate = self.current_rate()
+        if rate is None:
+            return 0
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * rate)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / rate
+
+    def acquire(self):
+        """Wait for a token and a concurrency slot, raises ApiLimitReached past stop_at"""
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                if self.stop_at is not None and self._usage() >= self.stop_at:
+                    raise ApiLimitReached(self.api_used, self.api_limit)
+                if self.in_flight < self.concurrency:
+                    delay = self._take_token(time.monotonic())
+                    if not delay:
+                        break
+                else:
+                    delay = None  # Woken up by release
+                self._cond.wait(delay)
+            self.in_flight += 1
+            waited = time.monotonic() - started
+            if waited > 0.001:
+                self.throttled += 1
+                self.waited += waited
+
+    def release(self, response=None):
+        """Free the slot and learn from the response (usage header, refused requests)"""
+        with self._cond:
+            self.in_flight -= 1
+            if response is not None:
+                self._observe(response)
+            self._cond.notify_all()
+
+    def _observe(self, response):
+        usage = parse_api_usage(response.headers.get('Sforce-Limit-Info'))
+        if usage is not None:
+            self.api_used, self.api_limit = usage
+        refused = response.status_code in (429, 503)
+        if response.status_code == 403:
+            message = _limit_exceeded(response)
+            if message is not None and 'TotalRequests' in message:  # Daily limit exhausted
+                self.api_limit = self.api_limit or 1
+                self.api_used = self.api_limit
+            else:
+                refused = message is not None  # Concurrent request limit
+        if refused:
+            self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+            self._successes = 0
+            self.backoffs += 1
+        elif response.status_code < 400 and self.concurrency < self.max_concurrency:
+            self._successes += 1
+            if self._successes >= self.concurrency:
+                self.concurrency += 1
+                self._successes = 0
+
+    def stats(self):
+        """:return: dict [api_used, api_limit, rate, concurrency, in_flight, throttled, waited, backoffs]"""
+        with self._cond:
+            return {'api_used': self.api_used, 'api_limit': self.api_limit, 'rate': self.current_rate(),
+                    'concurrency': self.concurrency, 'in_flight': self.in_flight, 'throttled': self.throttled,
+                    'waited': self.waited, 'backoffs': self.backoffs}
+
+
+def _limit_exceeded(response):
+    """:return: message of a REQUEST_LIMIT_EXCEEDED error / None"""
+    try:
+        for error in response.json():
+            if error.get('errorCode') == 'REQUEST_LIMIT_EXCEEDED':
+                return error.get('message') or ''
+    except Exception:
+        pass
+    return None
+
+
+def install(session, scheduler):
+    """Route every request of a requests session through the scheduler"""
+    send = session.send
+    local = threading.local()
+
+    def scheduled_send(request, **kwargs):
+        if getattr(local, 'active', False):  # Redirect of a scheduled request, it already holds a slot
+            return send(request, **kwargs)
+        scheduler.acquire()
+        local.active = True
+        response = None
+        try:
+            response = send(request, **kwargs)
+            return response
+        finally:
+            local.active = False
+            scheduler.release(response)
+
+    session.send = scheduled_send
+    session.scheduler = scheduler
+    return session
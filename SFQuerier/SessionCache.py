@@ -0,0 +1,152 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : SessionCache.py
+
+"""
+Session reuse across processes, the session ID and instance of a login are kept in a store (an encrypted local
+file by default) and the next SalesforceQ for the same user starts on them without a SOAP login.
+Sessions can't be checked offline, a cached session that expired is answered with INVALID_SESSION_ID by the
+first request, the client then logs in again, saves the new session and retries the request.
+"""
+import hashlib
+import json
+import os
+import threading
+from functools import partial
+
+from simple_salesforce import Salesforce, SalesforceLogin
+
+from SFQuerier.Result import log
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # Optional, only needed by EncryptedFileStore
+    Fernet = InvalidToken = None
+
+SESSION_DIR = os.path.join(os.path.expanduser('~'), '.sfquerier', 'sessions')
+KEY_ENV = 'SFQUERIER_SESSION_KEY'  # Fernet key, a key file is generated in the store directory if not set
+MAX_AGE = 8 * 3600  # Seconds a saved session is offered, older ones are dropped without a request
+
+
+class SessionStore:
+    """Interface of a session store, entries are dicts [session_id, instance]"""
+
+    def load(self, key):
+        """:return: entry / None"""
+        raise NotImplementedError
+
+    def save(self, key, entry):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class MemoryStore(SessionStore):
+    """Sessions shared by the clients of one process"""
+
+    def __init__(self):
+        self._entries = {}
+
+    def load(self, key):
+        return self._entries.get(key)
+
+    def save(self, key, entry):
+        self._entries[key] = dict(entry)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+
+class EncryptedFileStore(SessionStore):
+    def __init__(self, path=SESSION_DIR, key=None, max_age=MAX_AGE):
+        """
+        :param path: directory of the session files, readable by the current user only
+        :param key: Fernet key, SFQUERIER_SESSION_KEY or a key file generated in path if None
+        :param max_age: seconds a saved session is offered, no limit if None
+        """
+        if Fernet is None:
+            raise ImportError("EncryptedFileStore requires the cryptography package: pip install cryptography")
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._fernet = Fernet(key or os.environ.get(KEY_ENV) or self._key_file())
+
+    def _key_file(self):
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        key_path = os.path.join(self.path, 'session.key')
+        try:
+            fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(key_path, 'rb') as f:
+                return f.read().strip()
+        key = Fernet.generate_key()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key)
+        return key
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.session')
+
+    def load(self, key):
+        try:
+            with open(self._file(key), 'rb') as f:
+                return json.loads(self._fernet.decrypt(f.read(), ttl=self.max_age))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, InvalidToken):  # Expired, or written with another key
+            self.delete(key)
+            return None
+
+    def save(self, key, entry):
+        with self._lock:
+            os.makedirs(self.path, mode=0o700, exist_ok=True)
+            temp = self._file(key) + f'.{os.getpid()}.tmp'
+            fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._fernet.encrypt(json.dumps(entry).encode('utf-8')))
+            os.replace(temp, self._file(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+
+def cache_key(username, domain='login', organizationId=None):
+    """Store key of a login, the username isn't stored in clear"""
+    return hashlib.sha256(f"{domain}|{username}|{organizationId or ''}".encode('utf-8')).hexdigest()
+
+
+def connect(store, username, password, domain='login', session=None, **credentials):
+    """
+    simple-salesforce client on the cached session of a user, logs in and caches the session if there is none.
+    A re-login on INVALID_SESSION_ID replaces the cached session.
+    :param store: SessionStore
+    :param credentials: security_token / organizationId
+    :return: Salesforce
+    """
+    key = cache_key(username, domain, credentials.get('organizationId'))
+    login = partial(SalesforceLogin, username=username, password=password, domain=domain, session=session,
+                    **credentials)
+
+    def relogin():
+        session_id, instance = login()
+        try:
+            store.save(key, {'session_id': session_id, 'instance': instance})
+        except Exception as e:  # The client works without the cache
+            log.warning("[SESSION] Could not cache the session: %s", e)
+        return session_id, instance
+
+    entry = None
+    try:
+        entry = store.load(key)
+    except Exception as e:
+        log.warning("[SESSION] Could not read the session cache: %s", e)
+    if entry is None:
+        entry = dict(zip(('session_id', 'instance'), relogin()))
+    sf = Salesforce(session_id=entry['session_id'], instance=entry['instance'], session=session, domain=domain)
+    sf._salesforce_login_partial = relogin  # INVALID_SESSION_ID logs in again through the cache
+    return sf
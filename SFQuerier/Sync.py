@@ -0,0 +1,270 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @Author  : Adam Mahameed
+# @File    : Sync.py
+
+"""
+Incremental sync of sobjects into a local store, on SystemModstamp watermarks.
+
+- The first run of an sobject pulls the whole table, later runs only query the records modified since the last
+  watermark (SystemModstamp range query, ordered so a run can resume) and fetch the deletions of the same window
+  from getDeleted (sobjects/<type>/deleted).
+- getUpdated only returns IDs, a SystemModstamp range query returns the changed records themselves in one
+  request per page, it is used for the updates.
+- The window starts overlap seconds before the last watermark: records of transactions committed late and
+  clock skew between this host and Salesforce are picked up again, applying a record twice is harmless.
+- Watermarks are whole seconds (SOQL datetime literals), a change made in the second a run starts is picked up
+  by the next run. getDeleted covers whole minutes, the deleted watermark is its latestDateCovered.
+- Progress is checkpointed after every page, a run interrupted by a crash resumes from its last checkpoint.
+- getDeleted only covers the last DELETED_WINDOW days, an sobject not synced for longer is pulled in full again.
+https://developer.salesforce.com/docs/atlas.en-us.api_rest.meta/api_rest/resources_getdeleted.htm
+"""
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from SFQuerier import Collections, Paging
+from SFQuerier.Result import log
+
+SYNC_DIR = os.path.join(os.path.expanduser('~'), '.sfquerier', 'sync')
+OVERLAP = 300  # Seconds re-read before the last watermark
+DELETED_WINDOW = 29  # Days of deletions getDeleted returns (30, minus a margin)
+MIN_DELETED_RANGE = 60  # Seconds, getDeleted works at minute granularity
+FULL = 'full'
+INCREMENTAL = 'incremental'
+
+FIELDS = {  # Fields synced by default, the ones the entity classes select
+    'Account': ('Id', 'AccountNumber', 'Name', 'CreatedDate', 'Website'),
+    'Contact': ('Id', 'FirstName', 'LastName', 'Email', 'Phone', 'AccountId'),
+    'Case': ('Id', 'AccountId', 'CaseNumber', 'ContactId', 'Description', 'ParentId', 'Status', 'Type', 'Subject'),
+    'Opportunity': ('Id', 'AccountId', 'Name', 'Amount', 'IsClosed', 'IsWon', 'Type'),
+}
+
+_SAFE_NAME = re.compile(r'[^\w.-]')
+
+
+def to_soql(moment):
+    """SOQL datetime literal of an aware datetime, e.g. 2021-04-05T10:00:00Z"""
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def from_salesforce(value):
+    """Aware datetime of a Salesforce datetime string, e.g. '2021-04-05T10:00:00.000+0000'"""
+    return datetime.strptime(value.replace('Z', '+0000'), '%Y-%m-%dT%H:%M:%S.%f%z' if '.' in value
+                             else '%Y-%m-%dT%H:%M:%S%z')
+
+
+def _iso(moment):
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0000'
+
+
+class StateStore:
+    """Interface of a watermark store, one state dict per sobject"""
+
+    def load(self, sobject):
+        """:return: state / None"""
+        raise NotImplementedError
+
+    def save(self, sobject, state):
+        raise NotImplementedError
+
+
+class MemoryStateStore(StateStore):
+    def __init__(self):
+        self._states = {}
+
+    def load(self, sobject):
+        state = self._states.get(sobject)
+        return json.loads(json.dumps(state)) if state is not None else None
+
+    def save(self, sobject, state):
+        self._states[sobject] = json.loads(json.dumps(state))
+
+
+class FileStateStore(StateStore):
+    """One JSON file per sobject, replaced atomically, a crash leaves the previous checkpoint"""
+
+    def __init__(self, path=SYNC_DIR):
+        """:param path: state directory, use one per org"""
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _file(self, sobject):
+        return os.path.join(self.path, _SAFE_NAME.sub('_', sobject) + '.json')
+
+    def load(self, sobject):
+        try:
+            with open(self._file(sobject), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, sobject, state):
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            temp = self._file(sobject) + f'.{os.getpid()}.tmp'
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, self._file(sobject))
+
+
+class RecordStore:
+    """Interface of the local store changes are applied to, records are field dicts with an 'Id'"""
+
+    def upsert(self, sobject, records):
+        raise NotImplementedError
+
+    def delete(self, sobject, ids):
+        raise NotImplementedError
+
+    def clear(self, sobject):
+        """Drop every record of an sobject, before a full pull"""
+        raise NotImplementedError
+
+
+class MemoryRecordStore(RecordStore):
+    """Records kept in dicts of {15 character ID: record} per sobject"""
+
+    def __init__(self):
+        self.records = {}
+
+    def upsert(self, sobject, records):
+        table = self.records.setdefault(sobject, {})
+        for record in records:
+            table[record['Id'][:15]] = record
+
+    def delete(self, sobject, ids):
+        table = self.records.get(sobject, {})
+        for record_id in ids:
+            table.pop(record_id[:15], None)
+
+    def clear(self, sobject):
+        self.records.pop(sobject, None)
+
+
+class SyncReport:
+    """Outcome of the sync of one sobject"""
+
+    def __init__(self, sobject, mode, resumed=False):
+        self.sobject = sobject
+        self.mode = mode
+        self.resumed = resumed
+        self.upserted = 0
+        self.deleted = 0
+        self.pages = 0
+        self.watermark = None
+        self.seconds = None
+
+    def __str__(self):
+        return "[SYNC] {sobject} {mode}{resumed}: {upserted} upserted, {deleted} deleted, watermark {mark}".format(
+            sobject=self.sobject, mode=self.mode, resumed=' (resumed)' if self.resumed else '',
+            upserted=self.upserted, deleted=self.deleted, mark=self.watermark)
+
+    def _asdict(self):
+        return {'sobject': self.sobject, 'mode': self.mode, 'resumed': self.resumed, 'upserted': self.upserted,
+                'deleted': self.deleted, 'pages': self.pages, 'watermark': self.watermark, 'seconds': self.seconds}
+
+
+class SyncEngine:
+    def __init__(self, sq, store, state=None, fields=None, overlap=OVERLAP, batch_size=None):
+        """
+        :param sq: SalesforceQ
+        :param store: RecordStore the changes are applied to
+        :param state: StateStore of the watermarks, FileStateStore(SYNC_DIR/<instance>) if None
+        :param fields: dict of {sobject: field names}, FIELDS then every queryable field for other sobjects
+        :param overlap: seconds re-read before the last watermark
+        :param batch_size: records per query page (200-2000), Salesforce default if None
+        """
+        self._sq = sq
+        self.store = store
+        self.state = state if state is not None else FileStateStore(
+            os.path.join(SYNC_DIR, _SAFE_NAME.sub('_', sq.sf.sf_instance)))
+        self.fields = dict(FIELDS, **(fields or {}))
+        self.overlap = timedelta(seconds=overlap)
+        self.batch_size = batch_size
+
+    def _fields(self, sobject):
+        fields = self.fields.get(sobject)
+        if fields is None:
+            fields = Collections.queryable_fields(self._sq.sf, sobject, getattr(self._sq, 'metadata', None))
+        return [field for field in fields if field != 'SystemModstamp'] + ['SystemModstamp']
+
+    def _start(self, sobject, state, now):
+        """New run of an sobject, full if it was never synced or its deletions are out of the getDeleted window"""
+        if state.get('updated') is None or \
+                from_salesforce(state['deleted']) - self.overlap < now - timedelta(days=DELETED_WINDOW):
+            self.store.clear(sobject)
+            return {'mode': FULL, 'since': None, 'until': _iso(now), 'checkpoint': None}
+        return {'mode': INCREMENTAL, 'since': _iso(from_salesforce(state['updated']) - self.overlap),
+                'until': _iso(now), 'checkpoint': None}
+
+    def _pull(self, sobject, state, run, report):
+        """Apply the records modified in the run's window, checkpointing after every page"""
+        conditions = [f"SystemModstamp <= {to_soql(from_salesforce(run['until']))}"]
+        if run['since'] is not None:
+            conditions.append(f"SystemModstamp > {to_soql(from_salesforce(run['since']))}")
+        if run['checkpoint'] is not None:  # Resumed, records of the checkpoint second are applied again
+            conditions.append(f"SystemModstamp >= {to_soql(from_salesforce(run['checkpoint']))}")
+        soql = "SELECT {0} FROM {1} WHERE {2} ORDER BY SystemModstamp,Id".format(
+            ','.join(self._fields(sobject)), sobject, ' AND '.join(conditions))
+        for page in Paging.iter_pages(self._sq.sf, soql, batch_size=self.batch_size, compact=True,
+                                      attributes='drop'):
+            if not page:
+                continue
+            self.store.upsert(sobject, [record._asdict() for record in page])
+            run['checkpoint'] = page[-1].SystemModstamp
+            self.state.save(sobject, state)
+            report.upserted += len(page)
+            report.pages += 1
+
+    def _deletions(self, sobject, state, run, report):
+        """Apply the deletions since the last deleted watermark. :return: new deleted watermark"""
+        start = from_salesforce(state['deleted']) - self.overlap
+        end = from_salesforce(run['until'])
+        if (end - start).total_seconds() < MIN_DELETED_RANGE:
+            return state['deleted']  # Too short for getDeleted, left to the next run
+        result = getattr(self._sq.sf, sobject).deleted(start, end)
+        ids = [record['id'] for record in result.get('deletedRecords') or []]
+        if ids:
+            self.store.delete(sobject, ids)
+            report.deleted += len(ids)
+        covered = result.get('latestDateCovered')
+        return _iso(min(from_salesforce(covered), end)) if covered else state['deleted']
+
+    def sync(self, sobject):
+        """
+        Sync one sobject, resuming its interrupted run if there is one
+        :return: SyncReport
+        """
+        started = time.perf_counter()
+        state = self.state.load(sobject) or {}
+        run = state.get('run')
+        resumed = run is not None
+        if run is None:
+            run = state['run'] = self._start(sobject, state, datetime.now(timezone.utc).replace(microsecond=0))
+            self.state.save(sobject, state)
+        report = SyncReport(sobject, run['mode'], resumed)
+        self._pull(sobject, state, run, report)
+        deleted = run['until'] if run['mode'] == FULL else self._deletions(sobject, state, run, report)
+        state = {'updated': run['until'], 'deleted': deleted, 'synced_at': _iso(datetime.now(timezone.utc))}
+        self.state.save(sobject, state)
+        report.watermark = run['until']
+        report.seconds = time.perf_counter() - started
+        log.info("%s", report)
+        return report
+
+    def sync_all(self, sobjects=('Account', 'Contact', 'Case')):
+        """
+        Sync sobjects one after the other
+        :return: dict of {sobject: SyncReport}
+        """
+        return {sobject: self.sync(sobject) for sobject in sobjects}
+
+    def reset(self, sobject):
+        """Forget the watermark of an sobject, its next sync pulls it in full"""
+        self.state.save(sobject, {})
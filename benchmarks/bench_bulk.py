@@ -0,0 +1,111 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_bulk.py
+
+"""
+Bulk API 2.0 export against the local stand-in: replays a recorded Account export job to check
+the records, then compares synthetic full-table pulls over REST query paging and Bulk 2.0 result pages
+Usage: python benchmarks/bench_bulk.py [rows] [bulk_page_size]
+"""
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from SFQuerier import Bulk, Paging
+from SFQuerier.Account import Account
+from mock_salesforce import MockSalesforce, load_recording, replay_bulk_query
+from synthetic import ACCOUNT_FIELDS, make_query_result, make_record
+
+REST_PAGE_SIZE = 2000
+
+
+def check_recorded_export():
+    recording = load_recording('bulk2_account_export.json')
+    with MockSalesforce() as server:
+        replay_bulk_query(server, recording)
+        accounts = list(Account(server.client()).export(poll_interval=0.01))
+    assert [account.Id for account in accounts] == ['0015g00000AbCd{0}AAB'.format(n) for n in range(1, 6)]
+    assert accounts[2].Name == 'Pyramid Construction, Inc.' and accounts[2].Website is None
+    assert accounts[4].Name == 'Grand Hotels & Resorts "GHR"\nHead Office'
+    assert accounts[0].attributes.type == 'Account'
+    assert accounts[0].attributes.url.endswith('/sobjects/Account/0015g00000AbCd1AAB')
+    print(f"Recorded Bulk 2.0 export replayed: {len(accounts)} accounts over {len(recording['results'])} pages")
+
+
+def check_timeout_abort():
+    recording = dict(load_recording('bulk2_account_export.json'))
+    job_id = recording['create']['id']
+    recording['status'] = [dict(recording['create'], state='InProgress')]
+    aborted = []
+    with MockSalesforce() as server:
+        replay_bulk_query(server, recording)
+        server.route('PATCH', r'/services/data/v[\d.]+/jobs/query/' + job_id + '/?',
+                     lambda request: (aborted.append(json.loads(request.body)),
+                                      (200, {}, dict(recording['create'], state='Aborted')))[1])
+        try:
+            list(Account(server.client()).export(poll_interval=0.01, timeout=0.05))
+        except TimeoutError:
+            pass
+        else:
+            raise AssertionError("export didn't time out")
+    assert aborted == [{'state': 'Aborted'}], aborted
+    print(f"Timed out Bulk 2.0 job {job_id} aborted")
+
+
+def synthetic_routes(server, rows, bulk_page_size):
+    def query_page(start):
+        count = min(REST_PAGE_SIZE, rows - start)
+        page = make_query_result('Account', count, start=start, done=start + count >= rows)
+        page['totalSize'] = rows
+        if not page['done']:
+            page['nextRecordsUrl'] = f'/services/data/v52.0/query/01gMOCK-{start + count}'
+        return 200, {}, page
+
+    def bulk_page(request):
+        start = int(request.query.get('locator') or 0)
+        count = min(int(request.query.get('maxRecords') or rows), rows - start)
+        out = io.StringIO()
+        writer = csv.writer(out, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        writer.writerow(ACCOUNT_FIELDS)
+        for n in range(start, start + count):
+            record = make_record('Account', n)
+            writer.writerow([record[field] for field in ACCOUNT_FIELDS])
+        locator = str(start + count) if start + count < rows else 'null'
+        return 200, {'Content-Type': 'text/csv', 'Sforce-Locator': locator}, out.getvalue()
+
+    base = r'/services/data/v[\d.]+'
+    server.route('GET', base + r'/query/?', lambda request: query_page(0))
+    server.route('GET', base + r'/query/01gMOCK-(\d+)', lambda request: query_page(int(request.match.group(1))))
+    server.route('POST', base + r'/jobs/query/?', lambda request: (200, {}, {'id': '750MOCK', 'state': 'UploadComplete'}))
+    server.route('GET', base + r'/jobs/query/750MOCK/?', lambda request: (200, {}, {'id': '750MOCK', 'state': 'JobComplete'}))
+    server.route('GET', base + r'/jobs/query/750MOCK/results/?', bulk_page)
+
+
+def main(rows=100000, bulk_page_size=50000):
+    check_recorded_export()
+    check_timeout_abort()
+    soql = "SELECT Id,AccountNumber,Name,CreatedDate,Website FROM Account"
+    with MockSalesforce() as server:
+        synthetic_routes(server, rows, bulk_page_size)
+        sf = server.client()
+        print(f"Full Account pull of {rows} rows")
+        print("{0:<26}{1:>12}{2:>12}{3:>14}".format('path', 'requests', 'seconds', 'rows/sec'))
+        for name, pull in [(f'REST query ({REST_PAGE_SIZE}/page)', lambda: Paging.iter_query(sf, soql)),
+                           (f'Bulk 2.0 ({bulk_page_size}/page)',
+                            lambda: Bulk.export(sf, soql, page_size=bulk_page_size, poll_interval=0.01))]:
+            server.requests.clear()
+            started = time.perf_counter()
+            count = sum(1 for _ in pull())
+            seconds = time.perf_counter() - started
+            assert count == rows
+            print("{0:<26}{1:>12}{2:>12.3f}{3:>14.0f}".format(name, len(server.requests), seconds, rows / seconds))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,77 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_cache.py
+
+"""
+Record cache against the fake org: checks a Case.get_by_number doesn't answer a later get_by_id of the same
+case with its narrower record and that updates invalidate both, that hits and misses counted from many threads
+add up, then times repeated lookups with and without the cache.
+Usage: python benchmarks/bench_cache.py [cases] [rounds]
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from SFQuerier import Cache
+from SFQuerier.Executor import FanOutExecutor
+from SFQuerier.SFQuerier import SalesforceQ
+from fake_org import FakeOrg
+from mock_salesforce import plain_http_session
+
+
+def client(org, cache):
+    return SalesforceQ(instance=org.instance, username='bench', password='bench', security_token='token',
+                       session=plain_http_session(hosts={'login.salesforce.com': org.instance}), metadata_path=None,
+                       cache=cache)
+
+
+def check_lookup_keys(org):
+    sq = client(org, True)
+    case_id = org.insert('Case', {'Subject': 'Printer on fire', 'Type': 'Problem'})
+    number = org.records['Case'][case_id[:15]]['CaseNumber']
+    by_number = sq.Case.get_by_number(number)
+    assert by_number.Id == case_id and not hasattr(by_number, 'Subject')
+    by_id = sq.Case.get_by_id(case_id)
+    assert by_id.Subject == 'Printer on fire' and by_id.Type == 'Problem', "get_by_id got the get_by_number record"
+    assert sq.Case.get_by_number(number) is by_number and sq.Case.get_by_id(case_id) is by_id
+    assert sq.Case.update(case_id, {'Status': 'Closed'})
+    assert sq.Case.get_by_number(number).Status == 'Closed' and sq.Case.get_by_id(case_id).Status == 'Closed'
+    print("Case.get_by_number then get_by_id: full record by ID, both invalidated by update")
+
+
+def check_concurrent_counts(workers=16, lookups=20000):
+    cache = Cache.RecordCache(maxsize=100)
+    executor = FanOutExecutor(workers)
+    executor.map(lambda n: Cache.read_through(cache, 'Account', f'001{n % 50:012d}',
+                                              lambda: SimpleNamespace(Id=f'001{n % 50:012d}')), range(lookups))
+    executor.shutdown()
+    stats = cache.stats()
+    assert stats['hits'] + stats['misses'] == lookups, stats
+    print(f"{lookups} lookups on {workers} threads: {stats['hits']} hits + {stats['misses']} misses counted")
+
+
+def main(cases=200, rounds=5):
+    check_concurrent_counts()
+    with FakeOrg() as org:
+        check_lookup_keys(org)
+        ids = [org.insert('Case', {}) for _ in range(cases)]
+        numbers = [org.records['Case'][case_id[:15]]['CaseNumber'] for case_id in ids]
+        print("{0:<16}{1:>12}{2:>12}{3:>10}".format('lookups', 'uncached ms', 'cached ms', 'hit rate'))
+        for label, lookup, values in [('get_by_id', 'get_by_id', ids), ('get_by_number', 'get_by_number', numbers)]:
+            timings = []
+            for cache in (None, True):
+                sq = client(org, cache)
+                started = time.perf_counter()
+                for _ in range(rounds):
+                    for value in values:
+                        getattr(sq.Case, lookup)(value)
+                timings.append((time.perf_counter() - started) * 1e3)
+            print("{0:<16}{1:>12.1f}{2:>12.1f}{3:>10.2f}".format(label, *timings, sq.cache_stats()['hit_rate']))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
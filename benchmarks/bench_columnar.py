@@ -0,0 +1,62 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_columnar.py
+
+"""
+Columnar results against the fake org: checks a lowercase SELECT list fills the same columns as the API casing
+(SOQL field names are case-insensitive, the records come back in API casing), then times appending pages of
+plain and relationship fields to the column buffers.
+Usage: python benchmarks/bench_columnar.py [rows]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from SFQuerier.Columnar import ColumnarResult
+from SFQuerier.SFQuerier import SalesforceQ
+from fake_org import FakeOrg
+from mock_salesforce import plain_http_session
+
+PAGE_SIZE = 2000
+
+
+def check_select_casing(org):
+    sq = SalesforceQ(instance=org.instance, username='bench', password='bench', security_token='token',
+                     session=plain_http_session(hosts={'login.salesforce.com': org.instance}), metadata_path=None)
+    org.seed('Opportunity', 50)
+    upper = sq.Opportunity.get_columns("Id,Amount,IsWon,CloseDate").to_numpy_columns()
+    lower = sq.Opportunity.get_columns("id,amount,iswon,closedate").to_numpy_columns()
+    assert list(lower) == ['id', 'amount', 'iswon', 'closedate']
+    assert lower['id'].tolist() == upper['Id'].tolist() and None not in lower['id'].tolist()
+    assert lower['amount'].tolist() == upper['Amount'].tolist() and lower['amount'].sum() > 0
+    assert lower['iswon'].tolist() == upper['IsWon'].tolist()
+    assert lower['closedate'].tolist() == upper['CloseDate'].tolist()
+    result = ColumnarResult(['id', 'account.name'])
+    result.append_page([{'Id': '006x', 'Account': None}])
+    result.append_page([{'Id': '006y', 'Account': {'Name': 'Acme'}}])
+    assert result.to_numpy_columns()['account.name'].tolist() == [None, 'Acme']
+    print("Lowercase SELECT: same columns as the API casing, relationship paths matched on a later page")
+
+
+def main(rows=200000):
+    with FakeOrg() as org:
+        check_select_casing(org)
+    records = [{'attributes': {'type': 'Opportunity'}, 'Id': f'006{n:012d}', 'Amount': n * 1.5, 'IsWon': n % 2 == 0,
+                'Account': {'attributes': {'type': 'Account'}, 'Name': f'Account {n % 100}'}} for n in range(rows)]
+    print("{0:<28}{1:>14}".format('SELECT', 'usec/record'))
+    for fields in (['Id', 'Amount', 'IsWon'], ['id', 'amount', 'iswon'], ['Id', 'Account.Name'],
+                   ['id', 'account.name']):
+        result = ColumnarResult(fields, {'Amount': 'currency', 'amount': 'currency', 'IsWon': 'boolean',
+                                         'iswon': 'boolean'})
+        started = time.perf_counter()
+        for start in range(0, rows, PAGE_SIZE):
+            result.append_page(records[start:start + PAGE_SIZE])
+        assert len(result) == rows
+        print("{0:<28}{1:>14.3f}".format(','.join(fields), (time.perf_counter() - started) / rows * 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
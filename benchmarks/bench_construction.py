@@ -0,0 +1,80 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_construction.py
+
+"""
+Entity construction cost per SalesforceQ client: the eager graph SalesforceQ.__init__ used to build
+(every entity building its own nested entities, 21 wrappers) against the shared lazy accessors, with
+nothing accessed and with every accessor touched. The client itself logs in through the stand-in.
+Usage: python benchmarks/bench_construction.py [clients]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from SFQuerier.Account import Account
+from SFQuerier.Case import Case
+from SFQuerier.CaseComment import CaseComment
+from SFQuerier.Contact import Contact
+from SFQuerier.Contract import Contract
+from SFQuerier.Opportunity import Opportunity
+from SFQuerier.SFQuerier import SalesforceQ
+from mock_salesforce import MockSalesforce
+
+# Wrappers the eager __init__ built: Account (Contact > Case > CaseComment, Case > CaseComment, Opportunity),
+# Contact (Case > CaseComment), Case (CaseComment), Opportunity, Contract (a whole Account graph)
+ACCOUNT_GRAPH = [Account, Contact, Case, CaseComment, Case, CaseComment, Opportunity]
+EAGER_GRAPH = ACCOUNT_GRAPH + [Contact, Case, CaseComment] + [Case, CaseComment] + [Opportunity] + \
+              [Contract] + ACCOUNT_GRAPH
+
+
+def eager(sq):
+    return [cls(sq.sf, sq) for cls in EAGER_GRAPH]
+
+
+def lazy(sq):
+    sq._entities.clear()
+    return []
+
+
+def lazy_touched(sq):
+    sq._entities.clear()
+    sq.Contract.Account.Contact.Case.CaseComment, sq.Account.Opportunity
+    return list(sq._entities.values())
+
+
+def measure(build, sq, clients):
+    started = time.perf_counter()
+    for _ in range(clients):
+        build(sq)
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    kept = [(build(sq), list(sq._entities.values())) for _ in range(clients)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    wrappers = len(kept[0][0]) or len(kept[0][1])
+    return wrappers, seconds / clients * 1e6, size / clients
+
+
+def main(clients=2000):
+    with MockSalesforce() as server:
+        server.route_soap_login()
+        started = time.perf_counter()
+        sq = SalesforceQ(instance=server.instance, username='bench', password='bench', security_token='token',
+                         session=server.login_session(), metadata_path=None)
+        login = time.perf_counter() - started
+    assert sq.Contract.Account is sq.Account and sq.Account.Case is sq.Contact.Case is sq.Case
+    print(f"SalesforceQ login through the stand-in: {login * 1e3:.1f} ms, entity graphs built {clients} times")
+    print("{0:<30}{1:>10}{2:>14}{3:>16}".format('entities', 'wrappers', 'usec/client', 'bytes/client'))
+    for name, build in [('eager (previous __init__)', eager), ('lazy, nothing accessed', lazy),
+                        ('lazy, every accessor touched', lazy_touched)]:
+        wrappers, usec, size = measure(build, sq, clients)
+        print("{0:<30}{1:>10}{2:>14.2f}{3:>16.0f}".format(name, wrappers, usec, size))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
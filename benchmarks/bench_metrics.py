@@ -0,0 +1,56 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_metrics.py
+
+"""
+Cost of the metrics hooks against the local stand-in: the same queries are sent through a session without
+metrics, with a disabled Metrics object and with an enabled one (HistogramExporter), then parsed.
+Usage: python benchmarks/bench_metrics.py [calls] [records]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from SFQuerier import Metrics, Parser
+from mock_salesforce import MockSalesforce, plain_http_session
+from synthetic import make_query_result
+
+
+def run(server, records, calls, metrics=None):
+    session = plain_http_session()
+    if metrics is not None:
+        Metrics.install(session, metrics)
+    sf = server.client(session=session)
+    sf.query("SELECT Id FROM Account")  # Warm the connection up
+    network = parse = 0.0
+    for _ in range(calls):
+        started = time.perf_counter()
+        result = sf.query("SELECT Id,Name FROM Account")
+        parsed = time.perf_counter()
+        assert len(Parser.parse(result)) == records
+        network += parsed - started
+        parse += time.perf_counter() - parsed
+    return network / calls * 1e6, parse / calls * 1e6
+
+
+def main(calls=100, records=200):
+    payload = make_query_result('Account', records)
+    with MockSalesforce() as server:
+        server.route('GET', r'/services/data/v[\d.]+/query/?', lambda request: (200, {}, payload))
+        metrics = Metrics.Metrics()
+        print(f"{calls} queries of {records} records through the stand-in")
+        print("{0:<22}{1:>16}{2:>16}".format('metrics', 'usec/request', 'usec/parse'))
+        for name, hook in [('none', None), ('disabled', Metrics.Metrics(enabled=False)), ('enabled', metrics)]:
+            network, parse = run(server, records, calls, hook)
+            print("{0:<22}{1:>16.1f}{2:>16.1f}".format(name, network, parse))
+    request = metrics.snapshot()['request']['query']
+    print(f"recorded: {request['count']} queries, p50 <= {request['p50'] * 1e3:g} ms, "
+          f"{request['received'] / request['count']:.0f} bytes each, "
+          f"{metrics.snapshot()['parse']['query']['records']} records parsed")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,66 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_parser.py
+
+"""
+Micro-benchmark for Parser.parse, compares the single-pass materializer against the old dumps/loads path
+and the retained memory per row of SimpleNamespace vs compact __slots__ records
+Usage: python benchmarks/bench_parser.py [rows] [repeat]
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from SFQuerier import Parser
+from synthetic import make_query_result
+
+
+def peak_memory(func, *args, **kwargs):
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def retained_memory(func, *args, **kwargs):
+    tracemalloc.start()
+    records = func(*args, **kwargs)
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return current
+
+
+def main(rows=50000, repeat=5):
+    result = make_query_result('Account', rows)
+    engines = ['json', 'walk']
+
+    assert repr(Parser.parse(result, engine='json')) == repr(Parser.parse(result, engine='walk'))
+
+    print(f"Parser.parse over {rows} Account rows, best of {repeat}")
+    print("{0:<8}{1:>12}{2:>14}{3:>16}".format('engine', 'seconds', 'rows/sec', 'peak MiB'))
+    for engine in engines:
+        seconds = min(timeit.repeat(lambda: Parser.parse(result, engine=engine), number=1, repeat=repeat))
+        peak = peak_memory(Parser.parse, result, engine=engine) / (1024 * 1024)
+        print("{0:<8}{1:>12.3f}{2:>14.0f}{3:>16.1f}".format(engine, seconds, rows / seconds, peak))
+
+    print()
+    print(f"Retained memory per row over {rows} Account rows")
+    print("{0:<26}{1:>12}{2:>14}".format('records', 'seconds', 'bytes/row'))
+    variants = [('SimpleNamespace', {}),
+                ('compact, attributes=keep', {'compact': True, 'attributes': 'keep'}),
+                ('compact, attributes=intern', {'compact': True, 'attributes': 'intern'}),
+                ('compact, attributes=drop', {'compact': True, 'attributes': 'drop'})]
+    for name, options in variants:
+        seconds = min(timeit.repeat(lambda: Parser.parse(result, **options), number=1, repeat=repeat))
+        retained = retained_memory(Parser.parse, result, **options)
+        print("{0:<26}{1:>12.3f}{2:>14.0f}".format(name, seconds, retained / rows))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
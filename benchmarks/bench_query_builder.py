@@ -0,0 +1,68 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_query_builder.py
+
+"""
+SOQL construction cost: the unescaped string formatting the entity lookups used against binding a statement
+built at import, and against building and compiling the query on every call (the statement cache disabled).
+Then splits an IN list of IDs into queries under the URL limit and checks hostile values stay inside
+their literal.
+Usage: python benchmarks/bench_query_builder.py [lookups] [ids]
+"""
+import os
+import sys
+import time
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SFQuerier import QueryBuilder
+from SFQuerier.Account import Account
+
+FIELDS = "Id,AccountNumber,Name,CreatedDate,Website"
+
+
+def formatted(name):
+    return "SELECT {fields} FROM Account WHERE Name='{name}'".format(fields=FIELDS, name=name)
+
+
+def bound(name):
+    return Account.BY_NAME.bind(name=name)
+
+
+def built(name):
+    return QueryBuilder.Statement(QueryBuilder.select('Account', FIELDS).where("Name = :name").soql).bind(name=name)
+
+
+def check_escaping():
+    for name, soql in [("O'Reilly", "SELECT Id FROM Account WHERE Name = 'O\\'Reilly'"),
+                       ("x' OR Name != '", "SELECT Id FROM Account WHERE Name = 'x\\' OR Name != \\''"),
+                       ('a\\b\n"c"', "SELECT Id FROM Account WHERE Name = 'a\\\\b\\n\\\"c\\\"'")]:
+        assert QueryBuilder.select('Account').where("Name = :name").bind(name=name) == soql, name
+    print("Hostile names bound inside their literal: O'Reilly, x' OR Name != ', backslash / newline / quotes")
+
+
+def main(lookups=100000, ids=10000):
+    check_escaping()
+    names = [f"Account {n}" for n in range(1000)]
+    assert bound(names[1]) == built(names[1]) != formatted(names[1])
+    print("{0:<36}{1:>14}".format('SOQL per lookup', 'usec/query'))
+    for label, build in [('str.format, unescaped (previous)', formatted), ('bind of a class statement', bound),
+                         ('build + compile per call', built)]:
+        started = time.perf_counter()
+        for n in range(lookups):
+            build(names[n % 1000])
+        print("{0:<36}{1:>14.2f}".format(label, (time.perf_counter() - started) / lookups * 1e6))
+    values = ['001%012dAAA' % n for n in range(ids)]
+    started = time.perf_counter()
+    queries = list(QueryBuilder.select('Account', FIELDS).in_('Id', 'ids').bind_chunks('ids', values))
+    seconds = time.perf_counter() - started
+    longest = max(len(quote(soql)) for soql in queries)
+    assert longest <= QueryBuilder.MAX_QUERY_URL_LENGTH
+    assert sum(soql.count("'") // 2 for soql in queries) == ids
+    print(f"{ids} IDs bound to IN: {len(queries)} queries, longest {longest} encoded characters "
+          f"(limit {QueryBuilder.MAX_QUERY_URL_LENGTH}), {seconds * 1e3:.1f} ms")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
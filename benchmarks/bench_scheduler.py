@@ -0,0 +1,121 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : bench_scheduler.py
+
+"""
+Request scheduler against the local stand-in. The stand-in emits Sforce-Limit-Info with a daily usage counter
+and refuses requests beyond a concurrency cap with 503 like an org at its concurrent request limit.
+A backfill fans out requests on more workers than the cap allows: the scheduler shrinks its concurrency to the
+cap, slows down past 80% of the daily limit and refuses calls at 95%, check_backfill asserts all three.
+check_slow_rate checks a rate below one request per second still lets calls through, one every 1/rate seconds.
+Usage: python benchmarks/bench_scheduler.py [daily_limit] [used_at_start] [server_concurrency]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from SFQuerier.Executor import FanOutExecutor
+from SFQuerier.Scheduler import ApiLimitReached, RequestScheduler, install
+from mock_salesforce import MockSalesforce, plain_http_session
+
+WORKERS = 16
+LATENCY = 0.02  # Seconds per request on the stand-in
+
+
+def limited_routes(server, daily_limit, used, concurrency):
+    state = {'used': used, 'in_flight': 0, 'refused': 0}
+    lock = threading.Lock()
+
+    def limits(request):
+        with lock:
+            if state['in_flight'] >= concurrency:
+                state['refused'] += 1
+                return 503, {}, [{'errorCode': 'SERVER_UNAVAILABLE', 'message': 'Too many concurrent requests'}]
+            state['in_flight'] += 1
+            state['used'] += 1
+            usage = f"api-usage={state['used']}/{daily_limit}"
+        time.sleep(LATENCY)
+        with lock:
+            state['in_flight'] -= 1
+        return 200, {'Sforce-Limit-Info': usage}, {'DailyApiRequests': {'Max': daily_limit}}
+
+    server.route('GET', r'/services/data/v[\d.]+/limits/?', limits)
+    return state
+
+
+def backfill(sf, scheduler, requests_count):
+    timeline = []
+
+    def call(n):
+        sf.restful('limits')
+        if n % 25 == 0:
+            timeline.append((n, scheduler.stats()))
+
+    started = time.perf_counter()
+    results = FanOutExecutor(WORKERS).map(call, range(requests_count))
+    return results, timeline, time.perf_counter() - started
+
+
+def check_slow_rate(rate=4 / 3):
+    for slow in (0.5, rate):
+        scheduler = RequestScheduler(rate=slow)
+        started = time.monotonic()
+        scheduler.acquire()
+        scheduler.release()
+        assert time.monotonic() - started < 0.1, f"rate={slow}: the first call waited"
+    scheduler = RequestScheduler(rate=rate, burst=0.5)
+    started = time.monotonic()
+    for _ in range(3):
+        scheduler.acquire()
+        scheduler.release()
+    seconds = time.monotonic() - started
+    assert 2 / rate * 0.9 <= seconds < 2 / rate + 0.5, f"3 calls at {rate:.2f}/s took {seconds:.2f}s"
+    print(f"rate=0.5 and rate={rate:.2f} with burst=0.5: first call immediate, 3 calls in {seconds:.2f}s")
+
+
+def check_backfill(scheduler, state, timeline, results, daily_limit, requests_count):
+    """:return: calls refused by the scheduler"""
+    for n, stats in timeline:
+        usage = stats['api_used'] / stats['api_limit']
+        if usage > scheduler.slow_at:
+            assert stats['rate'] < scheduler.rate, f"call {n}: full rate at {usage:.0%} of the daily limit"
+        else:
+            assert stats['rate'] == scheduler.rate, f"call {n}: slowed down at {usage:.0%} of the daily limit"
+    assert any(stats['rate'] < scheduler.rate for n, stats in timeline), "never slowed down past slow_at"
+    refused = [e for (_, _, e) in results.errors if isinstance(e, ApiLimitReached)]
+    assert refused, "no call refused at stop_at"
+    assert all(e.used / e.limit >= scheduler.stop_at for e in refused)
+    assert state['used'] < daily_limit, "the backfill used up the daily limit"
+    stats = scheduler.stats()
+    assert stats['backoffs'] == state['refused'] > 0, "503 responses not all backed off"
+    assert stats['concurrency'] < WORKERS, "concurrency didn't come down from the worker count"
+    assert state['refused'] < requests_count // 4, f"{state['refused']} requests answered 503"
+    return len(refused)
+
+
+def main(daily_limit=1000, used=700, concurrency=4):
+    check_slow_rate()
+    with MockSalesforce() as server:
+        state = limited_routes(server, daily_limit, used, concurrency)
+        scheduler = RequestScheduler(rate=200, max_concurrency=WORKERS)
+        sf = server.client(session=install(plain_http_session(WORKERS), scheduler))
+        results, timeline, seconds = backfill(sf, scheduler, daily_limit - used)
+        print(f"Backfill of {daily_limit - used} calls, {used}/{daily_limit} API calls used at start, "
+              f"stand-in accepts {concurrency} concurrent requests, {WORKERS} workers")
+        print("{0:>6}{1:>12}{2:>10}{3:>13}".format('call', 'api-usage', 'rate/s', 'concurrency'))
+        for n, stats in sorted(timeline, key=lambda entry: entry[0]):
+            print("{0:>6}{1:>12}{2:>10.1f}{3:>13}".format(n, f"{stats['api_used']}/{stats['api_limit']}",
+                                                         stats['rate'], stats['concurrency']))
+        refused = check_backfill(scheduler, state, timeline, results, daily_limit, daily_limit - used)
+        stats = scheduler.stats()
+        print(f"{seconds:.2f}s, usage {state['used']}/{daily_limit}, {state['refused']} requests answered 503, "
+              f"{stats['backoffs']} backoffs, {stats['throttled']} calls waited {stats['waited']:.1f}s, "
+              f"{refused} calls refused by the scheduler")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:4]])
@@ -0,0 +1,385 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : fake_org.py
+
+"""
+Stateful fake org on top of the local stand-in: records are kept in memory per sobject and served through the
+REST endpoints SalesforceQ and the entity classes use:
+- SOAP login, describe / describe global (with the field types of TYPES)
+- query / queryAll paged with nextRecordsUrl (page size from Sforce-Query-Options batchSize)
+- sobjects/<type>[/<id>] GET / POST / PATCH / DELETE
+- composite/sobjects POST / PATCH / DELETE (batched create / update / delete)
+- sobjects/<type>/deleted (getDeleted), every write stamps SystemModstamp and deletions are logged
+Only the SOQL this package sends is understood: a field list with parent-child subqueries, FROM, a WHERE of
+conditions joined by AND (Id IN (...), Field='value', ParentId IN (SELECT Id FROM X WHERE Field='value'),
+SystemModstamp > / >= / < / <= datetime), ORDER BY fields and LIMIT.
+"""
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from mock_salesforce import MockSalesforce
+from synthetic import make_record, record_id
+
+KEY_PREFIXES = {'Account': '001', 'Contact': '003', 'Opportunity': '006', 'Case': '500', 'Contract': '800',
+                'CaseComment': '00a'}
+FIELDS = {
+    'Account': ('Id', 'AccountNumber', 'Name', 'CreatedDate', 'Website'),
+    'Contact': ('Id', 'FirstName', 'LastName', 'Email', 'Phone', 'AccountId'),
+    'Opportunity': ('Id', 'Name', 'StageName', 'AccountId', 'Amount', 'Probability', 'CloseDate', 'IsClosed', 'IsWon',
+                    'Type'),
+    'Case': ('Id', 'CaseNumber', 'AccountId', 'ContactId', 'Type', 'Status', 'Subject', 'Description', 'ParentId',
+             'CreatedDate', 'ClosedDate', 'IsClosed'),
+    'Contract': ('Id', 'ContractNumber', 'AccountId', 'Status'),
+    'CaseComment': ('Id', 'ParentId', 'CommentBody', 'IsPublished'),
+}
+RELATIONSHIPS = {  # Parent-child subqueries: (parent, relationship) -> (child, lookup field)
+    ('Account', 'Cases'): ('Case', 'AccountId'),
+    ('Account', 'Opportunities'): ('Opportunity', 'AccountId'),
+    ('Account', 'Contacts'): ('Contact', 'AccountId'),
+    ('Account', 'Contracts'): ('Contract', 'AccountId'),
+    ('Contact', 'Cases'): ('Case', 'ContactId'),
+    ('Case', 'CaseComments'): ('CaseComment', 'ParentId'),
+}
+TYPES = {'Amount': 'currency', 'Probability': 'percent', 'CloseDate': 'date', 'IsClosed': 'boolean',
+         'IsWon': 'boolean', 'CreatedDate': 'datetime', 'ClosedDate': 'datetime', 'SystemModstamp': 'datetime'}
+PAGE_SIZE = 2000
+
+_SUBQUERY = re.compile(r'\(SELECT ([\w, ]+) FROM (\w+)\)', re.I)
+_QUERY = re.compile(r'^SELECT (.+?) FROM (\w+)(?: WHERE (.+?))?(?: ORDER BY ([\w, ]+?))?(?: LIMIT (\d+))?$',
+                    re.I | re.S)
+_COMPARE = re.compile(r'^(\w+)\s*(>=|<=|>|<)\s*(\S+)$')
+_ID_IN = re.compile(r"^Id IN \((.*)\)$", re.I | re.S)
+_EQUALS = re.compile(r"^(\w+)\s*=\s*'(.*)'$", re.S)
+_SEMI_JOIN = re.compile(r"^(\w+) IN \(SELECT Id FROM (\w+) WHERE (\w+)\s*=\s*'(.*)'\)$", re.I | re.S)
+_ESCAPE = re.compile(r"\\(.)", re.S)  # Backslash escapes of a quoted literal
+
+
+def _error(status, code, message):
+    return status, {}, [{'errorCode': code, 'message': message}]
+
+
+def _moment(value):
+    """Aware datetime of a SOQL literal / Salesforce datetime / getDeleted parameter"""
+    value = value.replace('Z', '+00:00')
+    if re.search(r'[+-]\d{4}$', value):
+        value = value[:-2] + ':' + value[-2:]
+    return datetime.fromisoformat(value)
+
+
+def typed_value(field, n):
+    """Synthetic value of a TYPES field of record n"""
+    kind = TYPES[field]
+    if kind == 'currency':
+        return round(n * 7919 % 100000 + 0.25, 2)
+    if kind == 'percent':
+        return float(n * 10 % 100)
+    if kind == 'date':
+        return (date(2021, 1, 1) + timedelta(days=n % 365)).isoformat()
+    if kind == 'boolean':
+        return n % (4 if field == 'IsWon' else 2) == 0
+    return stamp(datetime(2021, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=n)) if n % 3 else None
+
+
+def stamp(moment=None):
+    """Salesforce datetime string, now if moment is None"""
+    moment = moment or datetime.now(timezone.utc)
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0000'
+
+
+class FakeOrg:
+    def __init__(self, latency=0.0, page_size=PAGE_SIZE, width=16, extra_fields=0):
+        """
+        :param latency: seconds every request takes on the server side
+        :param page_size: default records per query page
+        :param width: characters of the synthetic text field values
+        :param extra_fields: additional text fields (Field1__c...) on every Account
+        """
+        self.latency = latency
+        self.page_size = page_size
+        self.width = width
+        self.fields = dict(FIELDS)
+        self.fields['Account'] = FIELDS['Account'] + tuple(f'Field{n}__c' for n in range(1, extra_fields + 1))
+        self.records = {sobject: {} for sobject in FIELDS}
+        self.deleted = {sobject: [] for sobject in FIELDS}  # (ID, deleted date) in deletion order
+        self.counters = {sobject: 0 for sobject in FIELDS}
+        self._cursors = {}
+        self._lock = threading.Lock()
+        self.server = MockSalesforce()
+        self._routes()
+
+    # Data
+
+    def _next_id(self, sobject):
+        self.counters[sobject] += 1
+        return record_id(KEY_PREFIXES[sobject], self.counters[sobject])
+
+    def insert(self, sobject, values):
+        """Store a record, the Id and the fields that aren't given are generated. :return: record ID"""
+        with self._lock:
+            n = self.counters[sobject] + 1
+            record = make_record(sobject, n, fields=self.fields[sobject], prefix=KEY_PREFIXES[sobject],
+                                 width=self.width)
+            record['Id'] = self._next_id(sobject)
+            record['attributes']['url'] = record['attributes']['url'].rsplit('/', 1)[0] + '/' + record['Id']
+            for field in self.fields[sobject]:
+                if field.endswith('Id') and field != 'Id':
+                    record[field] = None
+                elif field in TYPES and field != 'CreatedDate':
+                    record[field] = typed_value(field, n)
+            if sobject == 'Case':
+                record['CaseNumber'] = f'{n:08d}'
+            record['SystemModstamp'] = stamp()
+            record.update(values)
+            self.records[sobject][record['Id'][:15]] = record
+            return record['Id']
+
+    def update(self, sobject, record_id, values):
+        """Update a record and stamp it. :return: record / None if it doesn't exist"""
+        with self._lock:
+            record = self.records.get(sobject, {}).get(record_id[:15])
+            if record is not None:
+                record.update(values)
+                record['SystemModstamp'] = stamp()
+            return record
+
+    def remove(self, sobject, record_id):
+        """Delete a record and log the deletion. :return: True if it existed"""
+        with self._lock:
+            record = self.records.get(sobject, {}).pop(record_id[:15], None)
+            if record is not None:
+                self.deleted[sobject].append((record['Id'], stamp()))
+            return record is not None
+
+    def seed(self, sobject, count, **values):
+        """Insert count records with the given field values. :return: list of IDs"""
+        return [self.insert(sobject, values) for _ in range(count)]
+
+    def seed_account_tree(self, cases=100, comments=2, contacts=20, opportunities=10, contracts=5):
+        """Account with contacts, cases (spread over the contacts) and their comments, opportunities, contracts"""
+        account = self.insert('Account', {})
+        contact_ids = self.seed('Contact', contacts, AccountId=account)
+        for n in range(cases):
+            case = self.insert('Case', {'AccountId': account,
+                                        'ContactId': contact_ids[n % len(contact_ids)] if contact_ids else None})
+            self.seed('CaseComment', comments, ParentId=case)
+        self.seed('Opportunity', opportunities, AccountId=account)
+        self.seed('Contract', contracts, AccountId=account)
+        return account
+
+    def count(self, sobject=None):
+        return len(self.records[sobject]) if sobject else sum(len(records) for records in self.records.values())
+
+    # SOQL
+
+    def _where(self, sobject, condition):
+        records = self.records[sobject]
+        if not condition:
+            return list(records.values())
+        if ' AND ' in condition:
+            matched = None
+            for part in condition.split(' AND '):
+                ids = {record['Id'] for record in self._where(sobject, part.strip())}
+                matched = ids if matched is None else matched & ids
+            return [record for record in records.values() if record['Id'] in matched]
+        match = _COMPARE.match(condition)
+        if match:
+            field, operator, value = match.groups()
+            bound = _moment(value)
+            compare = {'>': bound.__lt__, '>=': bound.__le__, '<': bound.__gt__, '<=': bound.__ge__}[operator]
+            return [record for record in records.values() if compare(_moment(record[field]))]
+        match = _ID_IN.match(condition)
+        if match:
+            ids = [value.strip().strip("'") for value in match.group(1).split(',')]
+            return [records[i[:15]] for i in ids if i[:15] in records]
+        match = _SEMI_JOIN.match(condition)
+        if match:
+            field, parent, parent_field, value = match.groups()
+            parents = {record['Id'] for record in self._where(parent, f"{parent_field}='{value}'")}
+            return [record for record in records.values() if record.get(field) in parents]
+        match = _EQUALS.match(condition)
+        if match:
+            field, value = match.group(1), _ESCAPE.sub(r'\1', match.group(2))
+            if field == 'Id':
+                record = records.get(value[:15])
+                return [record] if record else []
+            return [record for record in records.values() if str(record.get(field)) == value]
+        raise ValueError(f"Unsupported condition: {condition}")
+
+    @staticmethod
+    def _project(record, fields):
+        row = {'attributes': record['attributes']}
+        names = {key.lower(): key for key in record}
+        for field in fields:
+            field = names.get(field.lower(), field)  # Rows carry the API casing whatever the SELECT casing
+            row[field] = record.get(field)
+        return row
+
+    def query(self, soql):
+        """:return: (count only, rows)"""
+        subqueries = _SUBQUERY.findall(soql)
+        match = _QUERY.match(_SUBQUERY.sub('', soql).strip())
+        if match is None:
+            raise ValueError(f"Unsupported query: {soql}")
+        select, sobject, condition, order, limit = match.groups()
+        fields = [field.strip() for field in select.split(',') if field.strip()]
+        with self._lock:
+            records = self._where(sobject, condition)
+            if order:
+                keys = [field.strip() for field in order.split(',')]
+                records.sort(key=lambda record: [record.get(key) or '' for key in keys])
+            if limit:
+                records = records[:int(limit)]
+            if fields == ['Count()'] or fields == ['COUNT()']:
+                return True, records
+            rows = []
+            for record in records:
+                row = self._project(record, fields)
+                for child_fields, relationship in subqueries:
+                    child, lookup = RELATIONSHIPS[(sobject, relationship)]
+                    children = [self._project(child_record, [f.strip() for f in child_fields.split(',')])
+                                for child_record in self.records[child].values()
+                                if child_record.get(lookup) == record['Id']]
+                    row[relationship] = {'totalSize': len(children), 'done': True,
+                                         'records': children} if children else None
+                rows.append(row)
+        return False, rows
+
+    def _page(self, base, cursor, rows, offset, size):
+        page = rows[offset:offset + size]
+        done = offset + size >= len(rows)
+        result = {'totalSize': len(rows), 'done': done, 'records': page}
+        if not done:
+            result['nextRecordsUrl'] = f'{base}/query/{cursor}-{offset + size}'
+        elif cursor is not None:
+            self._cursors.pop(cursor, None)
+        return 200, {}, result
+
+    # Routes
+
+    def _routes(self):
+        server = self.server
+        server.route_soap_login()
+        base = r'/services/data/(v[\d.]+)'
+
+        def delayed(handler):
+            def route(request):
+                if self.latency:
+                    time.sleep(self.latency)
+                return handler(request)
+            return route
+
+        def body(request):
+            return json.loads(request.body.decode('utf-8')) if request.body else {}
+
+        def query(request):
+            try:
+                count_only, rows = self.query(request.query.get('q', ''))
+            except (ValueError, KeyError) as e:
+                return _error(400, 'MALFORMED_QUERY', str(e))
+            if count_only:
+                return 200, {}, {'totalSize': len(rows), 'done': True, 'records': []}
+            options = request.headers.get('Sforce-Query-Options') or ''
+            size = int(options.split('=')[1]) if options.startswith('batchSize=') else self.page_size
+            cursor = None
+            if len(rows) > size:
+                cursor = '01gFAKE' + uuid.uuid4().hex[:10]
+                self._cursors[cursor] = (rows, size)
+            return self._page('/services/data/' + request.match.group(1), cursor, rows, 0, size)
+
+        def query_more(request):
+            cursor, offset = request.match.group(2), int(request.match.group(3))
+            if cursor not in self._cursors:
+                return _error(400, 'INVALID_QUERY_LOCATOR', 'invalid query locator')
+            rows, size = self._cursors[cursor]
+            return self._page('/services/data/' + request.match.group(1), cursor, rows, offset, size)
+
+        def describe_global(request):
+            return 200, {}, {'encoding': 'UTF-8', 'maxBatchSize': 200, 'sobjects': [
+                {'name': sobject, 'keyPrefix': prefix, 'queryable': True} for sobject, prefix in KEY_PREFIXES.items()]}
+
+        def describe(request):
+            sobject = request.match.group(2)
+            if sobject not in self.records:
+                return _error(404, 'NOT_FOUND', f'The requested resource does not exist: {sobject}')
+            return 200, {}, {'name': sobject, 'keyPrefix': KEY_PREFIXES[sobject], 'fields': [
+                {'name': field, 'type': 'id' if field == 'Id' else 'reference' if field.endswith('Id')
+                 else TYPES.get(field, 'string')}
+                for field in self.fields[sobject] + ('SystemModstamp',)]}
+
+        def deleted(request):
+            sobject = request.match.group(2)
+            start, end = _moment(request.query['start']), _moment(request.query['end'])
+            end = min(end, datetime.now(timezone.utc)).replace(second=0, microsecond=0)  # Minute granularity
+            with self._lock:
+                records = [{'id': record_id, 'deletedDate': date} for record_id, date in self.deleted[sobject]
+                           if start <= _moment(date) < end]
+            return 200, {}, {'deletedRecords': records, 'earliestDateAvailable': stamp(start),
+                             'latestDateCovered': stamp(end)}
+
+        def create(request):
+            sobject = request.match.group(2)
+            if sobject not in self.records:
+                return _error(404, 'NOT_FOUND', f'The requested resource does not exist: {sobject}')
+            return 201, {}, {'id': self.insert(sobject, body(request)), 'success': True, 'errors': []}
+
+        def record(request):
+            sobject, record_id = request.match.group(2), request.match.group(3)
+            if request.method == 'GET':
+                found = self.records.get(sobject, {}).get(record_id[:15])
+            elif request.method == 'PATCH':
+                found = self.update(sobject, record_id, body(request))
+            else:
+                found = self.remove(sobject, record_id)
+            if not found:
+                return _error(404, 'NOT_FOUND', 'The requested resource does not exist')
+            return (200, {}, found) if request.method == 'GET' else (204, {}, b'')
+
+        def composite(request):
+            results = []
+            if request.method == 'DELETE':
+                for record_id in request.query.get('ids', '').split(','):
+                    sobject = next((name for name, prefix in KEY_PREFIXES.items() if record_id.startswith(prefix)),
+                                   None)
+                    results.append((record_id, sobject is not None and self.remove(sobject, record_id)))
+            for values in body(request).get('records', []):
+                sobject = values.pop('attributes')['type']
+                if request.method == 'POST':
+                    results.append((self.insert(sobject, values), True))
+                else:
+                    results.append((values.get('Id'), self.update(sobject, values.get('Id', ''), values) is not None))
+            return 200, {}, [{'id': record_id, 'success': True, 'errors': []} if success else
+                             {'id': record_id, 'success': False, 'errors': [
+                                 {'statusCode': 'ENTITY_IS_DELETED', 'message': 'entity is deleted', 'fields': []}]}
+                             for record_id, success in results]
+
+        server.route('GET', base + r'/(?:query|queryAll)/?', delayed(query))
+        server.route('GET', base + r'/(?:query|queryAll)/(01g\w+)-(\d+)', delayed(query_more))
+        server.route('GET', base + r'/sobjects/?', delayed(describe_global))
+        server.route('GET', base + r'/sobjects/(\w+)/describe/?', delayed(describe))
+        server.route('GET', base + r'/sobjects/(\w+)/deleted/?', delayed(deleted))
+        server.route('POST', base + r'/sobjects/(\w+)/?', delayed(create))
+        for method in ('GET', 'PATCH', 'DELETE'):
+            server.route(method, base + r'/sobjects/(\w+)/(\w{15,18})', delayed(record))
+        for method in ('POST', 'PATCH', 'DELETE'):
+            server.route(method, base + r'/composite/sobjects/?', delayed(composite))
+
+    @property
+    def instance(self):
+        return self.server.instance
+
+    def start(self):
+        self.server.start()
+        return self
+
+    def stop(self):
+        self.server.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
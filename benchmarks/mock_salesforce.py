@@ -0,0 +1,186 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : mock_salesforce.py
+
+"""
+Local HTTP stand-in for the Salesforce REST API, routes are registered per (method, path regex) and
+can replay recorded responses. simple-salesforce always builds https:// URLs, plain_http_session()
+rewrites them to plain http so clients can talk to the stand-in unchanged.
+"""
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from simple_salesforce import Salesforce
+
+from synthetic import API_VERSION
+
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recordings')
+
+
+class PlainHTTPAdapter(HTTPAdapter):
+    """Sends https:// requests over plain http, the stand-in has no TLS, hosts redirects e.g. login.salesforce.com"""
+
+    def __init__(self, hosts=None, **kwargs):
+        self.hosts = hosts or {}
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if request.url.startswith('https://'):
+            request.url = 'http://' + request.url[len('https://'):]
+        url = urlsplit(request.url)
+        if url.netloc in self.hosts:
+            request.url = url._replace(netloc=self.hosts[url.netloc]).geturl()
+        return super().send(request, **kwargs)
+
+
+def plain_http_session(pool_maxsize=10, hosts=None):
+    session = requests.Session()
+    adapter = PlainHTTPAdapter(hosts=hosts, pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+SOAP_LOGIN_RESPONSE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" '
+    'xmlns="urn:partner.soap.sforce.com"><soapenv:Body><loginResponse><result>'
+    '<serverUrl>{server_url}</serverUrl><sessionId>{session_id}</sessionId>'
+    '</result></loginResponse></soapenv:Body></soapenv:Envelope>')
+
+
+def load_recording(name):
+    with open(os.path.join(RECORDINGS, name)) as recording:
+        return json.load(recording)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body are separate writes, Nagle would hold the body ~40 ms
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        request = SimpleNamespace(method=self.command, path=url.path,
+                                  query={key: values[-1] for key, values in parse_qs(url.query).items()},
+                                  headers=self.headers, body=body)
+        self.server.mock.requests.append((request.method, request.path))
+        status, headers, payload = self.server.mock.handle(request)
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload)
+            headers.setdefault('Content-Type', 'application/json;charset=UTF-8')
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        payload = payload or b''
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = do_PUT = _dispatch
+
+
+class MockSalesforce:
+    """
+    Threaded local Salesforce stand-in
+    EXAMPLE: with MockSalesforce() as server:
+                 server.route('GET', r'/services/data/v[\d.]+/limits/?', lambda request: (200, {}, {}))
+                 sf = server.client()
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.routes = []
+        self.requests = []
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def instance(self):
+        host, port = self._httpd.server_address[:2]
+        return f'{host}:{port}'
+
+    def route(self, method, pattern, handler):
+        """Register handler(request) -> (status, headers, body), pattern is matched against the URL path"""
+        self.routes.append((method, re.compile(pattern + '$'), handler))
+
+    def handle(self, request):
+        for method, pattern, handler in self.routes:
+            match = pattern.match(request.path)
+            if method == request.method and match:
+                request.match = match
+                return handler(request)
+        return 404, {}, [{'errorCode': 'NOT_FOUND', 'message': f'No mock route for {request.method} {request.path}'}]
+
+    def route_soap_login(self, session_id='MOCK_SESSION'):
+        """Answer SOAP logins (username / password / security token) with a session on the stand-in"""
+        def login(request):
+            version = request.match.group(1)
+            return 200, {'Content-Type': 'text/xml;charset=UTF-8'}, SOAP_LOGIN_RESPONSE.format(
+                session_id=session_id, server_url=f'https://{self.instance}/services/Soap/u/{version}/00D000000000001')
+
+        self.route('POST', r'/services/Soap/u/([\d.]+)/?', login)
+
+    def login_session(self, pool_maxsize=10):
+        """Session sending login.salesforce.com / test.salesforce.com to the stand-in, see route_soap_login"""
+        return plain_http_session(pool_maxsize, hosts={'login.salesforce.com': self.instance,
+                                                       'test.salesforce.com': self.instance})
+
+    def client(self, version=API_VERSION, session=None):
+        """simple-salesforce client connected to the stand-in"""
+        return Salesforce(session_id='MOCK_SESSION', instance=self.instance, version=version,
+                          session=session or plain_http_session())
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def replay_bulk_query(server, recording):
+    """
+    Replay a recorded Bulk 2.0 query job: the create response, the job states returned by successive
+    polls (the last one repeats) and the CSV result pages chained by their Sforce-Locator
+    """
+    job_id = recording['create']['id']
+    states = list(recording['status'])
+    pages = {page.get('request_locator'): page for page in recording['results']}
+    base = r'/services/data/v[\d.]+/jobs/query'
+
+    def create(request):
+        return 200, {}, recording['create']
+
+    def status(request):
+        return 200, {}, states.pop(0) if len(states) > 1 else states[0]
+
+    def results(request):
+        page = pages[request.query.get('locator')]
+        return 200, {'Content-Type': 'text/csv', 'Sforce-Locator': page['locator']}, page['csv']
+
+    server.route('POST', base + '/?', create)
+    server.route('GET', base + '/' + job_id + '/?', status)
+    server.route('GET', base + '/' + job_id + '/results/?', results)
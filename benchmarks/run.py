@@ -0,0 +1,295 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : run.py
+
+"""
+Offline benchmark suite: a fake org (fake_org.FakeOrg) is seeded for every scenario and each scenario runs in
+its own process against it, through SalesforceQ and the entity classes (SOAP login included), so the peak RSS
+reported is the one of the client alone.
+
+Scenarios:
+- account_pull:     every Account through Account.iter_all, paged
+- get_by_id:        Account.get_by_id with a list of IDs (chunked 'WHERE Id IN' queries)
+- get_by_id_single: one Account.get_by_id call per ID, fanned out on the client executor
+- case_create:      Case.create_many
+- account_purge:    Account.purge of an account with its contacts, cases, comments, opportunities, contracts
+- sync_full:        first Sync.SyncEngine run of Account, the whole table
+- sync_incremental: Account sync after a full one, with 1% of the accounts updated and 0.2% deleted since
+- lookup_api:       Account.get_by_name of 1000 accounts, one query each
+- lookup_mirror:    the same lookups answered by an in-memory Mirror.SQLiteMirror synced beforehand
+- opportunity_rows:    Opportunity pull parsed to records, turned into NumPy columns row by row, Amount summed
+- opportunity_columns: the same pull through Opportunity.get_columns (Columnar) and to_numpy_columns
+- report_n_plus_one:   cases of every contact of rows / 100 accounts, Account.get_contacts then Contact.get_cases
+- report_prefetch:     the same traversal from one Account.fetch(include=['Contacts.Cases'])
+
+Reported per scenario: records, wall time, throughput (records/s), request count and latency percentiles
+(p50 / p95 / p99, from the Metrics hook), response KB, parse time and peak RSS. A scenario's prepare_ step
+(e.g. the full sync before an incremental one) isn't measured.
+Usage: python benchmarks/run.py [scenario ...] [--rows 10000] [--width 16] [--fields 0] [--latency 0]
+       [--page-size 2000] [--workers 8] [--json]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_org import FakeOrg, stamp
+
+SCENARIOS = ('account_pull', 'get_by_id', 'get_by_id_single', 'case_create', 'account_purge', 'sync_full',
+             'sync_incremental', 'lookup_api', 'lookup_mirror', 'opportunity_rows', 'opportunity_columns',
+             'report_n_plus_one', 'report_prefetch')
+OPPORTUNITY_FIELDS = "Id,AccountId,Amount,Probability,CloseDate,IsWon"
+LOOKUPS = 1000
+
+
+# Seeding, in the server process
+
+def seed(org, scenario, rows):
+    """Seed the fake org for a scenario. :return: JSON arguments of the scenario"""
+    if scenario in ('account_pull', 'get_by_id', 'get_by_id_single'):
+        return {'ids': org.seed('Account', rows)}
+    if scenario == 'case_create':
+        return {'account': org.insert('Account', {}), 'rows': rows}
+    if scenario == 'account_purge':
+        cases = max(1, rows // 20)
+        return {'account': org.seed_account_tree(cases=cases, comments=2, contacts=max(1, cases // 5),
+                                                 opportunities=max(1, cases // 10), contracts=max(1, cases // 20))}
+    if scenario in ('sync_full', 'sync_incremental'):  # Last modified yesterday
+        return {'ids': org.seed('Account', rows, SystemModstamp=stamp(datetime.now(timezone.utc) - timedelta(days=1)))}
+    if scenario in ('opportunity_rows', 'opportunity_columns'):
+        return {'rows': len(org.seed('Opportunity', rows))}
+    if scenario in ('report_n_plus_one', 'report_prefetch'):
+        return {'accounts': [org.seed_account_tree(cases=20, comments=0, contacts=5, opportunities=0, contracts=0)
+                             for _ in range(max(1, rows // 100))]}
+    if scenario in ('lookup_api', 'lookup_mirror'):
+        ids = org.seed('Account', rows, SystemModstamp=stamp(datetime.now(timezone.utc) - timedelta(days=1)))
+        step = max(1, len(ids) // LOOKUPS)
+        return {'names': [org.records['Account'][record_id[:15]]['Name'] for record_id in ids[::step][:LOOKUPS]]}
+    raise ValueError(f"Unknown scenario {scenario}")
+
+
+# Scenarios, in the client process
+
+def account_pull(sq, args):
+    return sum(1 for _ in sq.Account.iter_all())
+
+
+def get_by_id(sq, args):
+    records = sq.Account.get_by_id(args['ids'])
+    assert not records.missing, records.missing[:5]
+    return len(records)
+
+
+def get_by_id_single(sq, args):
+    from SFQuerier import Executor
+    records = Executor.fan_out(sq.executor, lambda record_id: sq.Account.get_by_id(record_id), args['ids'])
+    assert not records.errors and all(records)
+    return len(records)
+
+
+def case_create(sq, args):
+    cases = [{'AccountId': args['account'], 'Subject': f'Benchmark case {n}', 'Description': 'Created by run.py'}
+             for n in range(args['rows'])]
+    results = sq.Case.create_many(cases)
+    assert results.success, results.report()
+    return len(results)
+
+
+def account_purge(sq, args):
+    result = sq.Account.purge(args['account'])
+    assert result and result['bool'], result
+    return sum(len(ids) for ids in result['deleted'].values())
+
+
+def _sync_engine(sq):
+    from SFQuerier import Sync
+    return Sync.SyncEngine(sq, Sync.MemoryRecordStore(), Sync.MemoryStateStore())
+
+
+def sync_full(sq, args):
+    report = _sync_engine(sq).sync('Account')
+    assert report.upserted == len(args['ids']), report
+    return report.upserted
+
+
+def prepare_sync_incremental(sq, args):
+    engine = _sync_engine(sq)
+    engine.sync('Account')
+    ids = args['ids']
+    updated = sq.Account.update_many([{'Id': record_id, 'Name': f'Renamed {n}'}
+                                      for n, record_id in enumerate(ids[::100])])
+    deleted = sq.Account.delete_many(ids[1::500])
+    assert updated.success and deleted.success
+    time.sleep(1)  # Watermarks are whole seconds
+    return engine
+
+
+def sync_incremental(sq, args):
+    engine = args['prepared']
+    report = engine.sync('Account')
+    deleted = len(args['ids'][1::500])  # getDeleted covers whole minutes, the current one comes with the next run
+    assert report.mode == 'incremental' and report.upserted == len(args['ids'][::100]), report
+    assert report.deleted in (0, deleted), report
+    assert len(engine.store.records['Account']) == len(args['ids']) - report.deleted
+    return report.upserted + report.deleted
+
+
+def lookup_api(sq, args):
+    return sum(len(sq.Account.get_by_name(name)) for name in args['names'])
+
+
+def prepare_lookup_mirror(sq, args):
+    from SFQuerier import Mirror
+    sq.mirror = Mirror.SQLiteMirror(version=sq.sf.sf_version)
+    sq.sync_mirror(['Account'])
+
+
+def lookup_mirror(sq, args):
+    records = lookup_api(sq, args)
+    assert sq.mirror.misses == 0, sq.mirror_stats()
+    return records
+
+
+def opportunity_rows(sq, args):
+    import numpy
+    records = list(sq.iter_query(f"SELECT {OPPORTUNITY_FIELDS} FROM Opportunity"))
+    columns = {'Amount': numpy.array([record.Amount for record in records], dtype=numpy.float64),
+               'Probability': numpy.array([record.Probability for record in records], dtype=numpy.float64),
+               'CloseDate': numpy.array([record.CloseDate for record in records], dtype='datetime64[D]'),
+               'IsWon': numpy.array([record.IsWon for record in records], dtype=bool)}
+    assert columns['Amount'].sum() > 0
+    return len(records)
+
+
+def opportunity_columns(sq, args):
+    columns = sq.Opportunity.get_columns(OPPORTUNITY_FIELDS).to_numpy_columns()
+    assert columns['Amount'].sum() > 0
+    return len(columns['Amount'])
+
+
+def report_n_plus_one(sq, args):
+    return sum(len(sq.Contact.get_cases(contact.Id)) for account in args['accounts']
+               for contact in sq.Account.get_contacts(account))
+
+
+def report_prefetch(sq, args):
+    accounts = sq.Account.fetch(args['accounts'], include=['Contacts.Cases'])
+    assert not accounts.missing
+    return sum(len(contact.Cases) for account in accounts for contact in account.Contacts)
+
+
+def peak_rss_mb():
+    """Peak RSS of this process, ru_maxrss would include the parent's peak on Linux (kept across exec)"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0  # No request, e.g. lookups answered by the mirror
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def client(scenario, instance, args, workers):
+    """Run one scenario against the fake org. :return: dict of measures"""
+    from SFQuerier import Metrics
+    from SFQuerier.SFQuerier import SalesforceQ
+    from mock_salesforce import plain_http_session
+
+    class Samples(Metrics.Exporter):
+        def __init__(self):
+            self.requests, self.received, self.parse = [], 0, 0.0
+
+        def export(self, record):
+            if record.kind == Metrics.REQUEST:
+                self.requests.append(record.seconds)
+                self.received += record.received or 0
+            else:
+                self.parse += record.seconds
+
+    samples = Samples()
+    hosts = {'login.salesforce.com': instance}
+    sq = SalesforceQ(instance=instance, username='bench', password='bench', security_token='token',
+                     session=plain_http_session(workers, hosts=hosts), max_workers=workers, metadata_path=None,
+                     metrics=Metrics.Metrics([samples]))
+    prepare = globals().get('prepare_' + scenario)
+    if prepare is not None:
+        args['prepared'] = prepare(sq, args)
+    samples.requests, samples.received, samples.parse = [], 0, 0.0  # Login and preparation
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    records = globals()[scenario](sq, args)
+    seconds = time.perf_counter() - started
+    return {'scenario': scenario, 'records': records, 'seconds': seconds,
+            'throughput': records / seconds if seconds else None, 'requests': len(samples.requests),
+            'p50_ms': percentile(samples.requests, 0.50) * 1e3, 'p95_ms': percentile(samples.requests, 0.95) * 1e3,
+            'p99_ms': percentile(samples.requests, 0.99) * 1e3, 'received_kb': samples.received / 1024,
+            'parse_s': samples.parse,
+            'rss_start_mb': rss_before, 'rss_peak_mb': peak_rss_mb()}
+
+
+def run(scenario, options):
+    """Seed a fresh fake org and run the scenario in a child process. :return: dict of measures"""
+    with FakeOrg(latency=options.latency / 1e3, page_size=options.page_size, width=options.width,
+                 extra_fields=options.fields) as org:
+        args = seed(org, scenario, options.rows)
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', scenario, org.instance,
+                                str(options.workers)], input=json.dumps(args), capture_output=True, text=True)
+    if child.returncode != 0:
+        raise RuntimeError(f"{scenario} failed:\n{child.stderr}")
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline SFQuerier benchmarks against a fake org")
+    parser.add_argument('scenarios', nargs='*', metavar='scenario', help=f"{', '.join(SCENARIOS)}, all if none")
+    parser.add_argument('--rows', type=int, default=10000, help="records per scenario")
+    parser.add_argument('--width', type=int, default=16, help="characters of the synthetic text values")
+    parser.add_argument('--fields', type=int, default=0, help="extra text fields on Account")
+    parser.add_argument('--latency', type=float, default=0.0, help="server side milliseconds per request")
+    parser.add_argument('--page-size', type=int, default=2000, help="records per query page")
+    parser.add_argument('--workers', type=int, default=8, help="client executor threads")
+    parser.add_argument('--json', action='store_true', help="print one JSON object per scenario")
+    parser.add_argument('--child', nargs=3, metavar=('SCENARIO', 'INSTANCE', 'WORKERS'), help=argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+    unknown = [scenario for scenario in options.scenarios if scenario not in SCENARIOS]
+    if unknown and not options.child:
+        parser.error(f"unknown scenario {', '.join(unknown)}, choose from {', '.join(SCENARIOS)}")
+
+    if options.child:
+        scenario, instance, workers = options.child
+        print(json.dumps(client(scenario, instance, json.loads(sys.stdin.read()), int(workers))))
+        return
+
+    if not options.json:
+        print(f"rows={options.rows} width={options.width} extra fields={options.fields} "
+              f"latency={options.latency:g} ms page size={options.page_size} workers={options.workers}")
+        print("{0:<18}{1:>9}{2:>10}{3:>12}{4:>10}{5:>9}{6:>9}{7:>9}{8:>11}{9:>10}{10:>11}".format(
+            'scenario', 'records', 'seconds', 'records/s', 'requests', 'p50 ms', 'p95 ms', 'p99 ms', 'KB in',
+            'parse s', 'peak MB'))
+    for scenario in options.scenarios or SCENARIOS:
+        result = run(scenario, options)
+        if options.json:
+            print(json.dumps(result))
+        else:
+            print("{scenario:<18}{records:>9}{seconds:>10.2f}{throughput:>12.0f}{requests:>10}{p50_ms:>9.2f}"
+                  "{p95_ms:>9.2f}{p99_ms:>9.2f}{received_kb:>11.1f}{parse_s:>10.3f}{rss_peak_mb:>11.1f}".format(
+                      **result))
+
+
+if __name__ == '__main__':
+    main()
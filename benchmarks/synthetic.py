@@ -0,0 +1,37 @@
+##!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# @File    : synthetic.py
+
+"""
+Synthetic Salesforce payloads shaped like the OrderedDicts simple-salesforce returns
+"""
+import collections
+
+API_VERSION = '52.0'
+
+ACCOUNT_FIELDS = ('Id', 'AccountNumber', 'Name', 'CreatedDate', 'Website')
+
+
+def record_id(prefix, n):
+    """18 character style ID with the given 3 character key prefix"""
+    return '{prefix}5g0{n:09d}AAA'.format(prefix=prefix, n=n)
+
+
+def make_record(sobject, n, fields=ACCOUNT_FIELDS, prefix='001', width=16):
+    record = collections.OrderedDict()
+    rid = record_id(prefix, n)
+    record['attributes'] = collections.OrderedDict(
+        [('type', sobject), ('url', f'/services/data/v{API_VERSION}/sobjects/{sobject}/{rid}')])
+    for field in fields:
+        if field == 'Id':
+            record[field] = rid
+        elif field == 'CreatedDate':
+            record[field] = '2021-04-05T10:00:00.000+0000'
+        else:
+            record[field] = '{0}-{1}'.format(field, n).ljust(width, 'x')
+    return record
+
+
+def make_query_result(sobject, rows, fields=ACCOUNT_FIELDS, prefix='001', width=16, start=0, done=True):
+    records = [make_record(sobject, start + n, fields=fields, prefix=prefix, width=width) for n in range(rows)]
+    return collections.OrderedDict([('totalSize', rows), ('done', done), ('records', records)])